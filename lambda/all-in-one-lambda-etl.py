@@ -2,7 +2,6 @@
 # lambda_function.py - ETL Pipeline with step control
 
 import json
-import boto3
 import time
 from datetime import datetime
 
@@ -10,8 +9,8 @@ from datetime import datetime
 # AWS CLIENTS & CONFIG
 # ==============================
 
-s3_client = boto3.client('s3')
-athena_client = boto3.client('athena')
+# Created on first use and reused across warm invocations
+_athena_client = None
 
 BUCKET = 'insurance-claim-qian-2025'
 DATABASE = 'insurance_claim_db'
@@ -19,6 +18,29 @@ DATABASE = 'insurance_claim_db'
 # Athena query results output
 OUTPUT_LOCATION = f's3://{BUCKET}/athena_results/'
 
+# Polling: start short so quick queries return fast, back off to the cap
+POLL_INITIAL_INTERVAL = 0.25
+POLL_MAX_INTERVAL = 2
+
+
+def get_athena_client():
+    """Return the container-wide Athena client, creating it on first use."""
+    global _athena_client
+    if _athena_client is None:
+        import boto3
+        from botocore.config import Config as BotoConfig
+
+        _athena_client = boto3.client(
+            'athena',
+            config=BotoConfig(
+                max_pool_connections=10,
+                connect_timeout=5,
+                read_timeout=30,
+                retries={'mode': 'adaptive', 'max_attempts': 5},
+            )
+        )
+    return _athena_client
+
 # ==============================
 # HELPER: EXECUTE ATHENA QUERY
 # ==============================
@@ -33,6 +55,7 @@ def execute_athena_query(query, database=None, label=None):
     print("Query:\n", query)
 
     try:
+        athena_client = get_athena_client()
         params = {
             'QueryString': query,
             'ResultConfiguration': {'OutputLocation': OUTPUT_LOCATION}
@@ -50,6 +73,7 @@ def execute_athena_query(query, database=None, label=None):
 
         # Poll for completion
         max_attempts = 150
+        delay = POLL_INITIAL_INTERVAL
         for attempt in range(max_attempts):
             result = athena_client.get_query_execution(QueryExecutionId=query_id)
             status = result['QueryExecution']['Status']['State']
@@ -65,7 +89,8 @@ def execute_athena_query(query, database=None, label=None):
                 print(f"✗ Query failed: {error_msg}")
                 return {'status': 'failed', 'error': error_msg}
 
-            time.sleep(2)
+            time.sleep(delay)
+            delay = min(delay * 1.5, POLL_MAX_INTERVAL)
 
         print("✗ Query timeout")
         return {'status': 'timeout', 'error': 'Query execution timeout'}
@@ -304,10 +329,7 @@ def step_views():
     }
 
     for name, q in view_queries.items():
-        # DROP VIEW IF EXISTS (for safety)
-        drop_q = f"DROP VIEW IF EXISTS {name}"
-        execute_athena_query(drop_q, DATABASE, label=f"Drop view {name} (if exists)")
-
+        # CREATE OR REPLACE VIEW needs no separate DROP round trip
         res = execute_athena_query(q, DATABASE, label=f"Create view {name}")
         if res['status'] != 'success':
             raise Exception(f"Failed to create view {name}: {res.get('error')}")
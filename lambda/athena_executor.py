@@ -2,34 +2,184 @@
 """
 Athena Query Executor Module
 Handles all interactions with Amazon Athena service
+
+Queries still running when the executor gives up on them (deadline,
+polling timeout, polling error, or cancel_all() from a failed run) are
+stopped with StopQueryExecution, and a stopped or failed CTAS has its
+partial output under external_location deleted, so the next CREATE TABLE
+finds an empty location.
 """
 
-import boto3
+import random
+import re
+import threading
 import time
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+from config import Config
+from aws_clients import get_client
+
+# Polls that hit these are retried (the query keeps running regardless), and
+# so are submissions (a throttled start submitted nothing)
+_THROTTLE_CODES = ('ThrottlingException', 'TooManyRequestsException')
+
+_CTAS_LOCATION = re.compile(r"^\s*(?:--[^\n]*\n\s*)*CREATE\s+TABLE\b.*?external_location\s*=\s*'([^']+)'",
+                            re.IGNORECASE | re.DOTALL)
+
+
+def _error_code(error: Exception) -> Optional[str]:
+    return getattr(error, 'response', {}).get('Error', {}).get('Code')
+
 
 class AthenaExecutor:
     """Execute and monitor Athena queries."""
     
-    def __init__(self, bucket: str, region: str = 'us-east-1'):
+    def __init__(
+        self,
+        bucket: str,
+        region: str = 'us-east-1',
+        athena_client=None,
+        slots=None,
+        priority: Optional[str] = None
+    ):
         """
         Initialize Athena executor.
         
         Args:
             bucket: S3 bucket for Athena results
             region: AWS region
+            athena_client: Client to use instead of the shared one (optional)
+            slots: QuerySlots pool to take a slot from per query (defaults to
+                   the configured one, none when QUERY_SLOTS_BACKEND is 'off')
+            priority: Slot priority, 'high', 'normal' or 'low' (defaults to
+                      QUERY_SLOTS_PRIORITY)
         """
-        self.athena_client = boto3.client('athena', region_name=region)
+        self.athena_client = athena_client or get_client('athena', region)
         self.bucket = bucket
         self.output_location = f's3://{bucket}/athena_results/'
+        if slots is None:
+            from query_slots import get_slots
+            slots = get_slots()
+        self.slots = slots
+        self.priority = priority or Config.QUERY_SLOTS_PRIORITY
+        self.deadline: Optional[float] = None
+        self._in_flight: Dict[str, Optional[str]] = {}  # query_id -> CTAS location
+        self._lock = threading.Lock()
+    
+    def set_deadline(self, context=None) -> None:
+        """
+        Stop waiting for queries Config.DEADLINE_MARGIN seconds before the
+        Lambda invocation's time runs out (no deadline without a context).
+        """
+        if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+            self.deadline = None
+            return
+        remaining = context.get_remaining_time_in_millis() / 1000
+        self.deadline = time.monotonic() + remaining - Config.DEADLINE_MARGIN
+        print(f"Deadline: {remaining - Config.DEADLINE_MARGIN:.0f}s of {remaining:.0f}s remaining")
+    
+    def _past_deadline(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+    
+    def cancel_all(self, reason: str = 'Pipeline error') -> Dict[str, str]:
+        """
+        Stop every query still in flight and delete their partial CTAS output.
+        
+        Returns:
+            {query_id: final state}; SUCCEEDED when a query finished before the stop
+        """
+        with self._lock:
+            in_flight = dict(self._in_flight)
+        states = {}
+        for query_id, location in in_flight.items():
+            print(f"Cancelling {query_id} ({reason})")
+            states[query_id] = self._stop(query_id, location)
+        return states
+    
+    def _stop(self, query_id: str, location: Optional[str]) -> str:
+        """
+        StopQueryExecution and wait until Athena reports the query ended.
+        
+        Output is deleted only when the query ended FAILED or CANCELLED: a
+        query that SUCCEEDED before the stop landed is a finished table, and
+        one still QUEUED/RUNNING (or of unknown state) may still be writing.
+        
+        Returns:
+            Final state ('UNKNOWN' when it couldn't be read)
+        """
+        state = 'UNKNOWN'
+        try:
+            self.athena_client.stop_query_execution(QueryExecutionId=query_id)
+            delay = Config.POLL_INITIAL_INTERVAL
+            for _ in range(20):
+                state = self.athena_client.get_query_execution(
+                    QueryExecutionId=query_id
+                )['QueryExecution']['Status']['State']
+                if state in ['SUCCEEDED', 'FAILED', 'CANCELLED']:
+                    break
+                time.sleep(delay)
+                delay = min(delay * 1.5, Config.POLL_MAX_INTERVAL)
+        except Exception as e:
+            print(f"WARNING: Could not stop {query_id}: {e}")
+        
+        if state in ['FAILED', 'CANCELLED']:
+            self._clear_output(location)
+        elif state == 'SUCCEEDED':
+            print(f"✓ {query_id} succeeded before it could be stopped")
+        elif location:
+            print(f"WARNING: {query_id} is {state}; left its output under {location}")
+        return state
+    
+    def _clear_output(self, location: Optional[str]) -> None:
+        """Delete what a stopped or failed CTAS wrote."""
+        if not location:
+            return
+        try:
+            # Plain boto3, so the core Lambda does not need pyarrow for this
+            bucket, _, prefix = location.replace('s3://', '', 1).partition('/')
+            prefix = prefix.rstrip('/') + '/'
+            s3 = get_client('s3')
+            keys = []
+            for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+                keys.extend(obj['Key'] for obj in page.get('Contents', []))
+            for i in range(0, len(keys), 1000):
+                s3.delete_objects(
+                    Bucket=bucket,
+                    Delete={'Objects': [{'Key': key} for key in keys[i:i + 1000]], 'Quiet': True}
+                )
+            print(f"✓ Removed partial output under {location} ({len(keys)} objects)")
+        except Exception as e:
+            print(f"WARNING: Could not remove partial output under {location}: {e}")
+    
+    def _start(self, params: Dict, lease=None) -> Optional[Dict]:
+        """
+        StartQueryExecution, retried with jittered backoff while throttled.
+        None when the deadline passes between attempts.
+        """
+        delay = Config.SUBMIT_INITIAL_BACKOFF
+        for attempt in range(1, Config.SUBMIT_MAX_ATTEMPTS + 1):
+            try:
+                return self.athena_client.start_query_execution(**params)
+            except Exception as e:
+                if _error_code(e) not in _THROTTLE_CODES or attempt == Config.SUBMIT_MAX_ATTEMPTS:
+                    raise
+                print(f"WARNING: Submission throttled ({_error_code(e)}), retrying (attempt {attempt})")
+            # Jitter so queries throttled together don't all retry together
+            time.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, Config.SUBMIT_MAX_BACKOFF)
+            if lease is not None:
+                self.slots.renew(lease)
+            if self._past_deadline():
+                return None
     
     def execute_query(
         self, 
         query: str, 
         database: Optional[str] = None, 
         label: Optional[str] = None,
-        max_attempts: int = 150
+        max_attempts: int = 150,
+        parameters: Optional[List[str]] = None
     ) -> Dict:
         """
         Execute a single Athena query and wait for completion.
@@ -39,6 +189,7 @@ class AthenaExecutor:
             database: Database context (optional)
             label: Label for logging
             max_attempts: Max polling attempts
+            parameters: Values for '?' placeholders, as SQL literals (optional)
         
         Returns:
             Dict with status and query_id or error
@@ -50,6 +201,10 @@ class AthenaExecutor:
         
         print(f"Query:\n{query[:200]}..." if len(query) > 200 else f"Query:\n{query}")
         
+        lease = None
+        query_id = None
+        match = _CTAS_LOCATION.match(query)
+        location = match.group(1) if match else None
         try:
             params = {
                 'QueryString': query,
@@ -63,30 +218,127 @@ class AthenaExecutor:
             ):
                 params['QueryExecutionContext'] = {'Database': database}
             
-            response = self.athena_client.start_query_execution(**params)
+            if parameters:
+                params['ExecutionParameters'] = parameters
+            
+            # Shared concurrency limit, held until the query finishes
+            if self.slots is not None:
+                timeout = Config.QUERY_SLOTS_WAIT
+                if self.deadline is not None:
+                    timeout = max(0.0, min(timeout, self.deadline - time.monotonic()))
+                lease = self.slots.acquire(self.priority, timeout)
+            
+            if self._past_deadline():
+                print("✗ Query not submitted: deadline reached")
+                return {'status': 'cancelled', 'error': 'Deadline reached before submission'}
+            
+            response = self._start(params, lease)
+            if response is None:
+                print("✗ Query not submitted: deadline reached while throttled")
+                return {'status': 'cancelled', 'error': 'Deadline reached before submission'}
             query_id = response['QueryExecutionId']
+            with self._lock:
+                self._in_flight[query_id] = location
             
-            # Poll for completion
+            # Poll for completion, backing off from a short first interval
+            delay = Config.POLL_INITIAL_INTERVAL
             for attempt in range(max_attempts):
-                result = self.athena_client.get_query_execution(QueryExecutionId=query_id)
-                status = result['QueryExecution']['Status']['State']
-                
-                if status == 'SUCCEEDED':
-                    print("✓ Query succeeded")
-                    return {'status': 'success', 'query_id': query_id}
+                try:
+                    result = self.athena_client.get_query_execution(QueryExecutionId=query_id)
+                except Exception as e:
+                    if _error_code(e) not in _THROTTLE_CODES:
+                        raise
+                    print(f"WARNING: Status poll throttled ({_error_code(e)}), retrying")
+                else:
+                    status = result['QueryExecution']['Status']['State']
+                    
+                    if status == 'SUCCEEDED':
+                        print("✓ Query succeeded")
+                        return {'status': 'success', 'query_id': query_id}
+                    
+                    elif status in ['FAILED', 'CANCELLED']:
+                        error_msg = result['QueryExecution']['Status'].get(
+                            'StateChangeReason', 'Unknown error'
+                        )
+                        print(f"✗ Query failed: {error_msg}")
+                        # An existing table or path is not this query's output
+                        if status == 'FAILED' and 'already exists' not in error_msg.lower():
+                            self._clear_output(location)
+                        return {'status': 'failed', 'error': error_msg}
                 
-                elif status in ['FAILED', 'CANCELLED']:
-                    error_msg = result['QueryExecution']['Status'].get(
-                        'StateChangeReason', 'Unknown error'
-                    )
-                    print(f"✗ Query failed: {error_msg}")
-                    return {'status': 'failed', 'error': error_msg}
+                if self._past_deadline():
+                    print("✗ Deadline reached, stopping query")
+                    if self._stop(query_id, location) == 'SUCCEEDED':
+                        return {'status': 'success', 'query_id': query_id}
+                    return {'status': 'cancelled', 'error': 'Deadline reached', 'query_id': query_id}
                 
-                time.sleep(2)
+                time.sleep(delay)
+                delay = min(delay * 1.5, Config.POLL_MAX_INTERVAL)
+                if lease is not None:
+                    self.slots.renew(lease)
             
-            print("✗ Query timeout")
+            print("✗ Query timeout, stopping query")
+            if self._stop(query_id, location) == 'SUCCEEDED':
+                return {'status': 'success', 'query_id': query_id}
             return {'status': 'timeout', 'error': 'Query execution timeout'}
         
         except Exception as e:
             print(f"✗ Query execution error: {str(e)}")
-            return {'status': 'error', 'error': str(e)}
\ No newline at end of file
+            if query_id is not None and self._stop(query_id, location) == 'SUCCEEDED':
+                return {'status': 'success', 'query_id': query_id}
+            return {'status': 'error', 'error': str(e)}
+        
+        finally:
+            if query_id is not None:
+                with self._lock:
+                    self._in_flight.pop(query_id, None)
+            if lease is not None:
+                self.slots.release(lease)
+    
+    def fetch_results(self, query_id: str) -> List[Dict]:
+        """
+        Fetch the result rows of a finished SELECT query.
+        
+        Args:
+            query_id: QueryExecutionId of a succeeded query
+        
+        Returns:
+            List of row dicts keyed by column name, with numeric and
+            boolean columns converted from Athena's string values
+        """
+        paginator = self.athena_client.get_paginator('get_query_results')
+        rows = []
+        columns = None
+        
+        for page in paginator.paginate(QueryExecutionId=query_id):
+            result_set = page['ResultSet']
+            if columns is None:
+                columns = [
+                    (col['Name'], col['Type'])
+                    for col in result_set['ResultSetMetadata']['ColumnInfo']
+                ]
+                page_rows = result_set['Rows'][1:]  # first row is the header
+            else:
+                page_rows = result_set['Rows']
+            
+            for row in page_rows:
+                values = [cell.get('VarCharValue') for cell in row['Data']]
+                rows.append({
+                    name: _convert_value(value, col_type)
+                    for (name, col_type), value in zip(columns, values)
+                })
+        
+        return rows
+
+
+def _convert_value(value: Optional[str], col_type: str):
+    """Convert an Athena VarCharValue to a Python value."""
+    if value is None:
+        return None
+    if col_type in ('tinyint', 'smallint', 'integer', 'bigint'):
+        return int(value)
+    if col_type in ('float', 'real', 'double', 'decimal'):
+        return float(value)
+    if col_type == 'boolean':
+        return value.lower() == 'true'
+    return value
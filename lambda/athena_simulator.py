@@ -0,0 +1,284 @@
+# lambda/athena_simulator.py
+"""
+Athena Simulator Module
+In-process stand-in for the boto3 Athena client, for load-testing
+AthenaExecutor and the pipeline without using Athena quota.
+
+Models:
+    - an active-query limit: queries beyond max_concurrency wait QUEUED
+      (FIFO) until a running query finishes
+    - a queue limit: submissions beyond max_concurrency + max_queued raise
+      TooManyRequestsException, like StartQueryExecution at the account quota
+    - a base queue time and a runtime per query, drawn from distributions
+      matched on the query text (RUNTIME_PROFILE)
+    - ThrottlingException on any API call with throttle_rate probability
+    - FAILED queries with failure_rate probability
+
+Times are simulated seconds; time_scale maps them to wall-clock time
+(0.01 runs a 30 s CTAS in 0.3 s). load_test.py scales the executor's poll
+intervals by the same factor.
+
+    >>> sim = SimulatedAthena(max_concurrency=25, time_scale=0.01, throttle_rate=0.02)
+    >>> executor = AthenaExecutor(bucket='test', athena_client=sim)
+    >>> sim.stats()['api_calls']
+
+Usage: see load_test.py
+"""
+
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+
+Distribution = Callable[[random.Random], float]
+
+
+def fixed(seconds: float) -> Distribution:
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Distribution:
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float) -> Distribution:
+    """Right-skewed runtimes: most queries near the median, a long tail."""
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+# (query pattern, runtime) in simulated seconds; first match wins
+RUNTIME_PROFILE: List[Tuple[str, Distribution]] = [
+    (r'^\s*(DROP|ALTER|MSCK)\b', uniform(0.3, 1.0)),
+    (r'^\s*CREATE\s+(OR\s+REPLACE\s+)?VIEW\b', uniform(0.5, 1.5)),
+    (r'^\s*CREATE\s+EXTERNAL\s+TABLE\b', uniform(0.5, 1.5)),
+    (r'^\s*(CREATE\s+TABLE|INSERT\s+INTO|UNLOAD)\b', lognormal(30.0, 0.5)),
+    (r'^\s*EXPLAIN\b', uniform(0.5, 2.0)),
+    (r'.', lognormal(3.0, 0.7)),
+]
+
+
+class SimulatedAthena:
+    """Thread-safe fake of the Athena client methods AthenaExecutor uses."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 25,
+        max_queued: int = 1000,
+        queue_time: Distribution = uniform(0.1, 0.5),
+        runtime_profile: Optional[List[Tuple[str, Distribution]]] = None,
+        throttle_rate: float = 0.0,
+        failure_rate: float = 0.0,
+        time_scale: float = 1.0,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            max_concurrency: Queries that can be RUNNING at once
+            max_queued: Queries that can wait QUEUED before submissions are rejected
+            queue_time: Base queue time of every query (simulated seconds)
+            runtime_profile: (pattern, distribution) list, defaults to RUNTIME_PROFILE
+            throttle_rate: Probability that an API call raises ThrottlingException
+            failure_rate: Probability that a query ends FAILED
+            time_scale: Wall-clock seconds per simulated second
+            seed: Random seed for reproducible runs
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.queue_time = queue_time
+        self.runtime_profile = [
+            (re.compile(pattern, re.IGNORECASE), dist) for pattern, dist in (runtime_profile or RUNTIME_PROFILE)
+        ]
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+        self.time_scale = time_scale
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._epoch = time.monotonic()
+        self._queries: Dict[str, Dict] = {}
+        self._queue = deque()
+        self._running: Dict[str, float] = {}
+        self.api_calls = Counter()
+        self.throttled = Counter()
+        self.peak_running = 0
+        self.peak_queued = 0
+
+    # -- clock and scheduling -------------------------------------------
+
+    def _now(self) -> float:
+        """Simulated seconds since the simulator was created."""
+        return (time.monotonic() - self._epoch) / self.time_scale
+
+    def _runtime(self, query: str) -> float:
+        for pattern, dist in self.runtime_profile:
+            if pattern.search(query):
+                return max(dist(self._rng), 0.0)
+        return 0.0
+
+    def _start(self, query_id: str, at: float) -> None:
+        record = self._queries[query_id]
+        record['started'] = at
+        record['finished'] = at + record['runtime']
+        self._running[query_id] = record['finished']
+        self.peak_running = max(self.peak_running, len(self._running))
+
+    def _advance(self, now: float) -> None:
+        """Replay finishes and queue promotions up to now, in time order."""
+        while True:
+            # A slot is free: the head of the queue starts once its base queue time has passed
+            if self._queue and len(self._running) < self.max_concurrency:
+                head = self._queries[self._queue[0]]
+                ready = head['submitted'] + head['queue_time']
+                if ready <= now:
+                    self._start(self._queue.popleft(), max(ready, head.get('slot_free', ready)))
+                    continue
+            if not self._running:
+                return
+            query_id, finished = min(self._running.items(), key=lambda item: item[1])
+            if finished > now:
+                return
+            del self._running[query_id]
+            record = self._queries[query_id]
+            record['state'] = 'FAILED' if record['fails'] else 'SUCCEEDED'
+            if self._queue:
+                self._queries[self._queue[0]].setdefault('slot_free', finished)
+
+    def _state(self, record: Dict, now: float) -> str:
+        if record['state'] in ('SUCCEEDED', 'FAILED', 'CANCELLED'):
+            return record['state']
+        return 'RUNNING' if record.get('started') is not None and record['started'] <= now else 'QUEUED'
+
+    def _call(self, operation: str) -> None:
+        """Count an API call and raise ThrottlingException at the configured rate."""
+        with self._lock:
+            self.api_calls[operation] += 1
+            throttled = self.throttle_rate and self._rng.random() < self.throttle_rate
+            if throttled:
+                self.throttled[operation] += 1
+        if throttled:
+            raise ClientError(
+                {'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, operation
+            )
+
+    # -- Athena API -----------------------------------------------------
+
+    def start_query_execution(self, QueryString: str, **kwargs) -> Dict:
+        self._call('StartQueryExecution')
+        with self._lock:
+            now = self._now()
+            self._advance(now)
+            if len(self._queue) >= self.max_queued:
+                raise ClientError(
+                    {'Error': {'Code': 'TooManyRequestsException',
+                               'Message': 'You have exceeded the limit for the number of queries'}},
+                    'StartQueryExecution'
+                )
+            query_id = str(uuid.uuid4())
+            self._queries[query_id] = {
+                'query': QueryString,
+                'state': 'QUEUED',
+                'submitted': now,
+                'queue_time': self.queue_time(self._rng),
+                'runtime': self._runtime(QueryString),
+                'fails': self._rng.random() < self.failure_rate,
+                'started': None,
+                'finished': None,
+            }
+            self._queue.append(query_id)
+            self._advance(now)
+            self.peak_queued = max(self.peak_queued, len(self._queue))
+        return {'QueryExecutionId': query_id}
+
+    def get_query_execution(self, QueryExecutionId: str) -> Dict:
+        self._call('GetQueryExecution')
+        with self._lock:
+            now = self._now()
+            self._advance(now)
+            record = self._queries[QueryExecutionId]
+            state = self._state(record, now)
+            return {'QueryExecution': self._describe(QueryExecutionId, record, state, now)}
+
+    def stop_query_execution(self, QueryExecutionId: str) -> Dict:
+        self._call('StopQueryExecution')
+        with self._lock:
+            now = self._now()
+            self._advance(now)
+            record = self._queries[QueryExecutionId]
+            if self._state(record, now) in ('QUEUED', 'RUNNING'):
+                record['state'] = 'CANCELLED'
+                record['finished'] = now
+                self._running.pop(QueryExecutionId, None)
+                if QueryExecutionId in self._queue:
+                    self._queue.remove(QueryExecutionId)
+                self._advance(now)
+        return {}
+
+    def get_paginator(self, operation: str):
+        if operation != 'get_query_results':
+            raise NotImplementedError(operation)
+        return _ResultPaginator(self)
+
+    def _describe(self, query_id: str, record: Dict, state: str, now: float) -> Dict:
+        epoch = datetime.now() - timedelta(seconds=now * self.time_scale)
+        status = {'State': state, 'SubmissionDateTime': epoch + timedelta(seconds=record['submitted'])}
+        if state == 'FAILED':
+            status['StateChangeReason'] = 'Simulated failure'
+        if state in ('SUCCEEDED', 'FAILED', 'CANCELLED'):
+            status['CompletionDateTime'] = epoch + timedelta(seconds=record['finished'])
+        started = record['started'] if record['started'] is not None and record['started'] <= now else None
+        queued = (started if started is not None else now) - record['submitted']
+        engine = 0.0 if started is None else min(now, record['finished']) - started
+        return {
+            'QueryExecutionId': query_id,
+            'Query': record['query'],
+            'Status': status,
+            'Statistics': {
+                'QueryQueueTimeInMillis': int(queued * 1000),
+                'EngineExecutionTimeInMillis': int(engine * 1000),
+                'TotalExecutionTimeInMillis': int((queued + engine) * 1000),
+                'DataScannedInBytes': 0,
+            },
+        }
+
+    # -- reporting ------------------------------------------------------
+
+    def stats(self) -> Dict:
+        """API call counts and queue/run times of finished queries (simulated seconds)."""
+        with self._lock:
+            self._advance(self._now())
+            finished = [r for r in self._queries.values() if r['state'] in ('SUCCEEDED', 'FAILED')]
+            states = Counter(r['state'] for r in self._queries.values())
+            return {
+                'queries': len(self._queries),
+                'states': dict(states),
+                'api_calls': dict(self.api_calls),
+                'throttled': dict(self.throttled),
+                'peak_running': self.peak_running,
+                'peak_queued': self.peak_queued,
+                'queue_seconds': [r['started'] - r['submitted'] for r in finished],
+                'run_seconds': [r['runtime'] for r in finished],
+            }
+
+
+class _ResultPaginator:
+    """get_query_results pages: a header row and no data."""
+
+    def __init__(self, simulator: SimulatedAthena):
+        self.simulator = simulator
+
+    def paginate(self, QueryExecutionId: str):
+        self.simulator._call('GetQueryResults')
+        yield {
+            'ResultSet': {
+                'ResultSetMetadata': {'ColumnInfo': [{'Name': 'result', 'Type': 'varchar'}]},
+                'Rows': [{'Data': [{'VarCharValue': 'result'}]}],
+            }
+        }
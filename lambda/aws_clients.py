@@ -0,0 +1,60 @@
+# lambda/aws_clients.py
+"""
+AWS Client Registry
+Module-level, lazily created boto3 clients shared across warm Lambda
+invocations. boto3 itself is only imported when the first client is needed.
+"""
+
+import threading
+from typing import Dict, Optional, Tuple
+
+from config import Config
+
+_clients: Dict[Tuple[str, str], object] = {}
+_lock = threading.Lock()
+
+
+def get_client(service: str, region: Optional[str] = None):
+    """
+    Return the shared client for a service, creating it on first use.
+
+    Args:
+        service: boto3 service name ('athena', 's3', ...)
+        region: AWS region (defaults to Config.REGION)
+    """
+    key = (service, region or Config.REGION)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            import boto3
+            from botocore.config import Config as BotoConfig
+
+            client = boto3.client(
+                service,
+                region_name=key[1],
+                endpoint_url=Config.S3_ENDPOINT_URL if service == 's3' else None,
+                config=BotoConfig(
+                    max_pool_connections=Config.CLIENT_MAX_POOL_CONNECTIONS,
+                    connect_timeout=Config.CLIENT_CONNECT_TIMEOUT,
+                    read_timeout=Config.CLIENT_READ_TIMEOUT,
+                    retries={'mode': 'adaptive', 'max_attempts': Config.CLIENT_MAX_ATTEMPTS},
+                )
+            )
+            _clients[key] = client
+    return client
+
+
+def set_client(service: str, client, region: Optional[str] = None) -> None:
+    """Install a client (e.g. a stub for benchmarks or local testing)."""
+    with _lock:
+        _clients[(service, region or Config.REGION)] = client
+
+
+def reset_clients() -> None:
+    """Drop all cached clients."""
+    with _lock:
+        _clients.clear()
@@ -0,0 +1,302 @@
+# lambda/backfill.py
+"""
+Backfill Module
+Rebuilds a month range of a month-partitioned fact table, one partition
+per work unit, with bounded parallelism.
+
+After a fix to the views (e.g. length_of_stay in v_inpatient_claims_etl),
+re-running only the affected months avoids rewriting the rest of the table.
+The raw claims are unpartitioned CSV, so any month filter still reads them
+in full: the requested range is therefore staged once, as a temporary
+table partitioned by claim_month (CTAS over the table's SELECT, filtered
+to the range), and each month then reads only its staged partition:
+
+    1. ALTER TABLE ... DROP IF EXISTS PARTITION (claim_month = YYYYMM)
+    2. clear the partition folder (also removes a failed attempt's files)
+    3. INSERT INTO <table> SELECT * FROM <stage> WHERE claim_month = YYYYMM
+
+so months run in parallel (Config.BACKFILL_WORKERS at a time) and a failed
+month is retried on its own. The stage is dropped and its files deleted at
+the end. Cost: about one full fact build's scan per STAGE_MONTHS months
+(Athena writes at most 100 partitions per statement), plus the staged
+Parquet; preflight (step 'backfill') estimates the staging scan.
+
+The table is created from its SQL file (CTAS ... WITH NO DATA) when it
+doesn't exist yet; the dims it joins must.
+
+Usage:
+    python backfill.py 2009-01 2011-12
+    python backfill.py 2009-06 2009-08 --workers 3 --refresh-views
+    lambda_handler({'step': 'backfill', 'start': '2009-01', 'end': '2011-12'}, None)
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+
+from config import Config
+from parquet_io import clear_directory
+from sampling import output_location
+
+
+PARTITION_COLUMN = 'claim_month'
+
+# Athena's limit on partitions written by one CTAS or INSERT
+STAGE_MONTHS = 100
+
+# Month-partitioned table -> SQL file defining it (CTAS ... WITH NO DATA)
+MONTHLY_TABLES = {
+    'fact_claims_monthly_etl': 'sql/03-facts/fact_claims_monthly_etl.sql',
+}
+
+
+def month_range(start: str, end: str) -> List[str]:
+    """Months 'YYYY-MM' from start to end, inclusive."""
+    first, last = datetime.strptime(start, '%Y-%m'), datetime.strptime(end, '%Y-%m')
+    if last < first:
+        raise ValueError(f"Backfill range ends before it starts: {start} .. {end}")
+    months = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def table_parts(table: str) -> Dict[str, str]:
+    """The CTAS, output location and SELECT body of a monthly table's SQL file."""
+    if table not in MONTHLY_TABLES:
+        raise KeyError(f"Unknown monthly table: {table}")
+    ddl = Config.get_sql_file(MONTHLY_TABLES[table])
+    body = re.split(r'\)\s*AS\s*\n', ddl, maxsplit=1)[1]
+    return {
+        'ddl': ddl,
+        'location': output_location(ddl),
+        'select': re.sub(r'\s*WITH\s+NO\s+DATA\s*;?\s*$', '', body.strip()),
+    }
+
+
+def ensure_table(executor, table: str, database: str = Config.DATABASE) -> bool:
+    """Create the table (no data) if it doesn't exist. Returns True when created."""
+    # A SELECT, not SHOW TABLES: DDL results have no header row for fetch_results to skip
+    res = executor.execute_query(
+        f"SELECT table_name FROM information_schema.tables "
+        f"WHERE table_schema = '{database}' AND table_name = '{table}'"
+    )
+    if res['status'] != 'success':
+        raise Exception(f"Failed: list tables - {res.get('error')}")
+    if executor.fetch_results(res['query_id']):
+        return False
+    res = executor.execute_query(table_parts(table)['ddl'], database, label=f"Create {table}")
+    if res['status'] != 'success':
+        raise Exception(f"Failed: create {table} - {res.get('error')}")
+    return True
+
+
+def month_key(month: str) -> int:
+    """'YYYY-MM' -> the claim_month value YYYYMM."""
+    return int(month.replace('-', ''))
+
+
+def stage_name(table: str, run_id: str) -> str:
+    return f"{table}_stage_{run_id.replace('-', '_').lower()}"
+
+
+def stage_location(run_id: str) -> str:
+    return f"s3://{Config.BUCKET}/{Config.WAREHOUSE_PREFIX}/_backfill/stage/{run_id}/"
+
+
+def create_stage(executor, table: str, months: List[str], run_id: str, database: str = Config.DATABASE) -> str:
+    """
+    Materialize the table's SELECT for the given months into a temporary
+    table partitioned by claim_month, one raw scan per STAGE_MONTHS months.
+
+    Returns:
+        Name of the staging table
+    """
+    parts = table_parts(table)
+    stage = stage_name(table, run_id)
+    location = stage_location(run_id)
+    clear_directory(location)
+
+    for index in range(0, len(months), STAGE_MONTHS):
+        chunk = months[index:index + STAGE_MONTHS]
+        select = (f"SELECT * FROM (\n{parts['select']}\n)\n"
+                  f"WHERE {PARTITION_COLUMN} BETWEEN {month_key(chunk[0])} AND {month_key(chunk[-1])}")
+        if index == 0:
+            query = (f"CREATE TABLE {stage}\n"
+                     f"WITH (\n"
+                     f"    format = 'PARQUET',\n"
+                     f"    parquet_compression = 'SNAPPY',\n"
+                     f"    external_location = '{location}',\n"
+                     f"    partitioned_by = ARRAY['{PARTITION_COLUMN}']\n"
+                     f") AS\n{select}")
+        else:
+            query = f"INSERT INTO {stage}\n{select}"
+        res = executor.execute_query(query, database, label=f"Stage {table} {chunk[0]} .. {chunk[-1]}")
+        if res['status'] != 'success':
+            raise Exception(f"Failed: stage {table} {chunk[0]} .. {chunk[-1]} - {res.get('error')}")
+    return stage
+
+
+def drop_stage(executor, stage: str, run_id: str, database: str = Config.DATABASE) -> None:
+    executor.execute_query(f"DROP TABLE IF EXISTS {stage}", database)
+    clear_directory(stage_location(run_id))
+
+
+def backfill_month(executor, table: str, month: str, stage: str, database: str = Config.DATABASE) -> None:
+    """Replace one month's partition with the staged rows of that month."""
+    parts = table_parts(table)
+    key = month_key(month)
+
+    res = executor.execute_query(
+        f"ALTER TABLE {table} DROP IF EXISTS PARTITION ({PARTITION_COLUMN} = {key})", database
+    )
+    if res['status'] != 'success':
+        raise Exception(f"Failed: drop partition {key} - {res.get('error')}")
+    clear_directory(f"{parts['location'].rstrip('/')}/{PARTITION_COLUMN}={key}/")
+
+    res = executor.execute_query(
+        f"INSERT INTO {table}\nSELECT * FROM {stage}\nWHERE {PARTITION_COLUMN} = {key}",
+        database,
+        label=f"Backfill {table} {month}"
+    )
+    if res['status'] != 'success':
+        raise Exception(f"Failed: {table} {month} - {res.get('error')}")
+
+
+def save_log(record: Dict) -> str:
+    """Store the per-month outcome next to the warehouse tables."""
+    from aws_clients import get_client
+
+    key = f"{Config.WAREHOUSE_PREFIX}/_backfill/{record['run_id']}.json"
+    get_client('s3').put_object(
+        Bucket=Config.BUCKET,
+        Key=key,
+        Body=json.dumps(record, indent=2).encode('utf-8'),
+        ContentType='application/json'
+    )
+    return key
+
+
+def run(
+    start: str,
+    end: str,
+    table: str = 'fact_claims_monthly_etl',
+    workers: int = Config.BACKFILL_WORKERS,
+    retries: int = Config.BACKFILL_RETRIES,
+    refresh_views: bool = False,
+    executor=None,
+    database: str = Config.DATABASE
+) -> Dict:
+    """
+    Backfill every month from start to end.
+
+    Args:
+        start, end: First and last month, 'YYYY-MM'
+        table: Monthly table (see MONTHLY_TABLES)
+        workers: Months running at once
+        retries: Extra attempts per failed month
+        refresh_views: Re-create the views first (after a view fix)
+        executor: AthenaExecutor (created when omitted)
+        database: Athena database
+
+    Returns:
+        Result dict with per-month status; status 'partial' when months failed
+    """
+    months = month_range(start, end)
+    print("=" * 80)
+    print(f"BACKFILL: {table} {months[0]} .. {months[-1]} ({len(months)} months, {workers} at a time)")
+    print("=" * 80)
+
+    if executor is None:
+        from athena_executor import AthenaExecutor
+        executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+    if refresh_views:
+        from etl_pipeline import ClaimsETLPipeline
+        ClaimsETLPipeline(executor).step_views()
+    if ensure_table(executor, table, database):
+        print(f"✓ Created {table}")
+
+    run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    start_time = time.perf_counter()
+    try:
+        stage = create_stage(executor, table, months, run_id, database)
+    except Exception:
+        drop_stage(executor, stage_name(table, run_id), run_id, database)
+        raise
+    stage_seconds = round(time.perf_counter() - start_time, 1)
+    print(f"✓ Staged {len(months)} months in {stage} ({stage_seconds}s)")
+    outcomes: Dict[str, Dict] = {}
+    lock = threading.Lock()
+
+    def work(month: str) -> None:
+        month_start = time.perf_counter()
+        for attempt in range(1, retries + 2):
+            try:
+                backfill_month(executor, table, month, stage, database)
+                outcome = {'status': 'success', 'attempts': attempt}
+                break
+            except Exception as e:
+                outcome = {'status': 'failed', 'attempts': attempt, 'error': str(e)}
+                if attempt <= retries:
+                    print(f"WARNING: {month} attempt {attempt} failed, retrying: {e}")
+                    time.sleep(min(5 * 2 ** (attempt - 1), 60))
+        outcome['seconds'] = round(time.perf_counter() - month_start, 1)
+        with lock:
+            outcomes[month] = outcome
+            mark = '✓' if outcome['status'] == 'success' else '✗'
+            print(f"[{len(outcomes)}/{len(months)}] {mark} {month} in {outcome['seconds']}s"
+                  + (f" ({attempt} attempts)" if attempt > 1 else '')
+                  + (f": {outcome['error']}" if outcome['status'] == 'failed' else ''))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(work, months))
+    finally:
+        drop_stage(executor, stage, run_id, database)
+
+    failed = [month for month in months if outcomes[month]['status'] != 'success']
+    elapsed = time.perf_counter() - start_time
+    print(f"{'✓' if not failed else '✗'} {len(months) - len(failed)}/{len(months)} months in {elapsed:.1f}s"
+          + (f", failed: {', '.join(failed)}" if failed else ''))
+
+    record = {
+        'run_id': run_id,
+        'table': table,
+        'start': months[0],
+        'end': months[-1],
+        'workers': workers,
+        'stage_seconds': stage_seconds,
+        'months': {month: outcomes[month] for month in months},
+        'failed': failed,
+        'seconds': round(elapsed, 1),
+        'completed_at': str(datetime.now()),
+    }
+    print(f"✓ Logged to s3://{Config.BUCKET}/{save_log(record)}")
+    return {'status': 'partial' if failed else 'success', **record}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a month range of a month-partitioned fact table")
+    parser.add_argument('start', help="First month, YYYY-MM")
+    parser.add_argument('end', help="Last month, YYYY-MM")
+    parser.add_argument('--table', choices=sorted(MONTHLY_TABLES), default='fact_claims_monthly_etl')
+    parser.add_argument('--workers', type=int, default=Config.BACKFILL_WORKERS)
+    parser.add_argument('--retries', type=int, default=Config.BACKFILL_RETRIES)
+    parser.add_argument('--refresh-views', action='store_true', help="Re-create the views first")
+    args = parser.parse_args()
+
+    result = run(args.start, args.end, args.table, args.workers, args.retries, args.refresh_views)
+    if result['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+# lambda/batch_scoring.py
+"""
+Batch Scoring Module
+Sharded provider risk scoring across a process pool.
+
+Providers are split into contiguous provider_sk ranges, one per shard. Each
+worker reads only its range of fact_claims_etl (a min/max predicate pushed
+down into the Parquet scan) and writes its own output file; the parent only
+exchanges small moment dictionaries with the workers. With the fact sorted
+by provider_sk (compaction.py's clustering), row-group statistics let each
+worker skip the other shards' row groups instead of decoding the whole table.
+
+    Phase 1  per shard: provider aggregates -> staging Parquet,
+             return global claim-amount moments + provider_type peer moments
+    Phase 2  per shard: risk_level (dim_provider_etl logic) + peer z-scores
+             -> <out>/part-<shard>.parquet
+
+Usage:
+    python batch_scoring.py                               # all cores, warehouse S3
+    python batch_scoring.py --workers 8 --shards 32
+    python batch_scoring.py --claims ./extract/fact_claims --providers ./extract/dim_provider \\
+        --out ./out/provider_scores/
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from config import Config
+from group_stats import encode_groups
+from parquet_io import clear_directory, read_table, table_uri, write_table
+
+
+CLAIM_COLUMNS = ['provider_sk', 'patient_sk', 'claim_type', 'claim_amount']
+
+# Same labels as dim_provider_etl.provider_type
+PROVIDER_TYPES = ['Hospital Only', 'Clinic Only', 'Primarily Hospital', 'Primarily Clinic', 'Mixed']
+
+OUTPUT_SCHEMA = pa.schema([
+    ('provider_sk', pa.int64()),
+    ('provider_id', pa.string()),
+    ('total_claims', pa.int64()),
+    ('total_patients', pa.int64()),
+    ('total_amount', pa.float64()),
+    ('avg_claim_amount', pa.float64()),
+    ('claims_per_patient', pa.float64()),
+    ('provider_type', pa.string()),
+    ('risk_level', pa.string()),
+    ('amount_peer_z', pa.float64()),
+    ('volume_peer_z', pa.float64()),
+    ('risk_score', pa.float64()),
+    ('run_shard', pa.int32()),
+])
+
+
+def shard_ranges(provider_sks: np.ndarray, n_shards: int) -> List[Tuple[int, int]]:
+    """Contiguous (first, last) provider_sk ranges with about equal provider counts."""
+    parts = np.array_split(np.unique(provider_sks), n_shards)
+    return [(int(part[0]), int(part[-1])) for part in parts if len(part)]
+
+
+def _in_range(sk_range: Tuple[int, int]):
+    """provider_sk range predicate; prunes row groups by their min/max statistics."""
+    first, last = sk_range
+    return (ds.field('provider_sk') >= first) & (ds.field('provider_sk') <= last)
+
+
+def _moments(values: np.ndarray) -> List[float]:
+    return [float(len(values)), float(values.sum()), float(np.square(values).sum())]
+
+
+def _mean_std(moments: List[float]):
+    """Mean and sample standard deviation (Athena's STDDEV) from [n, sum, sumsq]."""
+    n, total, total_sq = moments
+    if n == 0:
+        return 0.0, 0.0
+    mean = total / n
+    var = (total_sq - total * total / n) / (n - 1) if n > 1 else 0.0
+    return mean, float(np.sqrt(max(var, 0.0)))
+
+
+def _provider_type(inpatient: np.ndarray, outpatient: np.ndarray) -> np.ndarray:
+    """Vectorized copy of dim_provider_etl's provider_type CASE."""
+    return np.select(
+        [
+            (inpatient > 0) & (outpatient == 0),
+            (inpatient == 0) & (outpatient > 0),
+            inpatient > outpatient,
+            outpatient > inpatient,
+        ],
+        PROVIDER_TYPES[:4],
+        default=PROVIDER_TYPES[4],
+    )
+
+
+def aggregate_shard(
+    shard: int,
+    sk_range: Tuple[int, int],
+    claims_path: str,
+    stage_dir: str
+) -> Dict:
+    """
+    Phase 1: aggregate one shard's claims per provider.
+
+    Returns:
+        Dict with shard, providers, claims, global claim-amount moments and
+        per provider_type moments of avg_claim_amount and claims_per_patient
+    """
+    claims = read_table(claims_path, columns=CLAIM_COLUMNS, filter=_in_range(sk_range))
+    provider = claims.column('provider_sk').to_numpy().astype(np.int64)
+    patient = claims.column('patient_sk').fill_null(0).to_numpy().astype(np.int64)
+    amount = claims.column('claim_amount').fill_null(0).to_numpy().astype(np.float64)
+    inpatient_claim = pc.equal(claims.column('claim_type'), 'Inpatient').fill_null(False).to_numpy()
+
+    group_ids, n_groups = encode_groups(provider)
+    first = np.zeros(n_groups, dtype=np.int64)
+    first[group_ids] = np.arange(len(provider))
+
+    total_claims = np.bincount(group_ids, minlength=n_groups)
+    total_amount = np.bincount(group_ids, weights=amount, minlength=n_groups)
+    inpatient = np.bincount(group_ids, weights=inpatient_claim, minlength=n_groups).astype(np.int64)
+    pairs = np.unique(np.stack([group_ids, patient]), axis=1)
+    total_patients = np.bincount(pairs[0], minlength=n_groups)
+
+    avg_amount = total_amount / np.maximum(total_claims, 1)
+    per_patient = total_claims / np.maximum(total_patients, 1)
+    provider_type = _provider_type(inpatient, total_claims - inpatient)
+
+    stage = pa.table({
+        'provider_sk': provider[first],
+        'total_claims': total_claims.astype(np.int64),
+        'total_patients': total_patients.astype(np.int64),
+        'total_amount': total_amount,
+        'avg_claim_amount': avg_amount,
+        'claims_per_patient': per_patient,
+        'provider_type': provider_type,
+    })
+    write_table(stage, os.path.join(stage_dir, f"stage-{shard:05d}.parquet"))
+
+    peers = {}
+    for ptype in PROVIDER_TYPES:
+        mask = provider_type == ptype
+        peers[ptype] = {
+            'amount': _moments(avg_amount[mask]),
+            'volume': _moments(per_patient[mask]),
+        }
+    return {
+        'shard': shard,
+        'providers': int(n_groups),
+        'claims': int(len(amount)),
+        'claim_amount': _moments(amount),
+        'peers': peers,
+    }
+
+
+def score_shard(
+    shard: int,
+    sk_range: Tuple[int, int],
+    providers_path: str,
+    stage_dir: str,
+    out_dir: str,
+    global_stats: Dict,
+    peer_stats: Dict
+) -> Dict:
+    """Phase 2: risk level and peer z-scores for one shard, written to its own file."""
+    stage = read_table(os.path.join(stage_dir, f"stage-{shard:05d}.parquet"))
+    provider_sk = stage.column('provider_sk').to_numpy()
+
+    dims = read_table(
+        providers_path,
+        columns=['provider_sk', 'provider_id', 'is_fraudulent'],
+        filter=_in_range(sk_range)
+    )
+    order = np.argsort(dims.column('provider_sk').to_numpy())
+    dim_sk = dims.column('provider_sk').to_numpy()[order]
+    position = np.searchsorted(dim_sk, provider_sk)
+    position = np.minimum(position, max(len(dim_sk) - 1, 0))
+    found = dim_sk[position] == provider_sk if len(dim_sk) else np.zeros(len(provider_sk), bool)
+    provider_id = np.where(found, dims.column('provider_id').to_numpy(zero_copy_only=False)[order][position], None)
+    fraud = np.where(
+        found, dims.column('is_fraudulent').fill_null(False).to_numpy(zero_copy_only=False)[order][position], False
+    ).astype(bool)
+
+    avg_amount = stage.column('avg_claim_amount').to_numpy()
+    per_patient = stage.column('claims_per_patient').to_numpy()
+    provider_type = stage.column('provider_type').to_numpy(zero_copy_only=False)
+
+    # dim_provider_etl.risk_level thresholds: claim-level mean + 1/2 stddev
+    mean, std = global_stats['mean'], global_stats['std']
+    risk_level = np.select(
+        [fraud, avg_amount > mean + 2 * std, avg_amount > mean + std],
+        ['Confirmed Fraud', 'High Risk', 'Medium Risk'],
+        default='Low Risk',
+    )
+
+    peer_mean = {k: np.array([peer_stats[t][k][0] for t in PROVIDER_TYPES]) for k in ('amount', 'volume')}
+    peer_std = {k: np.array([peer_stats[t][k][1] for t in PROVIDER_TYPES]) for k in ('amount', 'volume')}
+    type_index = pc.index_in(pa.array(provider_type, pa.string()), value_set=pa.array(PROVIDER_TYPES)).to_numpy()
+
+    def peer_z(values, key):
+        std_ = peer_std[key][type_index]
+        return np.where(std_ > 0, (values - peer_mean[key][type_index]) / np.where(std_ > 0, std_, 1), 0.0)
+
+    amount_z = peer_z(avg_amount, 'amount')
+    volume_z = peer_z(per_patient, 'volume')
+    # 0 at or below the peer mean, 1 once the two excesses add up to 6 sigma
+    risk_score = np.clip((np.maximum(amount_z, 0) + np.maximum(volume_z, 0)) / 6, 0, 1)
+
+    table = pa.table({
+        'provider_sk': provider_sk.astype(np.int64),
+        'provider_id': pa.array(provider_id, pa.string()),
+        'total_claims': stage.column('total_claims'),
+        'total_patients': stage.column('total_patients'),
+        'total_amount': stage.column('total_amount'),
+        'avg_claim_amount': avg_amount,
+        'claims_per_patient': per_patient,
+        'provider_type': provider_type,
+        'risk_level': risk_level,
+        'amount_peer_z': amount_z,
+        'volume_peer_z': volume_z,
+        'risk_score': risk_score,
+        'run_shard': np.full(len(provider_sk), shard, dtype=np.int32),
+    }, schema=OUTPUT_SCHEMA)
+    write_table(table, f"{out_dir.rstrip('/')}/part-{shard:05d}.parquet")
+    return {'shard': shard, 'providers': table.num_rows}
+
+
+def _combine(results: List[Dict]) -> Dict:
+    """Reduce the phase-1 moment dicts into global and peer (mean, std)."""
+    claim_moments = np.sum([r['claim_amount'] for r in results], axis=0).tolist()
+    mean, std = _mean_std(claim_moments)
+    peers = {}
+    for ptype in PROVIDER_TYPES:
+        peers[ptype] = {
+            key: _mean_std(np.sum([r['peers'][ptype][key] for r in results], axis=0).tolist())
+            for key in ('amount', 'volume')
+        }
+    return {'global': {'mean': mean, 'std': std}, 'peers': peers}
+
+
+def run(
+    claims_path: str,
+    providers_path: str,
+    out_dir: str,
+    n_shards: int,
+    workers: Optional[int] = None,
+    stage_dir: Optional[str] = None
+) -> Dict:
+    """
+    Score every provider across a process pool.
+
+    Returns:
+        Dict with status, providers, claims, shards and timings
+    """
+    print("=" * 80)
+    print("BATCH PROVIDER SCORING")
+    print("=" * 80)
+    start = time.perf_counter()
+
+    providers = read_table(providers_path, columns=['provider_sk'])
+    ranges = shard_ranges(providers.column('provider_sk').to_numpy().astype(np.int64), n_shards)
+    shard_members = dict(enumerate(ranges))
+
+    own_stage = stage_dir is None
+    stage_dir = stage_dir or tempfile.mkdtemp(prefix='provider_scores_')
+    clear_directory(out_dir)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            phase1 = list(pool.map(
+                aggregate_shard,
+                list(shard_members),
+                list(shard_members.values()),
+                [claims_path] * len(shard_members),
+                [stage_dir] * len(shard_members),
+            ))
+            stats = _combine(phase1)
+            aggregated = time.perf_counter()
+            print(f"✓ Phase 1: {len(phase1)} shards aggregated in {aggregated - start:.1f}s "
+                  f"(claim mean {stats['global']['mean']:.2f}, std {stats['global']['std']:.2f})")
+
+            phase2 = list(pool.map(
+                score_shard,
+                list(shard_members),
+                list(shard_members.values()),
+                [providers_path] * len(shard_members),
+                [stage_dir] * len(shard_members),
+                [out_dir] * len(shard_members),
+                [stats['global']] * len(shard_members),
+                [stats['peers']] * len(shard_members),
+            ))
+    finally:
+        if own_stage:
+            shutil.rmtree(stage_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    result = {
+        'status': 'success',
+        'providers': sum(r['providers'] for r in phase2),
+        'claims': sum(r['claims'] for r in phase1),
+        'shards': len(phase2),
+        'elapsed_s': elapsed,
+        'output': out_dir,
+    }
+    print(f"✓ Scored {result['providers']:,} providers ({result['claims']:,} claims) in {elapsed:.1f}s")
+    return result
+
+
+def register_table() -> Dict:
+    """Create the Athena table over the shard files."""
+    from athena_executor import AthenaExecutor
+
+    executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+    return executor.execute_query(
+        Config.get_sql_file('sql/05-scoring/provider_scores_etl.sql'),
+        Config.DATABASE,
+        label='Register provider_scores_etl'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded provider batch scoring")
+    parser.add_argument('--claims', default=table_uri('fact_claims_etl'))
+    parser.add_argument('--providers', default=table_uri('dim_provider_etl'))
+    parser.add_argument('--out', default=table_uri('provider_scores_etl'))
+    parser.add_argument('--workers', type=int, default=None, help="Default: all cores")
+    parser.add_argument('--shards', type=int, default=None, help="Default: 4 x workers")
+    parser.add_argument('--stage-dir', default=None, help="Phase 1 staging (default: temp dir)")
+    parser.add_argument('--register', action='store_true', help="Create the Athena table")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    run(args.claims, args.providers, args.out, args.shards or 4 * workers, workers, args.stage_dir)
+
+    if args.register:
+        res = register_table()
+        if res['status'] != 'success':
+            raise Exception(f"Failed: provider_scores_etl - {res.get('error')}")
+
+
+if __name__ == '__main__':
+    main()
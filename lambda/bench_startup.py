@@ -0,0 +1,137 @@
+# lambda/bench_startup.py
+"""
+Startup Benchmark
+Measures cold vs warm lambda_handler latency for the short pipeline triggers.
+
+Each cold sample runs in a fresh interpreter (module import + first
+invocation); warm samples reuse that interpreter, like a warm Lambda
+container. By default Athena and S3 are replaced with in-process stubs so
+the numbers isolate our own startup cost; pass --live to hit AWS.
+
+Usage:
+    python bench_startup.py                        # validate + views, stubbed
+    python bench_startup.py --steps validate --cold-runs 5 --warm-runs 20
+    python bench_startup.py --live --steps validate
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+
+class _StubAthena:
+    """Minimal Athena client: every query succeeds after a fixed latency."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._started = {}
+
+    def start_query_execution(self, **kwargs):
+        query_id = uuid.uuid4().hex
+        self._started[query_id] = time.monotonic()
+        return {'QueryExecutionId': query_id}
+
+    def get_query_execution(self, QueryExecutionId):
+        done = time.monotonic() - self._started[QueryExecutionId] >= self.latency
+        state = 'SUCCEEDED' if done else 'RUNNING'
+        return {'QueryExecution': {'Status': {'State': state}}}
+
+
+class _StubS3:
+    def put_object(self, **kwargs):
+        return {}
+
+
+def _child(step: str, warm_runs: int, live: bool, latency: float) -> None:
+    """Run inside a fresh interpreter and print one JSON result line."""
+    t0 = time.perf_counter()
+    import etl_pipeline
+    import_s = time.perf_counter() - t0
+
+    if not live:
+        from aws_clients import set_client
+        set_client('athena', _StubAthena(latency))
+        set_client('s3', _StubS3())
+
+    def invoke() -> float:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = etl_pipeline.lambda_handler({'step': step}, None)
+        if result.get('statusCode') != 200:
+            raise RuntimeError(f"Invocation failed: {result.get('error')}")
+        return time.perf_counter() - start
+
+    first_s = invoke()
+    warm = [invoke() for _ in range(warm_runs)]
+    print(json.dumps({'import_s': import_s, 'first_s': first_s, 'warm_s': warm}))
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_benchmark(steps, cold_runs: int, warm_runs: int, live: bool, latency: float) -> dict:
+    """Collect cold and warm timings for each step."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    report = {}
+
+    for step in steps:
+        cold_import, cold_first, warm = [], [], []
+        for _ in range(cold_runs):
+            cmd = [
+                sys.executable, os.path.abspath(__file__), '--child',
+                '--steps', step, '--warm-runs', str(warm_runs),
+                '--stub-latency', str(latency),
+            ]
+            if live:
+                cmd.append('--live')
+            out = subprocess.run(cmd, cwd=here, capture_output=True, text=True, check=True)
+            sample = json.loads(out.stdout.strip().splitlines()[-1])
+            cold_import.append(sample['import_s'])
+            cold_first.append(sample['import_s'] + sample['first_s'])
+            warm.extend(sample['warm_s'])
+
+        report[step] = {
+            'cold_import_ms': statistics.median(cold_import) * 1000,
+            'cold_invoke_ms': statistics.median(cold_first) * 1000,
+            'warm_p50_ms': statistics.median(warm) * 1000 if warm else None,
+            'warm_p95_ms': _percentile(warm, 95) * 1000 if warm else None,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold vs warm Lambda startup benchmark")
+    parser.add_argument('--steps', nargs='+', default=['validate', 'views'])
+    parser.add_argument('--cold-runs', type=int, default=3)
+    parser.add_argument('--warm-runs', type=int, default=10)
+    parser.add_argument('--stub-latency', type=float, default=0.0,
+                        help="Seconds each stubbed query takes to finish")
+    parser.add_argument('--live', action='store_true', help="Use real Athena/S3")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.steps[0], args.warm_runs, args.live, args.stub_latency)
+        return
+
+    report = run_benchmark(args.steps, args.cold_runs, args.warm_runs, args.live, args.stub_latency)
+    print(f"{'step':<10} {'cold import':>12} {'cold invoke':>12} {'warm p50':>10} {'warm p95':>10}")
+    for step, r in report.items():
+        print(
+            f"{step:<10} {r['cold_import_ms']:>10.1f}ms {r['cold_invoke_ms']:>10.1f}ms "
+            f"{r['warm_p50_ms']:>8.1f}ms {r['warm_p95_ms']:>8.1f}ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+# lambda/claim_rules.py
+"""
+Claim Rules Module
+Vectorized claim-level red flags (docs/fraud-patterns.md section 9.2).
+
+Loads fact_claims_etl, the per-claim procedure codes of claim_codes_etl and
+the patient, diagnosis and procedure dimensions from Parquet into NumPy
+arrays, evaluates every rule as a boolean mask in
+one pass and writes one row per claim:
+
+    claim_sk, rule_flags (bitmask of RULES), rule_score (0-1, weighted)
+
+Usage:
+    python claim_rules.py                                  # read/write warehouse S3
+    python claim_rules.py --claims ./extract/fact_claims --out ./out/claim_rule_flags/
+    python claim_rules.py --register                       # also create the Athena table
+"""
+
+import argparse
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config import Config
+from group_stats import encode_groups, group_counts, group_mad, group_median
+from parquet_io import clean_codes, date_keys_to_days, flatten_list_column, read_table, table_uri, write_table
+
+
+# Rule name -> (bit, weight, description)
+RULES = {
+    'HIGH_AMOUNT': (0, 1.0, "Claim amount above the high-amount threshold"),
+    'AMOUNT_OUTLIER': (1, 2.0, "Amount far above diagnosis peers (log median + k * MAD)"),
+    'MINOR_DX_MAJOR_PX': (2, 2.0, "Low-risk diagnosis billed with a major or very expensive procedure"),
+    'MANY_PROCEDURES': (3, 1.5, "Many distinct procedure codes on one claim"),
+    'AFTER_DEATH': (4, 3.0, "Service starts after the patient's date of death"),
+}
+
+DEFAULT_PARAMS = {
+    'high_amount': 10000.0,     # section 9.2: claim amount > $10,000
+    'outlier_k': 3.5,           # robust z threshold on log amounts
+    'min_peers': 20,            # smaller diagnosis groups are not scored for outliers
+    'many_procedures': 4,       # section 9.2: 4+ procedures in one claim
+}
+
+# ICD-9 chapter treated as a minor diagnosis regardless of its risk level
+MINOR_DIAGNOSIS_CHAPTERS = ['Symptoms, Signs and Ill-Defined Conditions']
+
+CLAIM_COLUMNS = [
+    'claim_sk', 'patient_sk', 'claim_start_date_key',
+    'claim_amount', 'diagnosis_code_1', 'procedure_code_1',
+]
+
+OUTPUT_SCHEMA = pa.schema([
+    ('claim_sk', pa.int64()),
+    ('rule_flags', pa.int32()),
+    ('rule_score', pa.float64()),
+])
+
+
+def _lookup(codes: pa.Array, dim: pa.Table, key: str) -> np.ndarray:
+    """Row index of each code in the dimension, -1 when not found."""
+    index = pc.index_in(codes, value_set=clean_codes(dim.column(key)))
+    return index.fill_null(-1).to_numpy(zero_copy_only=False)
+
+
+def procedure_counts(claim_sk: np.ndarray, codes: pa.Table) -> np.ndarray:
+    """
+    Distinct procedure codes per claim, aligned to claim_sk (0 for claims
+    missing from claim_codes_etl).
+    """
+    rows, values = flatten_list_column(codes.column('procedure_codes'))
+    encoded = pc.dictionary_encode(values)
+    px_code = encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+    keep = px_code >= 0
+
+    # Distinct codes per row: count unique (row, code) pairs
+    n_codes = max(len(encoded.dictionary), 1)
+    pairs = np.unique(rows[keep] * n_codes + px_code[keep])
+    per_row = np.bincount(pairs // n_codes, minlength=codes.num_rows)
+
+    # claim_sk is a dense ROW_NUMBER, so the counts are a direct array lookup
+    codes_sk = codes.column('claim_sk').fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+    size = int(max(codes_sk.max(initial=-1), claim_sk.max(initial=-1))) + 1
+    by_sk = np.zeros(size, dtype=np.int64)
+    valid = codes_sk >= 0
+    by_sk[codes_sk[valid]] = per_row[valid]
+    return np.where(claim_sk >= 0, by_sk[np.maximum(claim_sk, 0)], 0)
+
+
+def load_inputs(
+    claims_path: str,
+    codes_path: str,
+    patients_path: str,
+    diagnoses_path: str,
+    procedures_path: str
+) -> Dict[str, np.ndarray]:
+    """
+    Read the rule inputs and resolve the dimension lookups into
+    claim-aligned NumPy arrays.
+    """
+    claims = read_table(claims_path, columns=CLAIM_COLUMNS)
+    codes = read_table(codes_path, columns=['claim_sk', 'procedure_codes'])
+    patients = read_table(patients_path, columns=['patient_sk', 'date_of_death'])
+    diagnoses = read_table(diagnoses_path, columns=['diagnosis_code', 'icd9_chapter', 'risk_level'])
+    procedures = read_table(procedures_path, columns=['procedure_code', 'is_major_procedure', 'cost_category'])
+
+    dx_codes = clean_codes(claims.column('diagnosis_code_1'))
+    px_codes = clean_codes(claims.column('procedure_code_1'))
+
+    # Diagnosis/procedure attributes, gathered per claim
+    dx_index = _lookup(dx_codes, diagnoses, 'diagnosis_code')
+    dx_minor = (
+        pc.equal(diagnoses.column('risk_level'), 'Low').to_numpy(zero_copy_only=False)
+        | pc.is_in(diagnoses.column('icd9_chapter'),
+                   value_set=pa.array(MINOR_DIAGNOSIS_CHAPTERS)).to_numpy(zero_copy_only=False)
+    )
+    px_index = _lookup(px_codes, procedures, 'procedure_code')
+    px_major = (
+        procedures.column('is_major_procedure').fill_null(False).to_numpy(zero_copy_only=False)
+        | pc.equal(procedures.column('cost_category'), 'Very High').fill_null(False).to_numpy(zero_copy_only=False)
+    )
+
+    # patient_sk is a dense ROW_NUMBER, so date_of_death is a direct array lookup
+    patient_sk = patients.column('patient_sk').to_numpy(zero_copy_only=False).astype(np.int64)
+    death_by_sk = np.full(patient_sk.max() + 1 if len(patient_sk) else 1, np.datetime64('NaT'), 'datetime64[D]')
+    death_by_sk[patient_sk] = np.asarray(
+        patients.column('date_of_death').to_numpy(zero_copy_only=False), dtype='datetime64[D]'
+    )
+    claim_patient = claims.column('patient_sk').fill_null(0).to_numpy(zero_copy_only=False).astype(np.int64)
+    in_range = (claim_patient >= 0) & (claim_patient < len(death_by_sk))
+
+    date_of_death = np.full(len(claim_patient), np.datetime64('NaT'), 'datetime64[D]')
+    date_of_death[in_range] = death_by_sk[claim_patient[in_range]]
+
+    claim_sk = claims.column('claim_sk').fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+
+    return {
+        'claim_sk': claim_sk,
+        'claim_start': date_keys_to_days(
+            claims.column('claim_start_date_key').fill_null(0).to_numpy(zero_copy_only=False)
+        ),
+        'claim_amount': claims.column('claim_amount').fill_null(0).to_numpy(zero_copy_only=False).astype(np.float64),
+        'dx_code': pc.dictionary_encode(dx_codes).indices.fill_null(-1).to_numpy(zero_copy_only=False),
+        'procedure_count': procedure_counts(claim_sk, codes),
+        'dx_minor': np.where(dx_index >= 0, dx_minor[np.maximum(dx_index, 0)], False),
+        'px_major': np.where(px_index >= 0, px_major[np.maximum(px_index, 0)], False),
+        'date_of_death': date_of_death,
+    }
+
+
+def amount_outliers(dx_code: np.ndarray, amount: np.ndarray, k: float, min_peers: int) -> np.ndarray:
+    """
+    Claims whose log amount exceeds their diagnosis group's median + k * scaled MAD.
+
+    Amounts are right-skewed, so the robust z-score is taken on log1p(amount).
+    """
+    has_dx = dx_code >= 0
+    result = np.zeros(len(amount), dtype=bool)
+    if not has_dx.any():
+        return result
+    group_ids, n_groups = encode_groups(dx_code[has_dx])
+    values = np.log1p(np.maximum(amount[has_dx], 0))
+
+    medians = group_median(group_ids, values, n_groups)
+    mads = group_mad(group_ids, values, n_groups, medians) * 1.4826
+    counts = group_counts(group_ids, n_groups)
+
+    # A zero MAD (most peers bill the same amount) would flag any difference
+    scale = np.where(mads > 0, mads, np.nan)
+    with np.errstate(invalid='ignore'):
+        outlier = (values - medians[group_ids]) > k * scale[group_ids]
+    outlier &= counts[group_ids] >= min_peers
+
+    result[has_dx] = outlier
+    return result
+
+
+def evaluate_rules(arrays: Dict[str, np.ndarray], params: Optional[Dict] = None) -> pa.Table:
+    """
+    Evaluate every rule and build the output table.
+
+    Args:
+        arrays: Output of load_inputs
+        params: Overrides for DEFAULT_PARAMS
+
+    Returns:
+        Arrow table with claim_sk, rule_flags, rule_score
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    amount = arrays['claim_amount']
+
+    masks = {
+        'HIGH_AMOUNT': amount > params['high_amount'],
+        'AMOUNT_OUTLIER': amount_outliers(
+            arrays['dx_code'], amount, params['outlier_k'], params['min_peers']
+        ),
+        'MINOR_DX_MAJOR_PX': arrays['dx_minor'] & arrays['px_major'],
+        'MANY_PROCEDURES': arrays['procedure_count'] >= params['many_procedures'],
+        'AFTER_DEATH': arrays['claim_start'] > arrays['date_of_death'],  # NaT compares False
+    }
+
+    flags = np.zeros(len(amount), dtype=np.int32)
+    score = np.zeros(len(amount), dtype=np.float64)
+    total_weight = sum(weight for _, weight, _ in RULES.values())
+    for name, (bit, weight, _) in RULES.items():
+        flags |= masks[name].astype(np.int32) << bit
+        score += masks[name] * weight
+        print(f"  {name:<20} {int(masks[name].sum()):>10,} claims")
+
+    return pa.table({
+        'claim_sk': arrays['claim_sk'],
+        'rule_flags': flags,
+        'rule_score': score / total_weight,
+    }, schema=OUTPUT_SCHEMA)
+
+
+def run(
+    claims_path: str,
+    codes_path: str,
+    patients_path: str,
+    diagnoses_path: str,
+    procedures_path: str,
+    out_path: str,
+    params: Optional[Dict] = None
+) -> Dict:
+    """Load, evaluate and write the claim rule flags."""
+    print("=" * 80)
+    print("CLAIM RULES")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    arrays = load_inputs(claims_path, codes_path, patients_path, diagnoses_path, procedures_path)
+    loaded = time.perf_counter()
+    print(f"✓ Loaded {len(arrays['claim_sk']):,} claims in {loaded - start:.1f}s")
+
+    table = evaluate_rules(arrays, params)
+    evaluated = time.perf_counter()
+    print(f"✓ Evaluated {len(RULES)} rules in {evaluated - loaded:.2f}s")
+
+    write_table(table, out_path)
+    flagged = int(pc.sum(pc.not_equal(table.column('rule_flags'), 0)).as_py() or 0)
+    return {
+        'status': 'success',
+        'claims': table.num_rows,
+        'flagged_claims': flagged,
+        'output': out_path,
+    }
+
+
+def register_table() -> Dict:
+    """Create the Athena table over the written flags."""
+    from athena_executor import AthenaExecutor
+
+    executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+    return executor.execute_query(
+        Config.get_sql_file('sql/05-scoring/claim_rule_flags_etl.sql'),
+        Config.DATABASE,
+        label='Register claim_rule_flags_etl'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized claim-level fraud rules")
+    parser.add_argument('--claims', default=table_uri('fact_claims_etl'))
+    parser.add_argument('--codes', default=table_uri('claim_codes_etl'))
+    parser.add_argument('--patients', default=table_uri('dim_patient_etl'))
+    parser.add_argument('--diagnoses', default=table_uri('dim_diagnosis_etl'))
+    parser.add_argument('--procedures', default=table_uri('dim_procedure_etl'))
+    parser.add_argument('--out', default=table_uri('claim_rule_flags_etl'))
+    parser.add_argument('--high-amount', type=float, default=DEFAULT_PARAMS['high_amount'])
+    parser.add_argument('--outlier-k', type=float, default=DEFAULT_PARAMS['outlier_k'])
+    parser.add_argument('--min-peers', type=int, default=DEFAULT_PARAMS['min_peers'])
+    parser.add_argument('--many-procedures', type=int, default=DEFAULT_PARAMS['many_procedures'])
+    parser.add_argument('--register', action='store_true', help="Create the Athena table")
+    args = parser.parse_args()
+
+    params = {
+        'high_amount': args.high_amount,
+        'outlier_k': args.outlier_k,
+        'min_peers': args.min_peers,
+        'many_procedures': args.many_procedures,
+    }
+    result = run(args.claims, args.codes, args.patients, args.diagnoses, args.procedures, args.out, params)
+    print(f"✓ {result['flagged_claims']:,} of {result['claims']:,} claims flagged")
+
+    if args.register:
+        res = register_table()
+        if res['status'] != 'success':
+            raise Exception(f"Failed: claim_rule_flags_etl - {res.get('error')}")
+
+
+if __name__ == '__main__':
+    main()
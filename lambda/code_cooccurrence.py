@@ -0,0 +1,337 @@
+# lambda/code_cooccurrence.py
+"""
+Code Co-occurrence Module
+Diagnosis x procedure co-occurrence counts and rare-combination scores
+(docs/fraud-patterns.md Pattern 3: Rare Diagnosis-Procedure Combinations).
+
+Streams claim_codes_etl in record batches. Every claim contributes each
+distinct (diagnosis_sk, procedure_sk) pair of its code sets once; the pairs
+are reduced to a sparse CSR count matrix indexed by the dimensions'
+surrogate keys. With N claims that have both kinds of codes:
+
+    lift = count(dx, px) * N / (count(dx) * count(px))
+    PMI  = log(lift)
+    NPMI = PMI / -log(count(dx, px) / N)    -1 never together, 0 independent, 1 always
+
+NPMI alone misses pairs that are rare outright: two rare codes seen together
+once have a high lift and NPMI near 1. Absolute rarity is scored too:
+
+    pair_rarity  = -log(count(dx, px) / N) / log(N)    1 billed once, 0 on every claim
+    rarity_score = max(max(0, -NPMI), pair_rarity)
+
+Each claim is scored by its highest-scoring pair, written to
+claim_code_rarity_etl. Claims without at least one mapped diagnosis and
+procedure get no row. A pair that is clinically implausible but billed
+often in this dataset (Pattern 3's examples run to 1,000+ claims) can score
+low on both, since the counts are the only baseline; flagging those needs
+an external reference of expected pairs.
+
+The matrix is saved as a scipy.sparse-compatible .npz (scipy.sparse.load_npz
+reads it): rows are diagnosis_sk, columns procedure_sk, data are claim
+counts. pmi/lift (aligned with data) and the marginals are stored alongside.
+
+Usage:
+    python code_cooccurrence.py                            # read/write warehouse S3
+    python code_cooccurrence.py --codes ./extract/claim_codes --diagnoses ./extract/dim_diagnosis \\
+        --procedures ./extract/dim_procedure --out ./out/claim_code_rarity/ --matrix-out ./out/dx_px.npz
+    python code_cooccurrence.py --register
+"""
+
+import argparse
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config import Config
+from group_stats import unique_sorted
+from parquet_io import (
+    clean_codes, flatten_list_column, open_dataset, read_table, table_uri, write_npz, write_table
+)
+
+
+DEFAULT_BATCH_SIZE = 200_000
+
+DEFAULT_MATRIX_URI = (
+    f"s3://{Config.BUCKET}/{Config.WAREHOUSE_PREFIX}/scoring_tables/code_cooccurrence_matrix/dx_px_counts.npz"
+)
+
+OUTPUT_SCHEMA = pa.schema([
+    ('claim_sk', pa.int64()),
+    ('claim_id', pa.string()),
+    ('code_pairs', pa.int32()),
+    ('rarest_diagnosis_sk', pa.int64()),
+    ('rarest_procedure_sk', pa.int64()),
+    ('rarest_diagnosis_code', pa.string()),
+    ('rarest_procedure_code', pa.string()),
+    ('pair_claims', pa.int64()),
+    ('lift', pa.float64()),
+    ('pmi', pa.float64()),
+    ('npmi', pa.float64()),
+    ('pair_rarity', pa.float64()),
+    ('rarity_score', pa.float64()),
+])
+
+
+class CodeDimension:
+    """Code -> surrogate key lookup for dim_diagnosis_etl / dim_procedure_etl."""
+
+    def __init__(self, path: str, code_column: str, sk_column: str):
+        table = read_table(path, columns=[sk_column, code_column])
+        self.codes = clean_codes(table.column(code_column))
+        self.sks = table.column(sk_column).to_numpy(zero_copy_only=False).astype(np.int64)
+        # sk -> code, for labelling the output
+        self.size = int(self.sks.max()) + 1 if len(self.sks) else 1
+        self.code_by_sk = np.full(self.size, None, dtype=object)
+        self.code_by_sk[self.sks] = self.codes.to_numpy(zero_copy_only=False)
+
+    def code_sets(self, column) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Distinct (row, sk) of a LIST column of codes, sorted by row.
+        Codes not in the dimension are dropped.
+        """
+        rows, values = flatten_list_column(column)
+        index = pc.index_in(clean_codes(values), value_set=self.codes).fill_null(-1).to_numpy(zero_copy_only=False)
+        keep = index >= 0
+        keys = unique_sorted((rows[keep] << 32) | self.sks[index[keep]])
+        return keys >> 32, keys & 0xFFFFFFFF
+
+
+def cross_pairs(
+    dx_rows: np.ndarray,
+    dx_sk: np.ndarray,
+    px_rows: np.ndarray,
+    px_sk: np.ndarray,
+    n_rows: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Every (diagnosis, procedure) pair within each row. Inputs are sorted by row.
+
+    Returns:
+        (rows, dx_sk, px_sk), sorted by row
+    """
+    dx_count = np.bincount(dx_rows, minlength=n_rows)
+    dx_start = np.cumsum(dx_count) - dx_count
+    repeats = dx_count[px_rows]
+    px_index = np.repeat(np.arange(len(px_rows)), repeats)
+    offsets = np.arange(int(repeats.sum())) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    dx_index = np.repeat(dx_start[px_rows], repeats) + offsets
+    return px_rows[px_index], dx_sk[dx_index], px_sk[px_index]
+
+
+def stream_pairs(
+    codes_path: str,
+    diagnoses: CodeDimension,
+    procedures: CodeDimension,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Dict:
+    """
+    One pass over claim_codes_etl: per-claim pair keys plus code marginals.
+
+    Only claims with at least one mapped diagnosis and one mapped procedure
+    are kept; they are the N of the co-occurrence statistics.
+    """
+    dataset = open_dataset(codes_path)
+
+    claim_sk, claim_id, pair_rows, pair_keys = [], [], [], []
+    dx_claims = np.zeros(diagnoses.size, dtype=np.int64)
+    px_claims = np.zeros(procedures.size, dtype=np.int64)
+    n_claims = 0
+    claims_read = 0
+
+    for batch in dataset.to_batches(columns=['claim_sk', 'claim_id', 'diagnosis_codes', 'procedure_codes'],
+                                    batch_size=batch_size):
+        n_rows = batch.num_rows
+        dx_rows, dx_sk = diagnoses.code_sets(batch.column('diagnosis_codes'))
+        px_rows, px_sk = procedures.code_sets(batch.column('procedure_codes'))
+
+        both = (np.bincount(dx_rows, minlength=n_rows) > 0) & (np.bincount(px_rows, minlength=n_rows) > 0)
+        dx_claims += np.bincount(dx_sk[both[dx_rows]], minlength=diagnoses.size)
+        px_claims += np.bincount(px_sk[both[px_rows]], minlength=procedures.size)
+
+        # Position among the kept claims, across batches
+        position = np.cumsum(both) - 1 + n_claims
+        rows, dx, px = cross_pairs(dx_rows, dx_sk, px_rows, px_sk, n_rows)
+        pair_rows.append(position[rows])
+        pair_keys.append(dx * procedures.size + px)
+
+        mask = pa.array(both)
+        claim_sk.append(batch.column('claim_sk').filter(mask).to_numpy(zero_copy_only=False).astype(np.int64))
+        claim_id.append(batch.column('claim_id').filter(mask))
+        n_claims += int(both.sum())
+        claims_read += n_rows
+        if Config.VERBOSE:
+            print(f"  streamed {claims_read:,} claims, {sum(len(k) for k in pair_keys):,} pairs")
+
+    return {
+        'claims_read': claims_read,
+        'n_claims': n_claims,
+        'claim_sk': np.concatenate(claim_sk) if claim_sk else np.array([], np.int64),
+        'claim_id': pa.chunked_array(claim_id, pa.string()),
+        'pair_rows': np.concatenate(pair_rows) if pair_rows else np.array([], np.int64),
+        'pair_keys': np.concatenate(pair_keys) if pair_keys else np.array([], np.int64),
+        'dx_claims': dx_claims,
+        'px_claims': px_claims,
+    }
+
+
+def pair_statistics(keys: np.ndarray, dx_claims: np.ndarray, px_claims: np.ndarray, n_cols: int, n_claims: int):
+    """
+    COO pair keys -> distinct pairs with counts, lift, PMI, NPMI, pair rarity
+    and rarity score.
+
+    Returns:
+        dict of arrays sorted by key (diagnosis_sk major), i.e. CSR order
+    """
+    keys = np.sort(keys)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], np.int64)
+    distinct = keys[starts]
+    counts = np.diff(np.r_[starts, len(keys)])
+
+    dx, px = distinct // n_cols, distinct % n_cols
+    expected = dx_claims[dx].astype(np.float64) * px_claims[px] / max(n_claims, 1)
+    lift = counts / expected
+    pmi = np.log(lift)
+    neg_log_p = -np.log(counts / max(n_claims, 1))
+    npmi = np.where(neg_log_p > 0, pmi / np.where(neg_log_p > 0, neg_log_p, 1), 1.0)
+    pair_rarity = neg_log_p / np.log(n_claims) if n_claims > 1 else np.zeros(len(counts))
+    return {
+        'keys': distinct, 'dx': dx, 'px': px, 'counts': counts, 'lift': lift, 'pmi': pmi, 'npmi': npmi,
+        'pair_rarity': pair_rarity, 'score': np.maximum(np.maximum(-npmi, 0.0), pair_rarity),
+    }
+
+
+def save_matrix(path: str, stats: Dict, n_rows: int, n_cols: int, dx_claims, px_claims, n_claims: int) -> str:
+    """Save the counts as CSR in scipy.sparse.save_npz layout, with the statistics alongside."""
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(stats['dx'], minlength=n_rows), out=indptr[1:])
+    write_npz(
+        path,
+        format=np.array('csr'),
+        shape=np.array([n_rows, n_cols]),
+        data=stats['counts'],
+        indices=stats['px'].astype(np.int32),
+        indptr=indptr,
+        pmi=stats['pmi'],
+        lift=stats['lift'],
+        dx_claims=dx_claims,
+        px_claims=px_claims,
+        n_claims=np.array(n_claims),
+    )
+    print(f"✓ Saved {n_rows:,} x {n_cols:,} co-occurrence matrix ({len(stats['counts']):,} pairs) -> {path}")
+    return path
+
+
+def score_claims(
+    streamed: Dict,
+    stats: Dict,
+    diagnoses: CodeDimension,
+    procedures: CodeDimension
+) -> pa.Table:
+    """Each claim's highest-scoring (least expected or rarest) diagnosis-procedure pair."""
+    rows = streamed['pair_rows']
+    pair = np.searchsorted(stats['keys'], streamed['pair_keys'])
+
+    # Pairs come out sorted by claim; highest score first within each claim
+    order = np.lexsort((-stats['score'][pair], rows))
+    rows, pair = rows[order], pair[order]
+    first = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]]) if len(rows) else np.array([], np.int64)
+    pair_counts = np.diff(np.r_[first, len(rows)])
+    claims, pair = rows[first], pair[first]
+
+    dx, px = stats['dx'][pair], stats['px'][pair]
+    return pa.table({
+        'claim_sk': streamed['claim_sk'][claims],
+        'claim_id': streamed['claim_id'].take(pa.array(claims)),
+        'code_pairs': pair_counts.astype(np.int32),
+        'rarest_diagnosis_sk': dx,
+        'rarest_procedure_sk': px,
+        'rarest_diagnosis_code': pa.array(diagnoses.code_by_sk[dx], pa.string()),
+        'rarest_procedure_code': pa.array(procedures.code_by_sk[px], pa.string()),
+        'pair_claims': stats['counts'][pair],
+        'lift': stats['lift'][pair],
+        'pmi': stats['pmi'][pair],
+        'npmi': stats['npmi'][pair],
+        'pair_rarity': stats['pair_rarity'][pair],
+        'rarity_score': stats['score'][pair],
+    }, schema=OUTPUT_SCHEMA)
+
+
+def run(
+    codes_path: str,
+    diagnoses_path: str,
+    procedures_path: str,
+    out_path: str,
+    matrix_path: str,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> Dict:
+    """Stream the claims, build the matrix, score every claim and write both outputs."""
+    print("=" * 80)
+    print("DIAGNOSIS-PROCEDURE CO-OCCURRENCE")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    diagnoses = CodeDimension(diagnoses_path, 'diagnosis_code', 'diagnosis_sk')
+    procedures = CodeDimension(procedures_path, 'procedure_code', 'procedure_sk')
+    streamed = stream_pairs(codes_path, diagnoses, procedures, batch_size)
+    loaded = time.perf_counter()
+    print(f"✓ Streamed {streamed['claims_read']:,} claims ({streamed['n_claims']:,} with both code types, "
+          f"{len(streamed['pair_keys']):,} pairs) in {loaded - start:.1f}s")
+
+    stats = pair_statistics(
+        streamed['pair_keys'], streamed['dx_claims'], streamed['px_claims'], procedures.size, streamed['n_claims']
+    )
+    save_matrix(matrix_path, stats, diagnoses.size, procedures.size,
+                streamed['dx_claims'], streamed['px_claims'], streamed['n_claims'])
+
+    table = score_claims(streamed, stats, diagnoses, procedures)
+    print(f"✓ Scored {table.num_rows:,} claims in {time.perf_counter() - loaded:.1f}s")
+
+    write_table(table, out_path)
+    rare = int(pc.sum(pc.greater(table.column('rarity_score'), 0.5)).as_py() or 0)
+    return {
+        'status': 'success',
+        'claims': table.num_rows,
+        'pairs': len(stats['counts']),
+        'rare_claims': rare,
+        'output': out_path,
+        'matrix': matrix_path,
+    }
+
+
+def register_table() -> Dict:
+    """Create the Athena table over the written scores."""
+    from athena_executor import AthenaExecutor
+
+    executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+    return executor.execute_query(
+        Config.get_sql_file('sql/05-scoring/claim_code_rarity_etl.sql'),
+        Config.DATABASE,
+        label='Register claim_code_rarity_etl'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnosis-procedure co-occurrence and rarity scores")
+    parser.add_argument('--codes', default=table_uri('claim_codes_etl'))
+    parser.add_argument('--diagnoses', default=table_uri('dim_diagnosis_etl'))
+    parser.add_argument('--procedures', default=table_uri('dim_procedure_etl'))
+    parser.add_argument('--out', default=table_uri('claim_code_rarity_etl'))
+    parser.add_argument('--matrix-out', default=DEFAULT_MATRIX_URI, help="Where to save the .npz matrix")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--register', action='store_true', help="Create the Athena table")
+    args = parser.parse_args()
+
+    result = run(args.codes, args.diagnoses, args.procedures, args.out, args.matrix_out, args.batch_size)
+    print(f"✓ {result['rare_claims']:,} of {result['claims']:,} claims have a combination with rarity > 0.5")
+
+    if args.register:
+        res = register_table()
+        if res['status'] != 'success':
+            raise Exception(f"Failed: claim_code_rarity_etl - {res.get('error')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+# lambda/compaction.py
+"""
+Compaction Module
+Rewrites a warehouse table (or one partition) into target-sized Parquet
+files sorted by a clustering key.
+
+CTAS and INSERT INTO leave many small, unsorted files, so row-group min/max
+statistics overlap and prune nothing. Sorting by e.g.
+(provider_sk, claim_start_date_key) gives every row group a narrow key
+range, so filters on those columns skip most of the table.
+
+The swap keeps the table readable throughout and ends at the original
+location, so the DDL in sql/ and parquet_io.table_uri stay valid:
+
+    1. write sorted files to a staging prefix, check the row count
+    2. ALTER TABLE ... SET LOCATION <staging>     (readers move to the new files)
+    3. replace the files under the original location with the staged ones
+    4. ALTER TABLE ... SET LOCATION <original>, delete the staging prefix
+
+File counts and bytes before and after are printed and stored as JSON
+under <warehouse>/_compaction/<table>/.
+
+Usage:
+    python compaction.py fact_claims_etl
+    python compaction.py fact_claims_etl --keys provider_sk claim_start_date_key --target-mb 256
+    python compaction.py fact_claims_etl --dry-run          # write + compare, no swap
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import Config
+from parquet_io import (
+    WAREHOUSE_TABLES, clear_directory, copy_directory, list_files, open_dataset, table_uri, write_table
+)
+
+
+DEFAULT_TARGET_BYTES = 128 * 1024 ** 2
+DEFAULT_ROW_GROUP_ROWS = 250_000
+
+# Default clustering key per table (most selective filter first)
+CLUSTERING_KEYS = {
+    'fact_claims_etl': ['provider_sk', 'claim_start_date_key'],
+    'fact_provider_summary_etl': ['provider_sk', 'month_key'],
+    'fact_patient_claims_summary_etl': ['patient_sk', 'month_key'],
+    'claim_codes_etl': ['provider_sk', 'claim_start_date_key'],
+    'fact_claims_monthly_etl': ['provider_sk', 'claim_start_date_key'],
+}
+
+# Partitioned tables -> partition columns. The files under the table location
+# sit in column=value folders and don't hold those columns, so a whole-table
+# rewrite would flatten them; these are compacted one partition at a time.
+PARTITIONED_TABLES = {
+    'fact_claims_monthly_etl': ['claim_month'],
+}
+
+# Bucketed tables: Athena maps bucket numbers to file names, so they can't be rewritten here
+BUCKETED_TABLES = ['bridge_claim_diagnosis_etl', 'bridge_claim_procedure_etl']
+
+
+def inventory(path: str) -> Dict:
+    """File count, bytes and rows under a table location."""
+    files = [info for info in list_files(path) if not info.base_name.startswith(('_', '.'))]
+    rows = open_dataset(path).count_rows() if files else 0
+    total = sum(info.size for info in files)
+    return {
+        'files': len(files),
+        'bytes': total,
+        'rows': rows,
+        'avg_file_bytes': total // len(files) if files else 0,
+    }
+
+
+def write_sorted(
+    source: str,
+    destination: str,
+    keys: List[str],
+    target_bytes: int = DEFAULT_TARGET_BYTES,
+    row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    source_bytes: Optional[int] = None
+) -> int:
+    """
+    Read the table, sort by keys and write files of about target_bytes.
+
+    File size is estimated from the source's compressed bytes per row.
+
+    Returns:
+        Number of files written
+    """
+    table = open_dataset(source).to_table()
+    missing = [key for key in keys if key not in table.column_names]
+    if missing:
+        raise ValueError(f"Clustering keys not in table: {missing}")
+    table = table.sort_by([(key, 'ascending') for key in keys])
+
+    bytes_per_row = (source_bytes or table.nbytes) / max(table.num_rows, 1)
+    rows_per_file = max(int(target_bytes / max(bytes_per_row, 1)), 1)
+    row_group_size = min(rows_per_file, row_group_rows)
+
+    n_files = 0
+    for offset in range(0, max(table.num_rows, 1), rows_per_file):
+        chunk = table.slice(offset, rows_per_file)
+        write_table(chunk, f"{destination.rstrip('/')}/part-{n_files:05d}.parquet", row_group_size)
+        n_files += 1
+    return n_files
+
+
+def _set_location(executor, table: str, location: str, partition: Optional[Dict[str, str]] = None) -> None:
+    spec = ''
+    if partition:
+        spec = ' PARTITION (' + ', '.join(f"{key} = '{value}'" for key, value in partition.items()) + ')'
+    res = executor.execute_query(
+        f"ALTER TABLE {table}{spec} SET LOCATION '{location}'",
+        Config.DATABASE,
+        label=f"Set location of {table}{spec}"
+    )
+    if res['status'] != 'success':
+        raise Exception(f"Failed: set location of {table} - {res.get('error')}")
+
+
+def swap_in(executor, table: str, location: str, staging: str, partition: Optional[Dict[str, str]] = None) -> None:
+    """Move the table onto the staged files and back to its own, rewritten, location."""
+    _set_location(executor, table, staging, partition)
+    clear_directory(location)
+    copied = copy_directory(staging, location)
+    _set_location(executor, table, location, partition)
+    clear_directory(staging)
+    print(f"✓ Swapped {copied} compacted files into {location}")
+
+
+def save_log(table: str, record: Dict) -> str:
+    """Store the before/after record next to the warehouse tables."""
+    from aws_clients import get_client
+
+    key = f"{Config.WAREHOUSE_PREFIX}/_compaction/{table}/{record['run_id']}.json"
+    get_client('s3').put_object(
+        Bucket=Config.BUCKET,
+        Key=key,
+        Body=json.dumps(record, indent=2).encode('utf-8'),
+        ContentType='application/json'
+    )
+    return key
+
+
+def run(
+    table: str,
+    keys: Optional[List[str]] = None,
+    target_bytes: int = DEFAULT_TARGET_BYTES,
+    partition: Optional[Dict[str, str]] = None,
+    dry_run: bool = False,
+    executor=None
+) -> Dict:
+    """
+    Compact one table (or partition) in place.
+
+    Args:
+        table: Warehouse table name (see parquet_io.WAREHOUSE_TABLES)
+        keys: Clustering key (defaults to CLUSTERING_KEYS[table])
+        target_bytes: Target file size
+        partition: Partition spec {column: value}; its folder is column=value.
+                   Required for PARTITIONED_TABLES
+        dry_run: Write and compare the staged files, but don't swap
+
+    Returns:
+        Result dict with before/after inventories
+    """
+    print("=" * 80)
+    print(f"COMPACTION: {table}")
+    print("=" * 80)
+
+    if table in BUCKETED_TABLES:
+        raise ValueError(f"{table} is bucketed; rebuild it with its CTAS instead")
+    if table in PARTITIONED_TABLES and sorted(partition or {}) != sorted(PARTITIONED_TABLES[table]):
+        raise ValueError(f"{table} is partitioned by {', '.join(PARTITIONED_TABLES[table])}; "
+                         f"compact one partition at a time (--partition "
+                         f"{' '.join(key + '=VALUE' for key in PARTITIONED_TABLES[table])})")
+    keys = keys or CLUSTERING_KEYS.get(table)
+    if not keys:
+        raise ValueError(f"No clustering key for {table}; pass keys")
+
+    run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    location = table_uri(table)
+    if partition:
+        location += '/'.join(f"{key}={value}" for key, value in partition.items()) + '/'
+    staging = (f"s3://{Config.BUCKET}/{Config.WAREHOUSE_PREFIX}/_compaction/staging/"
+               f"{WAREHOUSE_TABLES[table].replace('/', '_')}/{run_id}/")
+
+    start = time.perf_counter()
+    before = inventory(location)
+    print(f"Before: {before['files']:,} files, {before['bytes']:,} bytes, {before['rows']:,} rows")
+    if before['files'] == 0:
+        return {'status': 'skipped', 'table': table, 'reason': 'no files', 'before': before}
+
+    n_files = write_sorted(location, staging, keys, target_bytes, source_bytes=before['bytes'])
+    staged = inventory(staging)
+    if staged['rows'] != before['rows']:
+        clear_directory(staging)
+        raise Exception(f"Failed: {table} compaction wrote {staged['rows']:,} rows, expected {before['rows']:,}")
+    print(f"✓ Staged {n_files} sorted files by ({', '.join(keys)})")
+
+    if dry_run:
+        clear_directory(staging)
+        after = staged
+    else:
+        if executor is None:
+            from athena_executor import AthenaExecutor
+            executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+        swap_in(executor, table, location, staging, partition)
+        after = inventory(location)
+
+    print(f"After:  {after['files']:,} files, {after['bytes']:,} bytes, {after['rows']:,} rows "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    record = {
+        'run_id': run_id,
+        'table': table,
+        'partition': partition,
+        'location': location,
+        'clustering_keys': keys,
+        'target_bytes': target_bytes,
+        'dry_run': dry_run,
+        'before': before,
+        'after': after,
+        'completed_at': str(datetime.now()),
+    }
+    if not dry_run:
+        print(f"✓ Logged to s3://{Config.BUCKET}/{save_log(table, record)}")
+    return {'status': 'success', **record}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sort and compact a warehouse table's Parquet files")
+    parser.add_argument('table', choices=sorted(WAREHOUSE_TABLES))
+    parser.add_argument('--keys', nargs='+', default=None, help="Clustering key columns")
+    parser.add_argument('--target-mb', type=int, default=DEFAULT_TARGET_BYTES // 1024 ** 2)
+    parser.add_argument('--partition', nargs='*', default=None, metavar='COLUMN=VALUE')
+    parser.add_argument('--dry-run', action='store_true', help="Stage and compare only")
+    args = parser.parse_args()
+
+    partition = dict(item.split('=', 1) for item in args.partition) if args.partition else None
+    result = run(args.table, args.keys, args.target_mb * 1024 ** 2, partition, args.dry_run)
+    if result['status'] == 'success':
+        before, after = result['before'], result['after']
+        print(f"✓ {before['files']:,} -> {after['files']:,} files, "
+              f"{before['bytes']:,} -> {after['bytes']:,} bytes")
+
+
+if __name__ == '__main__':
+    main()
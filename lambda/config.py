@@ -5,14 +5,73 @@ Load from environment variables or use defaults
 """
 
 import os
+from functools import lru_cache
 
 # AWS Configuration
 AWS_BUCKET = os.getenv('AWS_BUCKET', 'insurance-claim-qian-2025')
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 AWS_DATABASE = os.getenv('AWS_DATABASE', 'insurance_claim_db')
 
+# Warehouse layout
+WAREHOUSE_PREFIX = os.getenv('WAREHOUSE_PREFIX', 'data/warehouse/lambda_etl')
+REFERENCE_PREFIX = f'{WAREHOUSE_PREFIX}/reference'
+RUN_MARKER_KEY = f'{WAREHOUSE_PREFIX}/_runs/latest.json'
+BUILD_MARKER_KEY = f'{WAREHOUSE_PREFIX}/_runs/latest_build.json'  # last run that rebuilt from raw
+PROFILE_PREFIX = f'{WAREHOUSE_PREFIX}/_profiles'
+RAW_PREFIX = os.getenv('RAW_PREFIX', 'raw')
+
+# Sampled development builds (sampling.py)
+SAMPLE_DATABASE = os.getenv('SAMPLE_DATABASE', f'{AWS_DATABASE}_sample')
+SAMPLE_PREFIX = os.getenv('SAMPLE_PREFIX', f'{WAREHOUSE_PREFIX}_sample')
+
+# Calendar spine range for ref_calendar_etl / dim_date_etl
+CALENDAR_START = os.getenv('CALENDAR_START', '2007-01-01')
+CALENDAR_END = os.getenv('CALENDAR_END', '2011-12-31')
+
+# Query serving layer (query_service.py)
+SERVING_CACHE_SIZE = int(os.getenv('SERVING_CACHE_SIZE', '1024'))
+SERVING_CACHE_TTL = int(os.getenv('SERVING_CACHE_TTL', '900'))  # seconds
+SERVING_RUN_CHECK_INTERVAL = int(os.getenv('SERVING_RUN_CHECK_INTERVAL', '60'))  # seconds
+
+# AWS client tuning (aws_clients.py)
+CLIENT_MAX_POOL_CONNECTIONS = int(os.getenv('CLIENT_MAX_POOL_CONNECTIONS', '25'))
+CLIENT_CONNECT_TIMEOUT = int(os.getenv('CLIENT_CONNECT_TIMEOUT', '5'))  # seconds
+CLIENT_READ_TIMEOUT = int(os.getenv('CLIENT_READ_TIMEOUT', '30'))  # seconds
+CLIENT_MAX_ATTEMPTS = int(os.getenv('CLIENT_MAX_ATTEMPTS', '5'))
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL') or None  # e.g. MinIO / moto server for local testing
+
+# Athena polling: start short so quick queries return fast, back off to the cap
+POLL_INITIAL_INTERVAL = float(os.getenv('POLL_INITIAL_INTERVAL', '0.25'))  # seconds
+POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', '2'))  # seconds
+# Throttled StartQueryExecution calls are retried with jittered exponential backoff
+SUBMIT_MAX_ATTEMPTS = int(os.getenv('SUBMIT_MAX_ATTEMPTS', '8'))
+SUBMIT_INITIAL_BACKOFF = float(os.getenv('SUBMIT_INITIAL_BACKOFF', '1'))  # seconds
+SUBMIT_MAX_BACKOFF = float(os.getenv('SUBMIT_MAX_BACKOFF', '20'))  # seconds
+# Seconds before the Lambda timeout at which running queries are stopped and cleaned up
+DEADLINE_MARGIN = int(os.getenv('DEADLINE_MARGIN', '30'))
+
+# Month-range backfills (backfill.py)
+BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', '8'))
+BACKFILL_RETRIES = int(os.getenv('BACKFILL_RETRIES', '2'))
+
+# Shared Athena query slots (query_slots.py): 'off', 'dynamodb' or 'sqlite'
+QUERY_SLOTS_BACKEND = os.getenv('QUERY_SLOTS_BACKEND', 'off').lower()
+QUERY_SLOTS_LIMIT = int(os.getenv('QUERY_SLOTS_LIMIT', '20'))  # below the account's active-query quota
+QUERY_SLOTS_PRIORITY = os.getenv('QUERY_SLOTS_PRIORITY', 'normal').lower()
+QUERY_SLOTS_TTL = int(os.getenv('QUERY_SLOTS_TTL', '120'))  # seconds a lease lives without renewal
+QUERY_SLOTS_WAIT = int(os.getenv('QUERY_SLOTS_WAIT', '600'))  # seconds to wait for a slot
+QUERY_SLOTS_TABLE = os.getenv('QUERY_SLOTS_TABLE', 'athena_query_slots')
+QUERY_SLOTS_POOL = os.getenv('QUERY_SLOTS_POOL', 'athena')
+QUERY_SLOTS_PATH = os.getenv('QUERY_SLOTS_PATH', '/tmp/athena_query_slots.db')
+
+# Scan budget (preflight.py): 'off', 'warn' or 'refuse' before submitting a run
+SCAN_BUDGET_MODE = os.getenv('SCAN_BUDGET_MODE', 'off').lower()
+SCAN_BUDGET_RUN_BYTES = int(os.getenv('SCAN_BUDGET_RUN_BYTES', str(50 * 1024 ** 3)))
+SCAN_BUDGET_QUERY_BYTES = int(os.getenv('SCAN_BUDGET_QUERY_BYTES', str(10 * 1024 ** 3)))
+ATHENA_PRICE_PER_TB = float(os.getenv('ATHENA_PRICE_PER_TB', '5.0'))
+
 # SQL Configuration
-SQL_DIR = os.path.join(os.path.dirname(__file__), '..', 'sql')
+SQL_DIR = os.getenv('SQL_DIR', os.path.join(os.path.dirname(__file__), '..', 'sql'))
 
 # Logging
 VERBOSE = os.getenv('VERBOSE', 'True').lower() == 'true'
@@ -23,12 +82,58 @@ class Config:
     BUCKET = AWS_BUCKET
     REGION = AWS_REGION
     DATABASE = AWS_DATABASE
+    WAREHOUSE_PREFIX = WAREHOUSE_PREFIX
+    REFERENCE_PREFIX = REFERENCE_PREFIX
+    RUN_MARKER_KEY = RUN_MARKER_KEY
+    BUILD_MARKER_KEY = BUILD_MARKER_KEY
+    PROFILE_PREFIX = PROFILE_PREFIX
+    RAW_PREFIX = RAW_PREFIX
+    SAMPLE_DATABASE = SAMPLE_DATABASE
+    SAMPLE_PREFIX = SAMPLE_PREFIX
+    CALENDAR_START = CALENDAR_START
+    CALENDAR_END = CALENDAR_END
+    SERVING_CACHE_SIZE = SERVING_CACHE_SIZE
+    SERVING_CACHE_TTL = SERVING_CACHE_TTL
+    SERVING_RUN_CHECK_INTERVAL = SERVING_RUN_CHECK_INTERVAL
+    CLIENT_MAX_POOL_CONNECTIONS = CLIENT_MAX_POOL_CONNECTIONS
+    CLIENT_CONNECT_TIMEOUT = CLIENT_CONNECT_TIMEOUT
+    CLIENT_READ_TIMEOUT = CLIENT_READ_TIMEOUT
+    CLIENT_MAX_ATTEMPTS = CLIENT_MAX_ATTEMPTS
+    S3_ENDPOINT_URL = S3_ENDPOINT_URL
+    POLL_INITIAL_INTERVAL = POLL_INITIAL_INTERVAL
+    POLL_MAX_INTERVAL = POLL_MAX_INTERVAL
+    SUBMIT_MAX_ATTEMPTS = SUBMIT_MAX_ATTEMPTS
+    SUBMIT_INITIAL_BACKOFF = SUBMIT_INITIAL_BACKOFF
+    SUBMIT_MAX_BACKOFF = SUBMIT_MAX_BACKOFF
+    DEADLINE_MARGIN = DEADLINE_MARGIN
+    BACKFILL_WORKERS = BACKFILL_WORKERS
+    BACKFILL_RETRIES = BACKFILL_RETRIES
+    QUERY_SLOTS_BACKEND = QUERY_SLOTS_BACKEND
+    QUERY_SLOTS_LIMIT = QUERY_SLOTS_LIMIT
+    QUERY_SLOTS_PRIORITY = QUERY_SLOTS_PRIORITY
+    QUERY_SLOTS_TTL = QUERY_SLOTS_TTL
+    QUERY_SLOTS_WAIT = QUERY_SLOTS_WAIT
+    QUERY_SLOTS_TABLE = QUERY_SLOTS_TABLE
+    QUERY_SLOTS_POOL = QUERY_SLOTS_POOL
+    QUERY_SLOTS_PATH = QUERY_SLOTS_PATH
+    SCAN_BUDGET_MODE = SCAN_BUDGET_MODE
+    SCAN_BUDGET_RUN_BYTES = SCAN_BUDGET_RUN_BYTES
+    SCAN_BUDGET_QUERY_BYTES = SCAN_BUDGET_QUERY_BYTES
+    ATHENA_PRICE_PER_TB = ATHENA_PRICE_PER_TB
     SQL_DIR = SQL_DIR
     VERBOSE = VERBOSE
     
     @staticmethod
+    @lru_cache(maxsize=None)
     def get_sql_file(path: str) -> str:
-        """Read SQL file from disk."""
+        """
+        Read SQL file from disk.
+        
+        Cached, so each file is read once per Lambda container. Paths may
+        be given relative to the sql/ directory or with a leading 'sql/'.
+        """
+        if path.startswith('sql/'):
+            path = path[len('sql/'):]
         full_path = os.path.join(Config.SQL_DIR, path)
         if not os.path.exists(full_path):
             raise FileNotFoundError(f"SQL file not found: {full_path}")
@@ -0,0 +1,363 @@
+# lambda/data_profiler.py
+"""
+Data Profiler Module
+Column-level profiles of the raw and warehouse tables, with drift checks
+against the previous run.
+
+Each table is profiled by ONE aggregation query covering all its columns:
+
+- null count, plus blanks ('' / 'NA') for string columns
+- approx_distinct
+- min / max (string columns: min / max length)
+- approx_percentile histogram for numeric columns
+- cast failures: raw values the views TRY_CAST that do not parse (CAST_CHECKS)
+- out-of-domain values: raw codes the views' CASE mappings don't expect (DOMAIN_CHECKS)
+
+Column lists come from information_schema in a single query. Profiles are
+stored per run as JSON under Config.PROFILE_PREFIX; drift against the
+previous run's profiles is reported, not fatal.
+
+Usage:
+    python data_profiler.py                                # profile PROFILE_TABLES
+    python data_profiler.py --tables provider inpatient
+    (pipeline) lambda_handler({'step': 'profile'}, None)
+"""
+
+import argparse
+import json
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from aws_clients import get_client
+
+
+PROFILE_TABLES = [
+    'provider', 'beneficiary', 'inpatient', 'outpatient',
+    'fact_claims_etl', 'dim_provider_etl', 'dim_patient_etl',
+]
+
+PERCENTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+NUMERIC_TYPES = ('tinyint', 'smallint', 'integer', 'bigint', 'real', 'double', 'decimal')
+TEMPORAL_TYPES = ('date', 'timestamp')
+
+# Raw column -> type the views TRY_CAST it to (sql/01-views/)
+CAST_CHECKS = {
+    'inpatient': {
+        'ClaimStartDt': 'DATE', 'ClaimEndDt': 'DATE', 'AdmissionDt': 'DATE', 'DischargeDt': 'DATE',
+        'InscClaimAmtReimbursed': 'DOUBLE', 'DeductibleAmtPaid': 'DOUBLE',
+    },
+    'outpatient': {
+        'ClaimStartDt': 'DATE', 'ClaimEndDt': 'DATE',
+        'InscClaimAmtReimbursed': 'DOUBLE', 'DeductibleAmtPaid': 'DOUBLE',
+    },
+    'beneficiary': {
+        'DOB': 'DATE', 'DOD': 'DATE', 'State': 'INTEGER', 'County': 'INTEGER',
+        'NoOfMonths_PartACov': 'INTEGER', 'NoOfMonths_PartBCov': 'INTEGER',
+        'IPAnnualReimbursementAmt': 'DOUBLE', 'IPAnnualDeductibleAmt': 'DOUBLE',
+        'OPAnnualReimbursementAmt': 'DOUBLE', 'OPAnnualDeductibleAmt': 'DOUBLE',
+    },
+}
+
+CHRONIC_COLUMNS = [
+    'ChronicCond_Alzheimer', 'ChronicCond_Heartfailure', 'ChronicCond_KidneyDisease',
+    'ChronicCond_Cancer', 'ChronicCond_ObstrPulmonary', 'ChronicCond_Depression',
+    'ChronicCond_Diabetes', 'ChronicCond_IschemicHeart', 'ChronicCond_Osteoporasis',
+    'ChronicCond_rheumatoidarthritis', 'ChronicCond_stroke',
+]
+
+# Raw column -> values the views' CASE mappings are written for
+DOMAIN_CHECKS = {
+    'provider': {'PotentialFraud': ['Yes', 'No']},
+    'beneficiary': {
+        'Gender': ['1', '2'],
+        'Race': ['1', '2', '3', '4', '5'],
+        'RenalDiseaseIndicator': ['Y', '0'],
+        **{column: ['1', '2'] for column in CHRONIC_COLUMNS},
+    },
+}
+
+DRIFT_THRESHOLDS = {
+    'row_count': 0.10,          # relative change in table rows
+    'null_fraction': 0.02,      # absolute change in null (or blank) share
+    'distinct': 0.20,           # relative change in approx_distinct (its error is ~2%)
+    'median_shift': 0.50,       # p50 move, in units of the previous IQR
+}
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _base_type(data_type: str) -> str:
+    return data_type.split('(')[0].strip().lower()
+
+
+def load_columns(executor, database: str, tables: List[str]) -> Dict[str, List[Tuple[str, str]]]:
+    """Column names and types of all tables, from one information_schema query."""
+    table_list = ', '.join(f"'{table.lower()}'" for table in tables)
+    res = executor.execute_query(
+        f"""
+        SELECT table_name, column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = '{database}' AND table_name IN ({table_list})
+        ORDER BY table_name, ordinal_position
+        """,
+        database,
+        label="Profile: column metadata"
+    )
+    if res['status'] != 'success':
+        raise Exception(f"Failed: column metadata - {res.get('error')}")
+
+    columns: Dict[str, List[Tuple[str, str]]] = {}
+    for row in executor.fetch_results(res['query_id']):
+        columns.setdefault(row['table_name'], []).append((row['column_name'], row['data_type']))
+    return columns
+
+
+def build_profile_query(table: str, columns: List[Tuple[str, str]]) -> Tuple[str, List[Tuple[str, str, str]]]:
+    """
+    One SELECT computing every statistic of every column.
+
+    Returns:
+        (sql, fields) where fields maps each output alias to (column, statistic)
+    """
+    # information_schema names are lower case; the check tables use the CSV headers
+    casts = {name.lower(): target for name, target in CAST_CHECKS.get(table, {}).items()}
+    domains = {name.lower(): values for name, values in DOMAIN_CHECKS.get(table, {}).items()}
+    percentile_array = 'ARRAY[' + ', '.join(str(p) for p in PERCENTILES) + ']'
+
+    select = ['COUNT(*) AS row_count']
+    fields = []
+
+    def add(column: str, stat: str, expression: str) -> None:
+        alias = f"c{len(fields)}_{stat}"
+        select.append(f"{expression} AS {alias}")
+        fields.append((alias, column, stat))
+
+    for name, data_type in columns:
+        col = _quote(name)
+        base = _base_type(data_type)
+        is_string = base in ('varchar', 'char', 'string')
+
+        add(name, 'nulls', f"COUNT_IF({col} IS NULL)")
+        if base in ('array', 'map', 'row'):
+            continue
+        add(name, 'distinct', f"approx_distinct({col})")
+
+        if is_string:
+            add(name, 'blanks', f"COUNT_IF(TRIM({col}) IN ('', 'NA'))")
+            add(name, 'min_length', f"MIN(LENGTH({col}))")
+            add(name, 'max_length', f"MAX(LENGTH({col}))")
+        elif base == 'boolean':
+            add(name, 'true_count', f"COUNT_IF({col})")
+        elif base in NUMERIC_TYPES or base in TEMPORAL_TYPES:
+            add(name, 'min', f"CAST(MIN({col}) AS VARCHAR)")
+            add(name, 'max', f"CAST(MAX({col}) AS VARCHAR)")
+
+        if base in NUMERIC_TYPES:
+            add(name, 'percentiles', f"approx_percentile(CAST({col} AS DOUBLE), {percentile_array})")
+
+        target = casts.get(name.lower())
+        if target:
+            present = f"TRIM({col}) NOT IN ('', 'NA')" if is_string else f"{col} IS NOT NULL"
+            add(name, 'cast_failures', f"COUNT_IF({present} AND TRY_CAST({col} AS {target}) IS NULL)")
+            if target == 'DOUBLE' and base not in NUMERIC_TYPES:
+                add(name, 'percentiles', f"approx_percentile(TRY_CAST({col} AS DOUBLE), {percentile_array})")
+
+        values = domains.get(name.lower())
+        if values:
+            value_list = ', '.join("'" + value.replace("'", "''") + "'" for value in values)
+            add(name, 'out_of_domain',
+                f"COUNT_IF({col} IS NOT NULL AND CAST({col} AS VARCHAR) NOT IN ({value_list}))")
+
+    sql = "SELECT\n    " + ",\n    ".join(select) + f"\nFROM {table}"
+    return sql, fields
+
+
+def _parse_percentiles(value) -> Optional[Dict[str, float]]:
+    """Athena returns arrays as '[1.0, 2.5, ...]' strings."""
+    if value is None:
+        return None
+    parts = [part.strip() for part in str(value).strip('[]').split(',') if part.strip()]
+    if len(parts) != len(PERCENTILES):
+        return None
+    return {
+        f"p{int(round(q * 100)):02d}": (None if part == 'null' else float(part))
+        for q, part in zip(PERCENTILES, parts)
+    }
+
+
+def profile_table(executor, database: str, table: str, columns: List[Tuple[str, str]]) -> Dict:
+    """Run the table's profile query and shape the single result row."""
+    sql, fields = build_profile_query(table, columns)
+    res = executor.execute_query(sql, database, label=f"Profile {table}")
+    if res['status'] != 'success':
+        raise Exception(f"Failed: profile {table} - {res.get('error')}")
+    row = executor.fetch_results(res['query_id'])[0]
+
+    row_count = int(row['row_count'] or 0)
+    profile = {
+        'row_count': row_count,
+        'columns': {name: {'type': data_type} for name, data_type in columns},
+    }
+    for alias, column, stat in fields:
+        value = row.get(alias)
+        if stat == 'percentiles':
+            value = _parse_percentiles(value)
+        profile['columns'][column][stat] = value
+
+    for stats in profile['columns'].values():
+        for count, share in (('nulls', 'null_fraction'), ('blanks', 'blank_fraction')):
+            if stats.get(count) is not None:
+                stats[share] = stats[count] / row_count if row_count else 0.0
+    return profile
+
+
+def find_issues(table: str, profile: Dict) -> List[Dict]:
+    """Cast failures and out-of-domain values present in this run."""
+    issues = []
+    for column, stats in profile['columns'].items():
+        for stat in ('cast_failures', 'out_of_domain'):
+            if stats.get(stat):
+                issues.append({'table': table, 'column': column, 'check': stat, 'count': stats[stat]})
+    return issues
+
+
+def detect_drift(table: str, previous: Dict, current: Dict, thresholds: Dict = DRIFT_THRESHOLDS) -> List[Dict]:
+    """
+    Compare a table's profile with the previous run's.
+
+    Returns:
+        List of findings {table, column, metric, previous, current}
+    """
+    findings = []
+
+    def flag(column, metric, old, new):
+        findings.append({'table': table, 'column': column, 'metric': metric, 'previous': old, 'current': new})
+
+    old_rows, new_rows = previous.get('row_count', 0), current['row_count']
+    if old_rows and abs(new_rows - old_rows) / old_rows > thresholds['row_count']:
+        flag(None, 'row_count', old_rows, new_rows)
+
+    old_columns, new_columns = previous.get('columns', {}), current['columns']
+    for column in sorted(set(old_columns) - set(new_columns)):
+        flag(column, 'column_removed', old_columns[column]['type'], None)
+
+    for column, new in new_columns.items():
+        old = old_columns.get(column)
+        if old is None:
+            flag(column, 'column_added', None, new['type'])
+            continue
+        if old['type'] != new['type']:
+            flag(column, 'type', old['type'], new['type'])
+
+        for share in ('null_fraction', 'blank_fraction'):
+            if old.get(share) is not None and new.get(share) is not None \
+                    and abs(new[share] - old[share]) > thresholds['null_fraction']:
+                flag(column, share, round(old[share], 4), round(new[share], 4))
+
+        if (old.get('distinct') or 0) >= 10 and new.get('distinct') is not None \
+                and abs(new['distinct'] - old['distinct']) / old['distinct'] > thresholds['distinct']:
+            flag(column, 'distinct', old['distinct'], new['distinct'])
+
+        for stat in ('cast_failures', 'out_of_domain'):
+            if (new.get(stat) or 0) > (old.get(stat) or 0):
+                flag(column, stat, old.get(stat) or 0, new[stat])
+
+        old_pct, new_pct = old.get('percentiles') or {}, new.get('percentiles') or {}
+        if None not in (old_pct.get('p25'), old_pct.get('p50'), old_pct.get('p75'), new_pct.get('p50')):
+            iqr = old_pct['p75'] - old_pct['p25']
+            if iqr > 0 and abs(new_pct['p50'] - old_pct['p50']) / iqr > thresholds['median_shift']:
+                flag(column, 'median', old_pct['p50'], new_pct['p50'])
+
+    return findings
+
+
+def load_previous_profiles() -> Optional[Dict]:
+    """The most recently stored profiles, or None on the first run."""
+    s3 = get_client('s3')
+    try:
+        response = s3.get_object(Bucket=Config.BUCKET, Key=f"{Config.PROFILE_PREFIX}/latest.json")
+    except s3.exceptions.NoSuchKey:
+        return None
+    return json.loads(response['Body'].read())
+
+
+def save_profiles(document: Dict) -> str:
+    """Store this run's profiles (runs/<run_id>.json) and point latest.json at them."""
+    s3 = get_client('s3')
+    body = json.dumps(document, indent=2, default=str).encode('utf-8')
+    key = f"{Config.PROFILE_PREFIX}/runs/{document['run_id']}.json"
+    for target in (key, f"{Config.PROFILE_PREFIX}/latest.json"):
+        s3.put_object(Bucket=Config.BUCKET, Key=target, Body=body, ContentType='application/json')
+    print(f"✓ Saved profiles -> s3://{Config.BUCKET}/{key}")
+    return key
+
+
+def run_profiles(executor, database: str, run_id: str, tables: Optional[List[str]] = None) -> Dict:
+    """
+    Profile the tables, compare with the previous run and store the result.
+
+    Returns:
+        Summary dict with issues and drift findings
+    """
+    tables = tables or PROFILE_TABLES
+    columns = load_columns(executor, database, tables)
+    previous = load_previous_profiles()
+    previous_tables = (previous or {}).get('tables', {})
+
+    profiles, issues, drift = {}, [], []
+    for table in tables:
+        if table.lower() not in columns:
+            print(f"WARNING: {table} not found in {database}, skipping")
+            continue
+        profile = profile_table(executor, database, table, columns[table.lower()])
+        profiles[table] = profile
+        issues.extend(find_issues(table, profile))
+        if table in previous_tables:
+            drift.extend(detect_drift(table, previous_tables[table], profile))
+        print(f"✓ Profiled {table}: {profile['row_count']:,} rows, {len(profile['columns'])} columns")
+
+    for issue in issues:
+        print(f"WARNING: {issue['table']}.{issue['column']}: {issue['count']:,} {issue['check'].replace('_', ' ')}")
+    if previous is None:
+        print("No previous profiles; drift checks start with the next run")
+    for finding in drift:
+        column = f".{finding['column']}" if finding['column'] else ''
+        print(f"WARNING: drift {finding['table']}{column} {finding['metric']}: "
+              f"{finding['previous']} -> {finding['current']}")
+
+    save_profiles({
+        'run_id': run_id,
+        'previous_run_id': (previous or {}).get('run_id'),
+        'profiled_at': str(datetime.now()),
+        'tables': profiles,
+        'issues': issues,
+        'drift': drift,
+    })
+    return {
+        'tables_profiled': list(profiles),
+        'issues': issues,
+        'drift': drift,
+    }
+
+
+def main():
+    from athena_executor import AthenaExecutor
+
+    parser = argparse.ArgumentParser(description="Profile raw and warehouse tables")
+    parser.add_argument('--tables', nargs='+', default=PROFILE_TABLES)
+    args = parser.parse_args()
+
+    executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+    run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    summary = run_profiles(executor, Config.DATABASE, run_id, args.tables)
+    print(f"✓ {len(summary['tables_profiled'])} tables, {len(summary['issues'])} issues, "
+          f"{len(summary['drift'])} drift findings")
+
+
+if __name__ == '__main__':
+    main()
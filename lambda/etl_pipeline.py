@@ -5,49 +5,153 @@ Main Lambda function for orchestrating data warehouse build
 """
 
 import json
-from datetime import datetime
-from typing import Dict, List
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 
 from config import Config
 from athena_executor import AthenaExecutor
+from aws_clients import get_client
+from data_profiler import PROFILE_TABLES, run_profiles
+from preflight import ScanEstimator, check_budget, print_report
+from sampling import prepare as prepare_sample, sample_query
+
+# SQL files per step, in execution order
+VIEW_FILES = [
+    ('sql/01-views/v_providers_etl.sql', 'v_providers_etl'),
+    ('sql/01-views/v_patients_etl.sql', 'v_patients_etl'),
+    ('sql/01-views/v_inpatient_claims_etl.sql', 'v_inpatient_claims_etl'),
+    ('sql/01-views/v_outpatient_claims_etl.sql', 'v_outpatient_claims_etl'),
+    ('sql/01-views/v_all_claims_etl.sql', 'v_all_claims_etl'),
+]
+
+REFERENCE_FILES = [
+    'sql/00-reference/ref_icd9_chapter_etl.sql',
+    'sql/00-reference/ref_procedure_chapter_etl.sql',
+    'sql/00-reference/ref_calendar_etl.sql',
+]
+
+DIM_FILES = [
+    'sql/02-dims/dim_date_etl.sql',
+    'sql/02-dims/dim_provider_etl.sql',
+    'sql/02-dims/dim_patient_etl.sql',
+    'sql/02-dims/dim_diagnosis_etl.sql',
+    'sql/02-dims/dim_procedure_etl.sql',
+]
+
+FACT_FILES = [
+    'sql/03-facts/fact_claims_etl.sql',
+    'sql/03-facts/fact_claims_summary_grouped_etl.sql',
+    'sql/03-facts/fact_provider_summary_etl.sql',
+    'sql/03-facts/fact_patient_claims_summary_etl.sql',
+    'sql/03-facts/overlap_flags_etl.sql',
+    'sql/03-facts/claim_codes_etl.sql',
+    'sql/03-facts/bridge_claim_diagnosis_etl.sql',
+    'sql/03-facts/bridge_claim_procedure_etl.sql',
+]
+
+ROLLUP_FILES = [
+    'sql/04-rollups/rollup_fraud_exposure_etl.sql',
+]
+
+PIPELINE_STEPS = ['views', 'reference', 'dims', 'facts', 'rollups']
+
+# Steps that rebuild warehouse tables from the raw uploads (raw_uploader.changed_tables)
+RAW_BUILD_STEPS = ['all', 'dims', 'facts']
+
+
+def pipeline_nodes(step: str = 'all') -> List[Tuple[str, str, str]]:
+    """(step, object name, sql file) for every statement a step submits, in order."""
+    files = {
+        'views': [sql_file for sql_file, _ in VIEW_FILES],
+        'reference': REFERENCE_FILES,
+        'dims': DIM_FILES,
+        'facts': FACT_FILES,
+        'rollups': ROLLUP_FILES,
+    }
+    return [
+        (name, sql_file.split('/')[-1].replace('.sql', ''), sql_file)
+        for name in PIPELINE_STEPS if step in ['all', name]
+        for sql_file in files[name]
+    ]
+
+
+def publish_run_marker(run_id: str, step: str) -> None:
+    """
+    Record a run's ID in S3 so readers (query_service.py) can invalidate
+    anything cached from an earlier build.
+    """
+    marker = {
+        'run_id': run_id,
+        'step': step,
+        'completed_at': datetime.now(timezone.utc).isoformat(),
+    }
+    keys = [Config.RUN_MARKER_KEY] + ([Config.BUILD_MARKER_KEY] if step in RAW_BUILD_STEPS else [])
+    for key in keys:
+        get_client('s3').put_object(
+            Bucket=Config.BUCKET,
+            Key=key,
+            Body=json.dumps(marker).encode('utf-8'),
+            ContentType='application/json'
+        )
+    print(f"✓ Published run marker {run_id}")
+
+
+# Reused across warm invocations of the same Lambda container
+_executor: Optional[AthenaExecutor] = None
+
+
+def get_executor() -> AthenaExecutor:
+    """Return the container-wide Athena executor, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+    return _executor
 
 
 class ClaimsETLPipeline:
     """Main ETL pipeline orchestrator."""
     
-    def __init__(self):
-        """Initialize pipeline."""
-        self.executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
-        self.database = Config.DATABASE
+    def __init__(self, executor: Optional[AthenaExecutor] = None, sample: Optional[int] = None):
+        """
+        Initialize pipeline.
+        
+        Args:
+            executor: Athena executor to use (defaults to the shared one)
+            sample: Build a sample of this percent of providers in the
+                    sample database and prefix (see sampling.py)
+        """
+        self.executor = executor or get_executor()
+        self.sample = sample
+        self.database = Config.SAMPLE_DATABASE if sample else Config.DATABASE
+        self.run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
         self.results = {
             "views_created": [],
+            "reference_created": [],
             "dims_created": [],
-            "facts_created": []
+            "facts_created": [],
+            "rollups_created": [],
+            "profile": {},
+            "labels": {},
+            "backfill": {}
         }
     
+    def sql(self, sql_file: str) -> str:
+        """SQL of a pipeline file, with CTAS output moved to the sample prefix in sample runs."""
+        query = Config.get_sql_file(sql_file)
+        return sample_query(query) if self.sample else query
+    
     def step_views(self) -> List[str]:
         """Create transformation views."""
         print("\n" + "="*80)
         print("STEP: CREATE VIEWS")
         print("="*80)
         
-        view_files = [
-            ('sql/01-views/v_providers_etl.sql', 'v_providers_etl'),
-            ('sql/01-views/v_patients_etl.sql', 'v_patients_etl'),
-            ('sql/01-views/v_inpatient_claims_etl.sql', 'v_inpatient_claims_etl'),
-            ('sql/01-views/v_outpatient_claims_etl.sql', 'v_outpatient_claims_etl'),
-            ('sql/01-views/v_all_claims_etl.sql', 'v_all_claims_etl'),
-        ]
-        
         created_views = []
-        for sql_file, view_name in view_files:
-            # Drop if exists
-            drop_query = f"DROP VIEW IF EXISTS {view_name}"
-            self.executor.execute_query(drop_query, self.database, label=f"Drop view {view_name}")
-            
-            # Create view
+        for sql_file, view_name in VIEW_FILES:
+            # Views use CREATE OR REPLACE, so no separate DROP round trip
             try:
-                query = Config.get_sql_file(sql_file)
+                query = self.sql(sql_file)
                 res = self.executor.execute_query(
                     query, 
                     self.database, 
@@ -62,29 +166,48 @@ class ClaimsETLPipeline:
         
         return created_views
     
+    def step_reference(self) -> List[str]:
+        """Register the generated reference tables (see reference_tables.py)."""
+        print("\n" + "="*80)
+        print("STEP: REGISTER REFERENCE TABLES")
+        print("="*80)
+        
+        registered = []
+        for sql_file in REFERENCE_FILES:
+            table_name = sql_file.split('/')[-1].replace('.sql', '')
+            
+            try:
+                query = self.sql(sql_file)
+                res = self.executor.execute_query(
+                    query,
+                    self.database,
+                    label=f"Register {table_name}"
+                )
+                
+                if res['status'] != 'success':
+                    raise Exception(f"Failed: {res.get('error')}")
+                registered.append(table_name)
+            except Exception as e:
+                print(f"ERROR: {str(e)}")
+                raise
+        
+        return registered
+    
     def step_dims(self) -> List[str]:
         """Create dimension tables."""
         print("\n" + "="*80)
         print("STEP: CREATE DIMENSION TABLES")
         print("="*80)
         
-        dim_files = [
-            'sql/02-dims/dim_date_etl.sql',
-            'sql/02-dims/dim_provider_etl.sql',
-            'sql/02-dims/dim_patient_etl.sql',
-            'sql/02-dims/dim_diagnosis_etl.sql',
-            'sql/02-dims/dim_procedure_etl.sql',
-        ]
-        
         created_dims = []
-        for sql_file in dim_files:
+        for sql_file in DIM_FILES:
             table_name = sql_file.split('/')[-1].replace('.sql', '')
             
             try:
                 drop_query = f"DROP TABLE IF EXISTS {table_name}"
                 self.executor.execute_query(drop_query, self.database)
                 
-                query = Config.get_sql_file(sql_file)
+                query = self.sql(sql_file)
                 res = self.executor.execute_query(
                     query,
                     self.database,
@@ -106,21 +229,15 @@ class ClaimsETLPipeline:
         print("STEP: CREATE FACT TABLES")
         print("="*80)
         
-        fact_files = [
-            'sql/03-facts/fact_claims_etl.sql',
-            'sql/03-facts/fact_provider_summary_etl.sql',
-            'sql/03-facts/fact_patient_claims_summary_etl.sql',
-        ]
-        
         created_facts = []
-        for sql_file in fact_files:
+        for sql_file in FACT_FILES:
             table_name = sql_file.split('/')[-1].replace('.sql', '')
             
             try:
                 drop_query = f"DROP TABLE IF EXISTS {table_name}"
                 self.executor.execute_query(drop_query, self.database)
                 
-                query = Config.get_sql_file(sql_file)
+                query = self.sql(sql_file)
                 res = self.executor.execute_query(
                     query,
                     self.database,
@@ -136,6 +253,36 @@ class ClaimsETLPipeline:
         
         return created_facts
     
+    def step_rollups(self) -> List[str]:
+        """Create pre-aggregated rollup tables for the dashboards."""
+        print("\n" + "="*80)
+        print("STEP: CREATE ROLLUP TABLES")
+        print("="*80)
+        
+        created_rollups = []
+        for sql_file in ROLLUP_FILES:
+            table_name = sql_file.split('/')[-1].replace('.sql', '')
+            
+            try:
+                drop_query = f"DROP TABLE IF EXISTS {table_name}"
+                self.executor.execute_query(drop_query, self.database)
+                
+                query = self.sql(sql_file)
+                res = self.executor.execute_query(
+                    query,
+                    self.database,
+                    label=f"Create {table_name}"
+                )
+                
+                if res['status'] != 'success':
+                    raise Exception(f"Failed: {res.get('error')}")
+                created_rollups.append(table_name)
+            except Exception as e:
+                print(f"ERROR: {str(e)}")
+                raise
+        
+        return created_rollups
+    
     def step_validate(self) -> bool:
         """Validate data warehouse tables."""
         print("\n" + "="*80)
@@ -151,6 +298,11 @@ class ClaimsETLPipeline:
             "SELECT 'fact_claims_etl', COUNT(*) FROM fact_claims_etl",
             "SELECT 'fact_provider_summary_etl', COUNT(*) FROM fact_provider_summary_etl",
             "SELECT 'fact_patient_claims_summary_etl', COUNT(*) FROM fact_patient_claims_summary_etl",
+            "SELECT 'overlap_flags_etl', COUNT(*) FROM overlap_flags_etl",
+            "SELECT 'claim_codes_etl', COUNT(*) FROM claim_codes_etl",
+            "SELECT 'bridge_claim_diagnosis_etl', COUNT(*) FROM bridge_claim_diagnosis_etl",
+            "SELECT 'bridge_claim_procedure_etl', COUNT(*) FROM bridge_claim_procedure_etl",
+            "SELECT 'rollup_fraud_exposure_etl', COUNT(*) FROM rollup_fraud_exposure_etl",
         ]
         
         for query in queries:
@@ -158,42 +310,188 @@ class ClaimsETLPipeline:
         
         return True
     
-    def run(self, step: str = 'all') -> Dict:
+    def step_profile(self) -> Dict:
+        """Profile raw and warehouse tables, one aggregation query per table."""
+        print("\n" + "="*80)
+        print("STEP: DATA PROFILING")
+        print("="*80)
+        
+        return run_profiles(self.executor, self.database, self.run_id)
+    
+    def step_labels(self) -> Dict:
+        """Propagate PotentialFraud changes into the dims, fact and aggregates."""
+        from label_refresh import refresh
+        
+        result = refresh(self.executor, self.database)
+        return {key: result[key] for key in ['status', 'run_id', 'changes'] if key in result}
+    
+    def step_backfill(self, start: str, end: str) -> Dict:
+        """Rebuild fact_claims_monthly_etl for the months start..end ('YYYY-MM')."""
+        from backfill import run as run_backfill
+        
+        result = run_backfill(start, end, executor=self.executor, database=self.database)
+        if result['failed']:
+            raise Exception(f"Backfill failed for {', '.join(result['failed'])}")
+        return {key: result[key] for key in ['status', 'run_id', 'start', 'end', 'seconds']}
+    
+    def preflight(self, step: str = 'all') -> Dict:
+        """
+        Estimate bytes scanned and cost for every statement the step
+        would submit (EXPLAIN only; nothing is created).
+        """
+        print("\n" + "="*80)
+        print("PREFLIGHT: SCAN ESTIMATE")
+        print("="*80)
+        
+        estimator = ScanEstimator(self.executor, self.database)
+        report = estimator.estimate_nodes(pipeline_nodes(step))
+        # The profile step reads each profiled table in full (sample runs skip it)
+        if step in ['all', 'profile'] and not self.sample:
+            estimator.estimate_table_scans(report, 'profile', PROFILE_TABLES)
+        # A backfill stages its month range with one full read of the claims
+        # SELECT (one per backfill.STAGE_MONTHS months)
+        if step == 'backfill':
+            from backfill import MONTHLY_TABLES
+            estimator.estimate_nodes(
+                [('backfill', table, sql_file) for table, sql_file in MONTHLY_TABLES.items()], report
+            )
+        print_report(report)
+        report['violations'] = check_budget(report, allow_unknown=Config.SCAN_BUDGET_MODE != 'refuse')
+        for violation in report['violations']:
+            print(f"WARNING: Over budget: {violation}")
+        return report
+    
+    def publish_run_marker(self, step: str) -> None:
+        publish_run_marker(self.run_id, step)
+    
+    def run(
+        self,
+        step: str = 'all',
+        preflight_only: bool = False,
+        months: Optional[Tuple[str, str]] = None,
+        if_changed: bool = False
+    ) -> Dict:
         """
         Run ETL pipeline.
         
         Args:
-            step: Which step to run ('raw', 'views', 'dims', 'facts', 'validate', 'all')
+            step: Which step to run ('raw', 'views', 'reference', 'dims', 'facts', 'rollups',
+                  'validate', 'profile', 'all', 'labels' for a label refresh, or
+                  'backfill' for a month range of fact_claims_monthly_etl)
+            preflight_only: Only estimate the scan size and cost of the step
+            months: (start, end) 'YYYY-MM' range, for 'backfill'
+            if_changed: Skip an 'all', 'dims' or 'facts' run when no raw table
+                        changed since the last such run (raw_uploader manifest)
         
         Returns:
             Result dict with status and created tables
         """
         try:
+            if step in RAW_BUILD_STEPS and not self.sample:
+                from raw_uploader import changed_tables
+                
+                try:
+                    self.results['raw_changed'] = changed_tables(bucket=Config.BUCKET)
+                    print(f"Raw tables changed since the last build: "
+                          f"{', '.join(self.results['raw_changed']) or 'none'}")
+                except Exception as e:
+                    # Unknown counts as changed: build as usual
+                    print(f"WARNING: Could not read the raw upload manifest: {str(e)}")
+                    self.results['raw_changed'] = None
+                if if_changed and self.results['raw_changed'] == [] and not preflight_only:
+                    print("✓ Nothing to rebuild")
+                    return {
+                        'statusCode': 200,
+                        'timestamp': str(datetime.now()),
+                        'step': step,
+                        'run_id': self.run_id,
+                        'skipped': True,
+                        **self.results
+                    }
+            
+            if preflight_only or Config.SCAN_BUDGET_MODE in ['warn', 'refuse']:
+                report = self.preflight(step)
+                self.results['preflight'] = {
+                    'total_bytes': report['total_bytes'],
+                    'total_cost': round(report['total_cost'], 4),
+                    'unknown': report['unknown'],
+                    'violations': report['violations'],
+                }
+                if preflight_only:
+                    return {
+                        'statusCode': 200,
+                        'timestamp': str(datetime.now()),
+                        'step': step,
+                        'run_id': self.run_id,
+                        'preflight': self.results['preflight'],
+                        'nodes': report['nodes'],
+                    }
+                if report['violations'] and Config.SCAN_BUDGET_MODE == 'refuse':
+                    raise Exception(f"Scan budget exceeded: {'; '.join(report['violations'])}")
+            
+            if self.sample:
+                if step in ['labels', 'backfill']:
+                    raise Exception(f"'{step}' rewrites the main warehouse; run it without 'sample'")
+                prepare_sample(self.executor, self.sample, pipeline_nodes(step))
+                self.results['sample'] = {
+                    'percent': self.sample,
+                    'database': self.database,
+                    'prefix': Config.SAMPLE_PREFIX,
+                }
+            
             if step in ['all', 'views']:
                 self.results['views_created'] = self.step_views()
             
+            if step in ['all', 'reference']:
+                self.results['reference_created'] = self.step_reference()
+            
             if step in ['all', 'dims']:
                 self.results['dims_created'] = self.step_dims()
             
             if step in ['all', 'facts']:
                 self.results['facts_created'] = self.step_facts()
             
+            if step in ['all', 'rollups']:
+                self.results['rollups_created'] = self.step_rollups()
+            
             if step in ['all', 'validate']:
                 self.step_validate()
             
+            # Sample profiles would become the drift baseline of the main warehouse
+            if step in ['all', 'profile'] and not self.sample:
+                self.results['profile'] = self.step_profile()
+            
+            if step == 'labels':
+                self.results['labels'] = self.step_labels()
+            
+            if step == 'backfill':
+                if not months or not all(months):
+                    raise Exception("Backfill needs a month range ('start' and 'end')")
+                self.results['backfill'] = self.step_backfill(*months)
+            
+            # A label refresh publishes its own marker, also when run from the CLI
+            if step not in ['validate', 'profile', 'labels'] and not self.sample:
+                self.publish_run_marker(step)
+            
             print("\n✅ ETL pipeline completed successfully!")
             return {
                 'statusCode': 200,
                 'timestamp': str(datetime.now()),
                 'step': step,
+                'run_id': self.run_id,
                 **self.results
             }
         
         except Exception as e:
             print(f"\n❌ Pipeline error: {str(e)}")
+            # Anything still in flight would keep running, and billing, after we return
+            cancelled = self.executor.cancel_all(str(e))
+            if cancelled:
+                self.results['cancelled_queries'] = cancelled
             return {
                 'statusCode': 500,
                 'timestamp': str(datetime.now()),
+                'run_id': self.run_id,
                 'error': str(e),
                 **self.results
             }
@@ -205,7 +503,14 @@ def lambda_handler(event, context):
     
     Event format:
     {
-        "step": "all" | "views" | "dims" | "facts" | "validate"
+        "step": "all" | "views" | "reference" | "dims" | "facts" | "rollups" | "validate" | "profile"
+                | "labels" | "backfill",
+        "preflight": true,  # optional: only estimate scan size and cost
+        "if_changed": true, # optional: skip all/dims/facts when no raw upload changed
+        "sample": 5,        # optional: build 5% of providers in the sample database
+        "priority": "high", # optional: query slot priority (see query_slots.py)
+        "start": "2009-01", # backfill: first and last month
+        "end": "2011-12"
     }
     """
     print("="*80)
@@ -216,8 +521,18 @@ def lambda_handler(event, context):
     step = (event or {}).get('step', 'all')
     print(f"Requested step: {step}")
     
-    pipeline = ClaimsETLPipeline()
-    result = pipeline.run(step)
+    sample = (event or {}).get('sample')
+    pipeline = ClaimsETLPipeline(sample=int(sample) if sample else None)
+    # Set on every invocation: the executor is shared by warm invocations
+    pipeline.executor.priority = (event or {}).get('priority', Config.QUERY_SLOTS_PRIORITY)
+    pipeline.executor.set_deadline(context)
+    months = ((event or {}).get('start'), (event or {}).get('end')) if step == 'backfill' else None
+    result = pipeline.run(
+        step,
+        preflight_only=bool((event or {}).get('preflight', False)),
+        months=months,
+        if_changed=bool((event or {}).get('if_changed', False))
+    )
     
     return result
 
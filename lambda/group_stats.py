@@ -0,0 +1,157 @@
+# lambda/group_stats.py
+"""
+Grouped Statistics Module
+Sort-based group-by helpers on NumPy arrays: dense group IDs, per-group
+counts, means, quantiles and median absolute deviation, without
+per-row Python loops.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+def encode_groups(*keys: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Map one or more key arrays to dense group IDs (0..n_groups-1).
+
+    Returns:
+        (group_ids, n_groups)
+    """
+    if len(keys) == 1:
+        _, group_ids = np.unique(keys[0], return_inverse=True)
+        group_ids = group_ids.reshape(-1)
+        return group_ids, int(group_ids.max()) + 1 if len(group_ids) else 0
+
+    # Combine the per-key codes into one key, then densify
+    combined = np.zeros(len(keys[0]), dtype=np.int64)
+    for key in keys:
+        _, codes = np.unique(key, return_inverse=True)
+        codes = codes.reshape(-1)
+        combined = combined * (int(codes.max()) + 1 if len(codes) else 1) + codes
+    return encode_groups(combined)
+
+
+def unique_sorted(keys: np.ndarray) -> np.ndarray:
+    """Sorted distinct values (sort + diff; faster than np.unique's hash path on large int arrays)."""
+    keys = np.sort(keys)
+    keep = np.ones(len(keys), dtype=bool)
+    keep[1:] = keys[1:] != keys[:-1]
+    return keys[keep]
+
+
+def group_counts(group_ids: np.ndarray, n_groups: int) -> np.ndarray:
+    return np.bincount(group_ids, minlength=n_groups)
+
+
+def group_mean(group_ids: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """Per-group mean (NaN for empty groups)."""
+    counts = np.bincount(group_ids, minlength=n_groups)
+    sums = np.bincount(group_ids, weights=values, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+
+def group_quantiles(
+    group_ids: np.ndarray,
+    values: np.ndarray,
+    n_groups: int,
+    quantiles
+) -> np.ndarray:
+    """
+    Per-group quantiles with linear interpolation, from a single sort.
+
+    Args:
+        group_ids: Dense group ID per value
+        values: Values (no NaNs)
+        n_groups: Number of groups
+        quantiles: Sequence of q in [0, 1]
+
+    Returns:
+        Array of shape (n_groups, len(quantiles)); NaN for empty groups
+    """
+    quantiles = np.atleast_1d(np.asarray(quantiles, dtype=np.float64))
+    order = np.lexsort((values, group_ids))
+    sorted_values = values[order]
+
+    counts = np.bincount(group_ids, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    result = np.full((n_groups, len(quantiles)), np.nan)
+    nonempty = counts > 0
+    if not nonempty.any():
+        return result
+
+    last = np.maximum(counts - 1, 0)
+    for i, q in enumerate(quantiles):
+        position = q * last
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, last)
+        frac = position - lower
+        lo_vals = sorted_values[(starts + lower)[nonempty]]
+        hi_vals = sorted_values[(starts + upper)[nonempty]]
+        result[nonempty, i] = lo_vals + (hi_vals - lo_vals) * frac[nonempty]
+    return result
+
+
+def group_median(group_ids: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    return group_quantiles(group_ids, values, n_groups, [0.5])[:, 0]
+
+
+def group_mad(
+    group_ids: np.ndarray,
+    values: np.ndarray,
+    n_groups: int,
+    medians: np.ndarray = None
+) -> np.ndarray:
+    """Per-group median absolute deviation around the group median."""
+    if medians is None:
+        medians = group_median(group_ids, values, n_groups)
+    deviations = np.abs(values - medians[group_ids])
+    return group_median(group_ids, deviations, n_groups)
+
+
+def group_percent_rank(group_ids: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Per-value percent rank within its group, 0 (lowest) to 1 (highest),
+    matching SQL PERCENT_RANK(). Ties share the lowest rank.
+    """
+    order = np.lexsort((values, group_ids))
+    sorted_groups = group_ids[order]
+    sorted_values = values[order]
+
+    counts = np.bincount(group_ids, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    # First position of each run of equal (group, value)
+    new_run = np.ones(len(order), dtype=bool)
+    new_run[1:] = (sorted_groups[1:] != sorted_groups[:-1]) | (sorted_values[1:] != sorted_values[:-1])
+    run_start = np.maximum.accumulate(np.where(new_run, np.arange(len(order)), 0))
+
+    rank = run_start - starts[sorted_groups]
+    denom = np.maximum(counts[sorted_groups] - 1, 1)
+    result = np.empty(len(order), dtype=np.float64)
+    result[order] = rank / denom
+    return result
+
+
+def block_pairs(starts: np.ndarray, sizes: np.ndarray):
+    """
+    All (i, j) position pairs with i < j inside each contiguous block
+    [start, start + size) of a sorted array, without a Python loop.
+
+    Returns:
+        (left, right) position arrays
+    """
+    sizes = np.asarray(sizes, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    total = int(sizes.sum())
+    # Position of every member, and its offset inside its block
+    offset = np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    member = np.repeat(starts, sizes) + offset
+
+    # Member at offset k pairs with the size - 1 - k members after it
+    counts = np.repeat(sizes, sizes) - 1 - offset
+    left = np.repeat(member, counts)
+    step = np.arange(len(left)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return left, left + 1 + step
@@ -0,0 +1,266 @@
+# lambda/label_refresh.py
+"""
+Label Refresh Module
+Propagates PotentialFraud changes without a full pipeline run.
+
+is_fraudulent is copied from v_providers_etl into dim_provider_etl and
+then into every row of fact_claims_etl, and from there into the summaries
+and the rollup. When investigators relabel a few providers, this job:
+
+    1. diffs v_providers_etl against the labels baked into dim_provider_etl
+       (the snapshot the last build took)
+    2. rewrites is_fraudulent / risk_level in dim_provider_etl
+    3. rewrites is_fraudulent in the fact_claims_etl and
+       fact_claims_monthly_etl files that contain a relabelled provider;
+       other files are left untouched (after compaction.py sorts the fact
+       by provider_sk, that is a few files)
+    4. rebuilds the label-bearing aggregates from Parquet with their CTAS
+       (LABEL_DEPENDENT_FILES)
+    5. publishes the run marker, so query_service.py drops cached results
+
+Only the labels themselves come from raw CSV (v_providers_etl reads the
+provider file); the risk_level cutoffs are computed from fact_claims_etl
+and the aggregates read only warehouse Parquet.
+
+Each file is replaced with a single PUT, so readers never see missing or
+duplicated rows. The change set is logged to <warehouse>/_label_refresh/.
+
+Usage:
+    python label_refresh.py
+    python label_refresh.py --dry-run             # diff only
+    (pipeline) lambda_handler({'step': 'labels'}, None)
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+import pyarrow as pa
+
+from config import Config
+from parquet_io import clear_directory, list_files, open_dataset, read_columns, table_uri, write_table
+
+
+# Aggregates rebuilt after the fact is relabelled, in dependency order
+LABEL_DEPENDENT_FILES = [
+    'sql/03-facts/fact_claims_summary_grouped_etl.sql',
+    'sql/03-facts/fact_provider_summary_etl.sql',
+    'sql/03-facts/fact_patient_claims_summary_etl.sql',
+    'sql/04-rollups/rollup_fraud_exposure_etl.sql',
+]
+
+
+def current_labels(executor, database: str) -> Dict[str, bool]:
+    """provider_id -> is_fraudulent as v_providers_etl maps PotentialFraud today."""
+    res = executor.execute_query(
+        "SELECT provider_id, is_fraudulent FROM v_providers_etl", database, label="Read provider labels"
+    )
+    if res['status'] != 'success':
+        raise Exception(f"Failed: read provider labels - {res.get('error')}")
+    return {row['provider_id']: bool(row['is_fraudulent']) for row in executor.fetch_results(res['query_id'])}
+
+
+def diff_labels(current: Dict[str, bool], dims: Dict[str, np.ndarray]) -> List[Dict]:
+    """Providers whose label differs from the one in dim_provider_etl."""
+    changes = []
+    for sk, provider_id, baked in zip(dims['provider_sk'], dims['provider_id'], dims['is_fraudulent']):
+        label = current.get(provider_id)
+        if label is not None and label != bool(baked):
+            changes.append({'provider_sk': int(sk), 'provider_id': provider_id, 'is_fraudulent': label})
+    return changes
+
+
+def risk_thresholds() -> Dict[str, float]:
+    """
+    dim_provider_etl.risk_level cutoffs: claim-level mean + 1 and + 2 stddev,
+    from fact_claims_etl's Parquet (as batch_scoring.py) instead of the raw
+    claims behind v_all_claims_etl.
+    """
+    amount = read_columns(table_uri('fact_claims_etl'), ['claim_amount'])['claim_amount']
+    amount = amount[~np.isnan(amount)]
+    mean = float(amount.mean()) if len(amount) else 0.0
+    std = float(amount.std(ddof=1)) if len(amount) > 1 else 0.0  # Athena's STDDEV is the sample one
+    return {'medium': mean + std, 'high': mean + 2 * std}
+
+
+def _label_lookup(changes: List[Dict]):
+    """(changed, label) arrays indexed by provider_sk."""
+    size = max(change['provider_sk'] for change in changes) + 1
+    changed = np.zeros(size, dtype=bool)
+    label = np.zeros(size, dtype=bool)
+    for change in changes:
+        changed[change['provider_sk']] = True
+        label[change['provider_sk']] = change['is_fraudulent']
+    return changed, label
+
+
+def _affected(table: pa.Table, changed: np.ndarray) -> np.ndarray:
+    """Mask of rows whose provider_sk was relabelled."""
+    sk = table.column('provider_sk').to_numpy(zero_copy_only=False)
+    in_range = sk < len(changed)
+    hit = np.zeros(len(sk), dtype=bool)
+    hit[in_range] = changed[sk[in_range]]
+    return hit
+
+
+def _replace(table: pa.Table, name: str, values) -> pa.Table:
+    index = table.schema.get_field_index(name)
+    return table.set_column(index, table.schema.field(index), pa.array(values, table.schema.field(index).type))
+
+
+def rewrite_files(location: str, changes: List[Dict], update=None) -> Dict:
+    """
+    Rewrite is_fraudulent in the files under a table location that contain
+    a changed provider_sk. update(table, values) may adjust further columns.
+
+    Returns:
+        Counts of files scanned and rewritten, and rows relabelled
+    """
+    changed, label = _label_lookup(changes)
+    stats = {'files': 0, 'rewritten': 0, 'rows': 0}
+    scheme = 's3://' if location.startswith('s3://') else ''
+    for info in list_files(location):
+        if info.base_name.startswith(('_', '.')):
+            continue
+        path = scheme + info.path
+        stats['files'] += 1
+        dataset = open_dataset(path)
+        if not _affected(dataset.to_table(columns=['provider_sk']), changed).any():
+            continue
+
+        row_group_size = next(dataset.get_fragments()).metadata.row_group(0).num_rows
+        table = dataset.to_table()
+        hit = _affected(table, changed)
+        new_labels = label[table.column('provider_sk').to_numpy(zero_copy_only=False)[hit]]
+        values = table.column('is_fraudulent').fill_null(False).to_numpy(zero_copy_only=False).astype(bool)
+        stats['rows'] += int((values[hit] != new_labels).sum())
+        values[hit] = new_labels
+        table = _replace(table, 'is_fraudulent', values)
+        if update is not None:
+            table = update(table, values)
+        write_table(table, path, row_group_size)
+        stats['rewritten'] += 1
+    return stats
+
+
+def rebuild_aggregates(executor, database: str) -> List[str]:
+    """Drop, clear and re-run the CTAS of every label-dependent aggregate."""
+    rebuilt = []
+    for sql_file in LABEL_DEPENDENT_FILES:
+        table_name = sql_file.split('/')[-1].replace('.sql', '')
+        query = Config.get_sql_file(sql_file)
+        location = query.split("external_location = '", 1)[1].split("'", 1)[0]
+
+        executor.execute_query(f"DROP TABLE IF EXISTS {table_name}", database)
+        clear_directory(location)
+        res = executor.execute_query(query, database, label=f"Rebuild {table_name}")
+        if res['status'] != 'success':
+            raise Exception(f"Failed: {table_name} - {res.get('error')}")
+        rebuilt.append(table_name)
+    return rebuilt
+
+
+def save_log(record: Dict) -> str:
+    """Store the change set next to the warehouse tables."""
+    from aws_clients import get_client
+
+    key = f"{Config.WAREHOUSE_PREFIX}/_label_refresh/{record['run_id']}.json"
+    get_client('s3').put_object(
+        Bucket=Config.BUCKET,
+        Key=key,
+        Body=json.dumps(record, indent=2).encode('utf-8'),
+        ContentType='application/json'
+    )
+    return key
+
+
+def refresh(executor=None, database: str = Config.DATABASE, dry_run: bool = False) -> Dict:
+    """
+    Propagate label changes from v_providers_etl into the warehouse.
+
+    Args:
+        executor: AthenaExecutor (created when omitted)
+        database: Athena database
+        dry_run: Only report the changed providers
+
+    Returns:
+        Result dict with the changes and rewrite counts
+    """
+    print("=" * 80)
+    print("LABEL REFRESH")
+    print("=" * 80)
+
+    if executor is None:
+        from athena_executor import AthenaExecutor
+        executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+
+    run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    start = time.perf_counter()
+
+    dims = read_columns(table_uri('dim_provider_etl'), ['provider_sk', 'provider_id', 'is_fraudulent'])
+    changes = diff_labels(current_labels(executor, database), dims)
+    flagged = sum(change['is_fraudulent'] for change in changes)
+    print(f"✓ {len(changes)} providers relabelled ({flagged} flagged, {len(changes) - flagged} cleared)")
+    if not changes or dry_run:
+        return {'status': 'skipped' if not changes else 'dry_run', 'run_id': run_id, 'changes': changes}
+
+    thresholds = risk_thresholds() if flagged < len(changes) else None
+
+    def update_risk_level(table: pa.Table, fraud: np.ndarray) -> pa.Table:
+        # Same CASE as sql/02-dims/dim_provider_etl.sql
+        risk = table.column('risk_level').to_numpy(zero_copy_only=False).copy()
+        avg_amount = table.column('avg_claim_amount').fill_null(0).to_numpy(zero_copy_only=False)
+        risk[fraud] = 'Confirmed Fraud'
+        cleared = ~fraud & (risk == 'Confirmed Fraud')
+        if cleared.any():
+            risk[cleared] = np.select(
+                [avg_amount[cleared] > thresholds['high'], avg_amount[cleared] > thresholds['medium']],
+                ['High Risk', 'Medium Risk'], 'Low Risk'
+            )
+        return _replace(table, 'risk_level', risk)
+
+    dim_stats = rewrite_files(table_uri('dim_provider_etl'), changes, update_risk_level)
+    fact_stats = rewrite_files(table_uri('fact_claims_etl'), changes)
+    print(f"✓ fact_claims_etl: rewrote {fact_stats['rewritten']} of {fact_stats['files']} files, "
+          f"{fact_stats['rows']:,} rows relabelled")
+    # Backfilled months copy the label too; files sit in claim_month=... folders
+    monthly_stats = rewrite_files(table_uri('fact_claims_monthly_etl'), changes)
+    print(f"✓ fact_claims_monthly_etl: rewrote {monthly_stats['rewritten']} of {monthly_stats['files']} files, "
+          f"{monthly_stats['rows']:,} rows relabelled")
+
+    rebuilt = rebuild_aggregates(executor, database)
+    print(f"✓ Rebuilt {', '.join(rebuilt)} ({time.perf_counter() - start:.1f}s)")
+
+    record = {
+        'run_id': run_id,
+        'changes': changes,
+        'dim_provider_etl': dim_stats,
+        'fact_claims_etl': fact_stats,
+        'fact_claims_monthly_etl': monthly_stats,
+        'rebuilt': rebuilt,
+        'completed_at': str(datetime.now()),
+    }
+    print(f"✓ Logged to s3://{Config.BUCKET}/{save_log(record)}")
+
+    # Readers cache per run marker; without a new one they serve old labels until the TTL
+    from etl_pipeline import publish_run_marker
+    publish_run_marker(run_id, 'labels')
+    return {'status': 'success', **record}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Propagate provider fraud label changes")
+    parser.add_argument('--dry-run', action='store_true', help="Only list the changed providers")
+    args = parser.parse_args()
+
+    result = refresh(dry_run=args.dry_run)
+    for change in result['changes']:
+        print(f"  {change['provider_id']:<12} -> {'fraud' if change['is_fraudulent'] else 'not fraud'}")
+
+
+if __name__ == '__main__':
+    main()
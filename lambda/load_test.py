@@ -0,0 +1,192 @@
+# lambda/load_test.py
+"""
+Load Test
+Drives AthenaExecutor and the pipeline against athena_simulator.py and
+reports API-call counts, end-to-end latency, throttling and timeouts.
+
+Scenarios:
+    burst     N queries submitted at once from N threads (the pipeline's own
+              SQL, cycled), e.g. hundreds against a 25-query active limit
+    pipeline  ClaimsETLPipeline steps run back to back on the simulator
+
+Latencies are reported in simulated seconds (wall time / --time-scale).
+The executor's poll intervals are scaled by the same factor, so polls per
+query match what a real run would make.
+
+Usage:
+    python load_test.py                                        # 200-query burst
+    python load_test.py --queries 500 --concurrency 25 --throttle-rate 0.05
+    python load_test.py --max-attempts 20                      # provoke timeouts
+    python load_test.py --scenario pipeline --failure-rate 0.02
+    python load_test.py --queries 300 --max-queued 50 --slots 20   # shared slot pool (SQLite)
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+from config import Config
+from athena_executor import AthenaExecutor
+from athena_simulator import SimulatedAthena
+
+
+class _StubS3:
+    def put_object(self, **kwargs):
+        return {}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@contextlib.contextmanager
+def scaled_polling(time_scale: float):
+    """Scale AthenaExecutor's poll intervals and submission backoff to simulated time."""
+    names = ['POLL_INITIAL_INTERVAL', 'POLL_MAX_INTERVAL', 'SUBMIT_INITIAL_BACKOFF', 'SUBMIT_MAX_BACKOFF']
+    saved = {name: getattr(Config, name) for name in names}
+    for name, value in saved.items():
+        setattr(Config, name, value * time_scale)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(Config, name, value)
+
+
+def workload(n_queries: int) -> List[str]:
+    """n_queries statements cycled from the pipeline's SQL files."""
+    from etl_pipeline import pipeline_nodes
+
+    texts = [Config.get_sql_file(sql_file) for _, _, sql_file in pipeline_nodes('all')]
+    return [texts[i % len(texts)] for i in range(n_queries)]
+
+
+def run_burst(simulator: SimulatedAthena, n_queries: int, max_attempts: int, slots=None) -> Dict:
+    """Submit every query at once, one thread each, and wait for all of them."""
+    executor = AthenaExecutor(bucket=Config.BUCKET, athena_client=simulator, slots=slots)
+    queries = workload(n_queries)
+    results: List[Dict] = [None] * n_queries
+    barrier = threading.Barrier(n_queries)
+
+    def worker(i: int) -> None:
+        barrier.wait()
+        start = time.perf_counter()
+        res = executor.execute_query(queries[i], Config.DATABASE, max_attempts=max_attempts)
+        results[i] = {'status': res['status'], 'seconds': time.perf_counter() - start}
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_queries)]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return {'wall_seconds': time.perf_counter() - start, 'results': results}
+
+
+def run_pipeline(simulator: SimulatedAthena, steps: List[str], slots=None) -> Dict:
+    """Run pipeline steps on the simulator (S3 writes are stubbed)."""
+    from aws_clients import set_client
+    from etl_pipeline import ClaimsETLPipeline
+
+    set_client('s3', _StubS3())
+    executor = AthenaExecutor(bucket=Config.BUCKET, athena_client=simulator, slots=slots)
+    results = []
+    start = time.perf_counter()
+    for step in steps:
+        step_start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            outcome = ClaimsETLPipeline(executor).run(step)
+        results.append({
+            'step': step,
+            'status': 'success' if outcome['statusCode'] == 200 else 'failed',
+            'error': outcome.get('error'),
+            'seconds': time.perf_counter() - step_start,
+        })
+    return {'wall_seconds': time.perf_counter() - start, 'results': results}
+
+
+def report(outcome: Dict, simulator: SimulatedAthena, time_scale: float) -> Dict:
+    stats = simulator.stats()
+    latency = [r['seconds'] / time_scale for r in outcome['results']]
+    api_total = sum(stats['api_calls'].values())
+    return {
+        'statuses': dict(Counter(r['status'] for r in outcome['results'])),
+        'latency_p50': statistics.median(latency),
+        'latency_p95': _percentile(latency, 95),
+        'latency_max': max(latency),
+        'wall_seconds': outcome['wall_seconds'],
+        'simulated_seconds': outcome['wall_seconds'] / time_scale,
+        'api_calls': stats['api_calls'],
+        'api_calls_per_query': api_total / max(stats['queries'], 1),
+        'throttled': stats['throttled'],
+        'peak_running': stats['peak_running'],
+        'peak_queued': stats['peak_queued'],
+        'queue_p95': _percentile(stats['queue_seconds'], 95) if stats['queue_seconds'] else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Athena executor on a simulated Athena")
+    parser.add_argument('--scenario', choices=['burst', 'pipeline'], default='burst')
+    parser.add_argument('--queries', type=int, default=200, help="burst: concurrent queries")
+    parser.add_argument('--steps', nargs='+', default=['views', 'dims', 'facts', 'rollups'],
+                        help="pipeline: steps to run")
+    parser.add_argument('--concurrency', type=int, default=25, help="Simulated active-query limit")
+    parser.add_argument('--max-queued', type=int, default=1000)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--time-scale', type=float, default=0.01, help="Wall seconds per simulated second")
+    parser.add_argument('--max-attempts', type=int, default=150, help="Executor polling attempts before timeout")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--slots', type=int, default=None,
+                        help="Take a slot from a shared pool of this size per query (temporary SQLite file)")
+    args = parser.parse_args()
+
+    simulator = SimulatedAthena(
+        max_concurrency=args.concurrency,
+        max_queued=args.max_queued,
+        throttle_rate=args.throttle_rate,
+        failure_rate=args.failure_rate,
+        time_scale=args.time_scale,
+        seed=args.seed,
+    )
+    with tempfile.TemporaryDirectory() as tmp, scaled_polling(args.time_scale):
+        slots = None
+        if args.slots:
+            from query_slots import SQLiteSlots
+            slots = SQLiteSlots(os.path.join(tmp, 'slots.db'), limit=args.slots)
+        if args.scenario == 'burst':
+            outcome = run_burst(simulator, args.queries, args.max_attempts, slots)
+        else:
+            outcome = run_pipeline(simulator, args.steps, slots)
+    if args.scenario == 'pipeline':
+        for r in outcome['results']:
+            print(f"  {r['step']:<10} {r['status']:<8} {r['seconds'] / args.time_scale:>8.1f}s"
+                  + (f"  {r['error']}" if r['error'] else ''))
+
+    r = report(outcome, simulator, args.time_scale)
+    print("=" * 80)
+    print(f"LOAD TEST: {args.scenario} (limit {args.concurrency}, throttle {args.throttle_rate:.0%}, "
+          f"failures {args.failure_rate:.0%})")
+    print("=" * 80)
+    print(f"Statuses:        {r['statuses']}")
+    print(f"Latency (sim s): p50 {r['latency_p50']:.1f}  p95 {r['latency_p95']:.1f}  max {r['latency_max']:.1f}")
+    print(f"Elapsed:         {r['simulated_seconds']:.1f} sim s ({r['wall_seconds']:.1f} s wall)")
+    print(f"Peak running:    {r['peak_running']}   peak queued: {r['peak_queued']}   "
+          f"queue p95: {r['queue_p95']:.1f} sim s")
+    print(f"API calls:       {r['api_calls']} ({r['api_calls_per_query']:.1f} per query)")
+    print(f"Throttled:       {r['throttled'] or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+# lambda/near_duplicates.py
+"""
+Near-Duplicate Claims Module
+Finds re-billed encounters whose code sets were changed slightly.
+
+Each claim's set of diagnosis codes (1..10) and procedure codes (1..6)
+from claim_codes_etl becomes a MinHash signature, computed for all claims
+at once with NumPy. LSH banding then buckets claims by
+(patient, provider, band of the signature), so only claims for the same
+patient at the same provider with a matching band are compared. Those
+candidates must also fall within a date window. Surviving pairs are scored
+by the share of matching signature rows (an estimate of Jaccard similarity).
+
+Usage:
+    python near_duplicates.py                              # read/write warehouse S3
+    python near_duplicates.py --codes ./extract/claim_codes --out ./out/near_duplicates/
+    python near_duplicates.py --window-days 14 --threshold 0.6 --register
+"""
+
+import argparse
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config import Config
+from group_stats import block_pairs
+from parquet_io import date_keys_to_days, flatten_list_column, read_table, table_uri, write_table
+
+
+DEFAULT_NUM_HASHES = 64
+DEFAULT_BANDS = 16              # 16 bands x 4 rows: ~64% recall at Jaccard 0.5, ~99% at 0.7
+DEFAULT_WINDOW_DAYS = 30
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_MAX_BUCKET = 200        # larger buckets (pairs grow quadratically) are skipped
+
+# Prime modulus for the universal hash family h(x) = (a * x + b) mod p
+_PRIME = np.uint64((1 << 31) - 1)
+_SEED = 20250101
+
+OUTPUT_SCHEMA = pa.schema([
+    ('claim_id_1', pa.string()),
+    ('claim_id_2', pa.string()),
+    ('claim_sk_1', pa.int64()),
+    ('claim_sk_2', pa.int64()),
+    ('patient_sk', pa.int64()),
+    ('provider_sk', pa.int64()),
+    ('days_apart', pa.int32()),
+    ('similarity', pa.float64()),
+    ('codes_1', pa.int32()),
+    ('codes_2', pa.int32()),
+])
+
+
+def load_code_sets(codes_path: str) -> Dict[str, np.ndarray]:
+    """
+    Read claim_codes_etl into claim arrays plus a flat (row, token) list.
+
+    Diagnosis and procedure codes get separate token IDs, so a diagnosis
+    and a procedure with the same digits never match.
+    """
+    table = read_table(codes_path, columns=[
+        'claim_sk', 'claim_id', 'patient_sk', 'provider_sk', 'claim_start_date_key',
+        'diagnosis_codes', 'procedure_codes',
+    ])
+
+    dx_rows, dx_values = flatten_list_column(table.column('diagnosis_codes'))
+    px_rows, px_values = flatten_list_column(table.column('procedure_codes'))
+    dx_encoded = pc.dictionary_encode(dx_values)
+    px_encoded = pc.dictionary_encode(px_values)
+    dx_tokens = dx_encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+    px_tokens = px_encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+    px_tokens = np.where(px_tokens >= 0, px_tokens + len(dx_encoded.dictionary), -1)
+
+    rows = np.concatenate([dx_rows, px_rows])
+    tokens = np.concatenate([dx_tokens, px_tokens])
+    keep = tokens >= 0
+    # Sorted, de-duplicated (row, token): sets, grouped by claim
+    keys = np.sort((rows[keep] << 32) | tokens[keep])
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    keys = keys[first]
+
+    def col(name):
+        return table.column(name).fill_null(0).to_numpy(zero_copy_only=False).astype(np.int64)
+
+    return {
+        'claim_sk': col('claim_sk'),
+        'claim_id': table.column('claim_id').to_numpy(zero_copy_only=False),
+        'patient_sk': col('patient_sk'),
+        'provider_sk': col('provider_sk'),
+        'start_day': date_keys_to_days(col('claim_start_date_key')),
+        'token_rows': keys >> 32,
+        'tokens': keys & 0xFFFFFFFF,
+    }
+
+
+def minhash_signatures(
+    token_rows: np.ndarray,
+    tokens: np.ndarray,
+    n_claims: int,
+    num_hashes: int = DEFAULT_NUM_HASHES,
+    seed: int = _SEED
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    MinHash signature per claim: for each hash function, the minimum hash
+    over the claim's tokens (np.minimum.reduceat over the sorted token list).
+
+    Args:
+        token_rows: Claim row of each token, sorted
+        tokens: Token IDs
+        n_claims: Number of claims
+
+    Returns:
+        (signatures uint32 [n_claims, num_hashes], has_codes bool [n_claims])
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(_PRIME), num_hashes, dtype=np.uint64)
+    b = rng.integers(0, int(_PRIME), num_hashes, dtype=np.uint64)
+
+    signatures = np.full((n_claims, num_hashes), np.iinfo(np.uint32).max, dtype=np.uint32)
+    has_codes = np.zeros(n_claims, dtype=bool)
+    if len(tokens) == 0:
+        return signatures, has_codes
+
+    starts = np.flatnonzero(np.r_[True, token_rows[1:] != token_rows[:-1]])
+    claim_rows = token_rows[starts]
+    has_codes[claim_rows] = True
+
+    values = tokens.astype(np.uint64)
+    for i in range(num_hashes):
+        hashed = (a[i] * values + b[i]) % _PRIME
+        signatures[claim_rows, i] = np.minimum.reduceat(hashed, starts).astype(np.uint32)
+    return signatures, has_codes
+
+
+def candidate_pairs(
+    signatures: np.ndarray,
+    eligible: np.ndarray,
+    claim_sk: np.ndarray,
+    patient_sk: np.ndarray,
+    provider_sk: np.ndarray,
+    start_day: np.ndarray,
+    bands: int = DEFAULT_BANDS,
+    window_days: int = DEFAULT_WINDOW_DAYS,
+    max_bucket: int = DEFAULT_MAX_BUCKET
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    LSH banding keyed by (patient, provider, band values).
+
+    Returns:
+        (left, right, skipped_buckets) claim row pairs, ordered so that
+        claim_sk[left] < claim_sk[right]
+    """
+    rows_per_band = signatures.shape[1] // bands
+    claims = np.flatnonzero(eligible)
+    base = (patient_sk[claims].astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+            + provider_sk[claims].astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F))
+    days = start_day[claims].astype('datetime64[D]').astype(np.int64)
+
+    pair_keys = []
+    skipped = 0
+    for band in range(bands):
+        # Wrapping uint64 arithmetic: a cheap 64-bit hash of the band
+        key = base + np.uint64(((band + 1) * 0x165667B19E3779F9) & 0xFFFFFFFFFFFFFFFF)
+        for col in range(band * rows_per_band, (band + 1) * rows_per_band):
+            key = key * np.uint64(0x100000001B3) + signatures[claims, col].astype(np.uint64)
+
+        order = np.argsort(key, kind='stable')
+        sorted_key = key[order]
+        starts = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]])
+        sizes = np.diff(np.r_[starts, len(sorted_key)])
+        too_big = sizes > max_bucket
+        skipped += int(too_big.sum())
+        keep = (sizes > 1) & ~too_big
+        if not keep.any():
+            continue
+
+        left, right = block_pairs(starts[keep], sizes[keep])
+        left, right = order[left], order[right]
+        near = np.abs(days[left] - days[right]) <= window_days
+        left, right = claims[left[near]], claims[right[near]]
+        # Row order in claim_codes_etl is not claim_sk order
+        swap = claim_sk[left] > claim_sk[right]
+        lo = np.where(swap, right, left)
+        hi = np.where(swap, left, right)
+        pair_keys.append((lo.astype(np.int64) << 32) | hi.astype(np.int64))
+
+    if not pair_keys:
+        return np.array([], np.int64), np.array([], np.int64), skipped
+    keys = np.sort(np.concatenate(pair_keys))
+    keys = keys[np.r_[True, keys[1:] != keys[:-1]]]
+    return keys >> 32, keys & 0xFFFFFFFF, skipped
+
+
+def find_near_duplicates(
+    data: Dict[str, np.ndarray],
+    num_hashes: int = DEFAULT_NUM_HASHES,
+    bands: int = DEFAULT_BANDS,
+    window_days: int = DEFAULT_WINDOW_DAYS,
+    threshold: float = DEFAULT_THRESHOLD,
+    max_bucket: int = DEFAULT_MAX_BUCKET
+) -> pa.Table:
+    """Signatures -> LSH candidates -> scored pairs above the threshold."""
+    if num_hashes % bands:
+        raise ValueError(f"num_hashes ({num_hashes}) must be a multiple of bands ({bands})")
+
+    n_claims = len(data['claim_sk'])
+    signatures, has_codes = minhash_signatures(data['token_rows'], data['tokens'], n_claims, num_hashes)
+    eligible = has_codes & ~np.isnat(data['start_day'])
+
+    left, right, skipped = candidate_pairs(
+        signatures, eligible, data['claim_sk'], data['patient_sk'], data['provider_sk'], data['start_day'],
+        bands, window_days, max_bucket
+    )
+    if skipped:
+        print(f"WARNING: Skipped {skipped} LSH buckets larger than {max_bucket} claims")
+
+    similarity = (signatures[left] == signatures[right]).mean(axis=1) if len(left) else np.array([])
+    keep = similarity >= threshold
+    left, right, similarity = left[keep], right[keep], similarity[keep]
+    print(f"✓ {len(keep):,} candidate pairs, {int(keep.sum()):,} at similarity >= {threshold}")
+
+    n_codes = np.bincount(data['token_rows'], minlength=n_claims)
+    days = data['start_day'].astype(np.int64)
+    return pa.table({
+        'claim_id_1': pa.array(data['claim_id'][left], pa.string()),
+        'claim_id_2': pa.array(data['claim_id'][right], pa.string()),
+        'claim_sk_1': data['claim_sk'][left],
+        'claim_sk_2': data['claim_sk'][right],
+        'patient_sk': data['patient_sk'][left],
+        'provider_sk': data['provider_sk'][left],
+        'days_apart': np.abs(days[left] - days[right]).astype(np.int32),
+        'similarity': similarity,
+        'codes_1': n_codes[left].astype(np.int32),
+        'codes_2': n_codes[right].astype(np.int32),
+    }, schema=OUTPUT_SCHEMA)
+
+
+def run(codes_path: str, out_path: str, params: Optional[Dict] = None) -> Dict:
+    """Load code sets, find near-duplicate pairs and write them."""
+    print("=" * 80)
+    print("NEAR-DUPLICATE CLAIMS")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    data = load_code_sets(codes_path)
+    loaded = time.perf_counter()
+    print(f"✓ Loaded {len(data['claim_sk']):,} claims, {len(data['tokens']):,} codes in {loaded - start:.1f}s")
+
+    table = find_near_duplicates(data, **(params or {}))
+    print(f"✓ Matched in {time.perf_counter() - loaded:.1f}s")
+
+    write_table(table, out_path)
+    return {'status': 'success', 'claims': len(data['claim_sk']), 'pairs': table.num_rows, 'output': out_path}
+
+
+def register_table() -> Dict:
+    """Create the Athena table over the written pairs."""
+    from athena_executor import AthenaExecutor
+
+    executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+    return executor.execute_query(
+        Config.get_sql_file('sql/05-scoring/near_duplicate_claims_etl.sql'),
+        Config.DATABASE,
+        label='Register near_duplicate_claims_etl'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate claims via code-set MinHash")
+    parser.add_argument('--codes', default=table_uri('claim_codes_etl'))
+    parser.add_argument('--out', default=table_uri('near_duplicate_claims_etl'))
+    parser.add_argument('--num-hashes', type=int, default=DEFAULT_NUM_HASHES)
+    parser.add_argument('--bands', type=int, default=DEFAULT_BANDS)
+    parser.add_argument('--window-days', type=int, default=DEFAULT_WINDOW_DAYS)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--max-bucket', type=int, default=DEFAULT_MAX_BUCKET)
+    parser.add_argument('--register', action='store_true', help="Create the Athena table")
+    args = parser.parse_args()
+
+    params = {
+        'num_hashes': args.num_hashes,
+        'bands': args.bands,
+        'window_days': args.window_days,
+        'threshold': args.threshold,
+        'max_bucket': args.max_bucket,
+    }
+    result = run(args.codes, args.out, params)
+    print(f"✓ {result['pairs']:,} near-duplicate pairs")
+
+    if args.register:
+        res = register_table()
+        if res['status'] != 'success':
+            raise Exception(f"Failed: near_duplicate_claims_etl - {res.get('error')}")
+
+
+if __name__ == '__main__':
+    main()
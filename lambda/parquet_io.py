@@ -0,0 +1,206 @@
+# lambda/parquet_io.py
+"""
+Parquet I/O Helpers
+Read and write warehouse Parquet (local paths or s3:// URIs) for the
+NumPy analytics jobs, plus conversions for the fact tables' column encodings.
+"""
+
+import io
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+from config import Config
+
+
+# Athena table -> folder under Config.WAREHOUSE_PREFIX (matches external_location in sql/)
+WAREHOUSE_TABLES = {
+    'dim_date_etl': 'dim_tables/dim_date',
+    'dim_provider_etl': 'dim_tables/dim_provider',
+    'dim_patient_etl': 'dim_tables/dim_patient_clean',
+    'dim_diagnosis_etl': 'dim_tables/dim_diagnosis',
+    'dim_procedure_etl': 'dim_tables/dim_procedure',
+    'fact_claims_etl': 'fact_tables/fact_claims',
+    'fact_claims_monthly_etl': 'fact_tables/fact_claims_monthly',
+    'claim_codes_etl': 'fact_tables/claim_codes',
+    'bridge_claim_diagnosis_etl': 'fact_tables/bridge_claim_diagnosis',
+    'bridge_claim_procedure_etl': 'fact_tables/bridge_claim_procedure',
+    'fact_provider_summary_etl': 'fact_tables/fact_provider_summary_v2',
+    'fact_patient_claims_summary_etl': 'fact_tables/fact_patient_summary_v2',
+    'claim_rule_flags_etl': 'scoring_tables/claim_rule_flags',
+    'provider_scores_etl': 'scoring_tables/provider_scores',
+    'provider_peer_scores_etl': 'scoring_tables/provider_peer_scores',
+    'provider_network_etl': 'scoring_tables/provider_network',
+    'near_duplicate_claims_etl': 'scoring_tables/near_duplicate_claims',
+    'claim_code_rarity_etl': 'scoring_tables/claim_code_rarity',
+}
+
+
+def table_uri(table_name: str, bucket: str = Config.BUCKET) -> str:
+    """Return the S3 location of a warehouse table."""
+    if table_name not in WAREHOUSE_TABLES:
+        raise KeyError(f"Unknown warehouse table: {table_name}")
+    return f"s3://{bucket}/{Config.WAREHOUSE_PREFIX}/{WAREHOUSE_TABLES[table_name]}/"
+
+
+def _resolve(path: str):
+    """Split a local path or URI into (filesystem, path)."""
+    if '://' in path:
+        return pafs.FileSystem.from_uri(path)
+    return pafs.LocalFileSystem(), os.path.abspath(path)
+
+
+def open_dataset(path: str) -> ds.Dataset:
+    """Open a Parquet file or directory (local or s3://) as a dataset."""
+    filesystem, resolved = _resolve(path)
+    return ds.dataset(resolved, format='parquet', filesystem=filesystem)
+
+
+def read_table(
+    path: str,
+    columns: Optional[List[str]] = None,
+    filter: Optional[ds.Expression] = None
+) -> pa.Table:
+    """
+    Read a Parquet file or directory, projecting columns and pushing
+    the filter down to row groups.
+    """
+    return open_dataset(path).to_table(columns=columns, filter=filter)
+
+
+def read_columns(
+    path: str,
+    columns: List[str],
+    filter: Optional[ds.Expression] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Read columns as NumPy arrays.
+
+    Numeric nulls become NaN (floats) or 0 (ints/bools); string columns
+    come back as object arrays with None for nulls.
+    """
+    table = read_table(path, columns=columns, filter=filter)
+    return {name: column_to_numpy(table.column(name)) for name in columns}
+
+
+def column_to_numpy(column) -> np.ndarray:
+    """Convert an Arrow column to a NumPy array with a consistent null policy."""
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    col_type = column.type
+    if pa.types.is_floating(col_type):
+        return column.fill_null(np.nan).to_numpy(zero_copy_only=False)
+    if pa.types.is_integer(col_type) or pa.types.is_boolean(col_type):
+        return column.fill_null(0).to_numpy(zero_copy_only=False)
+    if pa.types.is_date(col_type):
+        return column.to_numpy(zero_copy_only=False).astype('datetime64[D]')
+    return column.to_numpy(zero_copy_only=False)
+
+
+def clean_codes(column) -> pa.Array:
+    """Apply the dimensions' code cleaning (quotes, spaces, float suffix) in Arrow."""
+    column = pc.cast(column, pa.string())
+    column = pc.replace_substring_regex(column, pattern=r'["\' ]', replacement='')
+    column = pc.replace_substring_regex(column, pattern=r'\.0$', replacement='')
+    column = pc.if_else(pc.is_in(column, value_set=pa.array(['', 'NA'])), None, column)
+    return column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+
+
+def flatten_list_column(column):
+    """
+    Flatten a LIST column.
+
+    Returns:
+        (row index of every element as int64 NumPy array, flat values as Arrow array)
+    """
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    rows = pc.list_parent_indices(column).to_numpy().astype(np.int64)
+    return rows, pc.list_flatten(column)
+
+
+def write_table(table: pa.Table, path: str, row_group_size: int = 1_000_000) -> str:
+    """
+    Write a table as a single Parquet file (local path or s3:// URI).
+
+    A path ending in '/' is treated as a folder and gets 'part-00000.parquet'.
+    """
+    if path.endswith('/'):
+        path = path + 'part-00000.parquet'
+    filesystem, resolved = _resolve(path)
+    if isinstance(filesystem, pafs.LocalFileSystem):
+        os.makedirs(os.path.dirname(resolved), exist_ok=True)
+    pq.write_table(
+        table, resolved, filesystem=filesystem,
+        compression='snappy', row_group_size=row_group_size
+    )
+    print(f"✓ Wrote {table.num_rows} rows -> {path}")
+    return path
+
+
+def write_npz(path: str, **arrays) -> str:
+    """Save NumPy arrays as a compressed .npz (local path or s3:// URI)."""
+    filesystem, resolved = _resolve(path)
+    if isinstance(filesystem, pafs.LocalFileSystem):
+        os.makedirs(os.path.dirname(resolved), exist_ok=True)
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    with filesystem.open_output_stream(resolved) as stream:
+        stream.write(buffer.getvalue())
+    return path
+
+
+def list_files(path: str) -> List[pafs.FileInfo]:
+    """Files under a local directory or S3 prefix (recursive, sorted by path)."""
+    filesystem, resolved = _resolve(path)
+    selector = pafs.FileSelector(resolved.rstrip('/'), recursive=True, allow_not_found=True)
+    infos = [info for info in filesystem.get_file_info(selector) if info.type == pafs.FileType.File]
+    return sorted(infos, key=lambda info: info.path)
+
+
+def copy_directory(source: str, destination: str) -> int:
+    """
+    Copy every file under source to the same relative path under destination
+    (server-side on S3). Returns the number of files copied.
+    """
+    filesystem, source_root = _resolve(source)
+    _, destination_root = _resolve(destination)
+    source_root, destination_root = source_root.rstrip('/'), destination_root.rstrip('/')
+    files = list_files(source)
+    for info in files:
+        target = destination_root + info.path[len(source_root):]
+        if isinstance(filesystem, pafs.LocalFileSystem):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+        filesystem.copy_file(info.path, target)
+    return len(files)
+
+
+def clear_directory(path: str) -> None:
+    """Delete everything under a local directory or S3 prefix (keeps the prefix)."""
+    filesystem, resolved = _resolve(path)
+    filesystem.delete_dir_contents(resolved.rstrip('/'), missing_dir_ok=True)
+
+
+def date_keys_to_days(keys: np.ndarray) -> np.ndarray:
+    """
+    Convert YYYYMMDD integer date keys to datetime64[D].
+
+    Key 0 (the facts' "no date" value) becomes NaT.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    valid = keys > 0
+    years = np.where(valid, keys // 10000, 1970)
+    months = np.where(valid, keys // 100 % 100, 1)
+    days = np.where(valid, keys % 100, 1)
+    result = (
+        (years - 1970).astype('datetime64[Y]').astype('datetime64[M]')
+        + (months - 1).astype('timedelta64[M]')
+    ).astype('datetime64[D]') + (days - 1).astype('timedelta64[D]')
+    result[~valid] = np.datetime64('NaT')
+    return result
@@ -0,0 +1,319 @@
+# lambda/peer_groups.py
+"""
+Peer Groups Module
+Robust peer-group outlier scores for providers.
+
+dim_provider_etl.risk_level compares every provider with one global
+mean + k * stddev. Here providers are compared only with their peers:
+
+    peer group = provider_type + state + claim-type mix
+
+and scored with median/MAD robust z-scores and within-group percent ranks,
+for every metric and every provider in one vectorized pass. Peer groups
+smaller than --min-group-size fall back to (provider_type, mix) and then to
+provider_type alone, and those providers are scored against the whole
+coarser group, including members that qualified at a finer level.
+
+Providers carry no location, so a provider's state is the state most of
+its patients live in (dim_patient_etl.state_code).
+
+Usage:
+    python peer_groups.py                                  # read/write warehouse S3
+    python peer_groups.py --providers ./extract/dim_provider --claims ./extract/fact_claims \\
+        --patients ./extract/dim_patient --out ./out/provider_peer_scores/
+    python peer_groups.py --register
+"""
+
+import argparse
+import time
+from typing import Dict
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config import Config
+from group_stats import (
+    encode_groups, group_counts, group_mean, group_median, group_percent_rank, group_quantiles
+)
+from parquet_io import read_table, table_uri, write_table
+
+
+# Provider metrics scored against peers (claims_per_patient is derived)
+METRICS = ['avg_claim_amount', 'claims_per_patient', 'max_claim_amount', 'avg_length_of_stay']
+
+# Inpatient share upper bounds -> claim-type mix label
+MIX_BUCKETS = [
+    (0.0, 'Outpatient'),
+    (0.25, 'Mostly Outpatient'),
+    (0.75, 'Mixed'),
+    (0.9999, 'Mostly Inpatient'),
+    (1.0, 'Inpatient'),
+]
+
+DEFAULT_MIN_GROUP_SIZE = 10
+
+# Robust z thresholds for peer_risk_level (3.5 is the usual MAD cut-off).
+# Only the high side counts: billing below peers is not a fraud signal.
+HIGH_RISK_Z = 3.5
+MEDIUM_RISK_Z = 2.0
+
+PEER_LEVELS = ['type_state_mix', 'type_mix', 'type']
+
+
+def modal_state(
+    claim_provider: np.ndarray,
+    claim_patient: np.ndarray,
+    patient_sk: np.ndarray,
+    patient_state: np.ndarray,
+    provider_sk: np.ndarray
+) -> np.ndarray:
+    """
+    State most of each provider's claims come from (ties: lowest state code).
+    Returns -1 for providers without claims.
+    """
+    state_by_sk = np.full(int(patient_sk.max()) + 1 if len(patient_sk) else 1, -1, dtype=np.int64)
+    state_by_sk[patient_sk] = patient_state
+    in_range = (claim_patient >= 0) & (claim_patient < len(state_by_sk))
+    claim_state = np.full(len(claim_patient), -1, dtype=np.int64)
+    claim_state[in_range] = state_by_sk[claim_patient[in_range]]
+
+    known = claim_state >= 0
+    pairs, counts = np.unique(
+        np.stack([claim_provider[known], claim_state[known]]), axis=1, return_counts=True
+    )
+    # Sort by provider, then count descending, then state; first row per provider wins
+    order = np.lexsort((pairs[1], -counts, pairs[0]))
+    pairs = pairs[:, order]
+    first = np.ones(pairs.shape[1], dtype=bool)
+    first[1:] = pairs[0, 1:] != pairs[0, :-1]
+
+    result = np.full(len(provider_sk), -1, dtype=np.int64)
+    position = np.searchsorted(pairs[0, first], provider_sk)
+    position = np.minimum(position, max(int(first.sum()) - 1, 0))
+    if first.any():
+        hit = pairs[0, first][position] == provider_sk
+        result[hit] = pairs[1, first][position][hit]
+    return result
+
+
+def mix_bucket(inpatient: np.ndarray, outpatient: np.ndarray) -> np.ndarray:
+    """Claim-type mix label from the provider's inpatient share."""
+    total = inpatient + outpatient
+    share = np.where(total > 0, inpatient / np.maximum(total, 1), 0.0)
+    bounds = np.array([upper for upper, _ in MIX_BUCKETS])
+    labels = np.array([label for _, label in MIX_BUCKETS])
+    return labels[np.minimum(np.searchsorted(bounds, share, side='left'), len(labels) - 1)]
+
+
+def robust_z(values: np.ndarray, group_ids: np.ndarray, n_groups: int):
+    """
+    Robust z-score (x - median) / (1.4826 * MAD) within each group.
+
+    When more than half the group shares one value the MAD is 0; the scale
+    then falls back to 1.2533 * mean absolute deviation, and to z = 0 when
+    every value in the group is identical.
+
+    Returns:
+        (z, medians, scales) with medians/scales per group
+    """
+    medians = group_median(group_ids, values, n_groups)
+    deviations = np.abs(values - medians[group_ids])
+    mads = group_median(group_ids, deviations, n_groups) * 1.4826
+    meanads = group_mean(group_ids, deviations, n_groups) * 1.2533
+    scales = np.where(mads > 0, mads, meanads)
+
+    scale = scales[group_ids]
+    z = np.where(scale > 0, (values - medians[group_ids]) / np.where(scale > 0, scale, 1), 0.0)
+    return z, medians, scales
+
+
+def assign_peer_groups(
+    provider_type: np.ndarray,
+    state: np.ndarray,
+    mix: np.ndarray,
+    min_group_size: int
+):
+    """
+    Pick each provider's peer level: the finest one whose group has at least
+    min_group_size providers. The peer group is the whole group at that
+    level, so a provider that falls back is compared with every provider of
+    the coarser group, not only with the others that fell back.
+
+    Returns:
+        (group_ids, n_groups, peer_level, candidates) where peer_level indexes
+        PEER_LEVELS, candidates holds (ids, n) for every level, and group_ids
+        identifies the (level, group) a provider is scored against
+    """
+    candidates = [
+        encode_groups(provider_type, state, mix),
+        encode_groups(provider_type, mix),
+        encode_groups(provider_type),
+    ]
+    level = np.full(len(provider_type), len(candidates) - 1, dtype=np.int64)
+    for i in reversed(range(len(candidates) - 1)):
+        ids, n = candidates[i]
+        level = np.where(group_counts(ids, n)[ids] >= min_group_size, i, level)
+
+    # One combined key (level, group id at that level), then densified
+    group_ids, n_groups = encode_groups(level, at_level(level, [ids for ids, _ in candidates]))
+    return group_ids, n_groups, level, candidates
+
+
+def at_level(level: np.ndarray, per_level) -> np.ndarray:
+    """Per provider, the value computed at its own peer level."""
+    return np.select([level == i for i in range(len(per_level))], per_level)
+
+
+def score_providers(inputs: Dict[str, np.ndarray], min_group_size: int = DEFAULT_MIN_GROUP_SIZE) -> pa.Table:
+    """
+    Score every provider against its peer group.
+
+    Args:
+        inputs: Output of load_inputs
+        min_group_size: Smallest peer group before falling back to a coarser one
+
+    Returns:
+        Arrow table, one row per provider
+    """
+    group_ids, n_groups, level, candidates = assign_peer_groups(
+        inputs['provider_type'], inputs['state_code'], inputs['claim_mix'], min_group_size
+    )
+
+    # Statistics per level over full groups; each provider takes its own level's
+    def peer_stat(stat):
+        return at_level(level, [stat(ids, n)[ids] for ids, n in candidates])
+
+    columns = {
+        'provider_sk': inputs['provider_sk'],
+        'provider_type': inputs['provider_type'],
+        # -1 means no claims with a known patient state
+        'state_code': pa.array(inputs['state_code'], pa.int32(), mask=inputs['state_code'] < 0),
+        'claim_mix': inputs['claim_mix'],
+        'peer_level': np.array(PEER_LEVELS)[level],
+        'peer_group_id': group_ids.astype(np.int32),
+        'peer_group_size': peer_stat(group_counts).astype(np.int32),
+    }
+    max_z = np.zeros(len(group_ids))
+    for metric in METRICS:
+        values = inputs[metric]
+        z = at_level(level, [robust_z(values, ids, n)[0] for ids, n in candidates])
+        columns[metric] = values
+        columns[f'{metric}_peer_median'] = peer_stat(lambda ids, n: group_median(ids, values, n))
+        columns[f'{metric}_peer_p90'] = peer_stat(lambda ids, n: group_quantiles(ids, values, n, [0.9])[:, 0])
+        columns[f'{metric}_z'] = z
+        columns[f'{metric}_pct_rank'] = at_level(
+            level, [group_percent_rank(ids, values, n) for ids, n in candidates]
+        )
+        max_z = np.maximum(max_z, z)
+
+    columns['max_peer_z'] = max_z
+    columns['peer_risk_level'] = np.select(
+        [max_z > HIGH_RISK_Z, max_z > MEDIUM_RISK_Z],
+        ['High Risk', 'Medium Risk'],
+        default='Low Risk',
+    )
+
+    return pa.table(columns)
+
+
+def load_inputs(providers_path: str, claims_path: str, patients_path: str) -> Dict[str, np.ndarray]:
+    """Read provider metrics and derive state and claim mix."""
+    providers = read_table(providers_path, columns=[
+        'provider_sk', 'provider_type', 'total_claims', 'total_patients', 'avg_claim_amount',
+        'max_claim_amount', 'avg_length_of_stay', 'inpatient_claims', 'outpatient_claims',
+    ])
+    claims = read_table(claims_path, columns=['provider_sk', 'patient_sk'])
+    patients = read_table(patients_path, columns=['patient_sk', 'state_code'])
+
+    def col(table, name, fill=0):
+        return table.column(name).fill_null(fill).to_numpy()
+
+    provider_sk = col(providers, 'provider_sk').astype(np.int64)
+    total_claims = col(providers, 'total_claims').astype(np.float64)
+    total_patients = col(providers, 'total_patients').astype(np.float64)
+
+    return {
+        'provider_sk': provider_sk,
+        'provider_type': providers.column('provider_type').fill_null('Mixed').to_numpy(zero_copy_only=False),
+        'state_code': modal_state(
+            col(claims, 'provider_sk').astype(np.int64),
+            col(claims, 'patient_sk').astype(np.int64),
+            col(patients, 'patient_sk').astype(np.int64),
+            col(patients, 'state_code', -1).astype(np.int64),
+            provider_sk,
+        ),
+        'claim_mix': mix_bucket(
+            col(providers, 'inpatient_claims').astype(np.float64),
+            col(providers, 'outpatient_claims').astype(np.float64),
+        ),
+        'avg_claim_amount': col(providers, 'avg_claim_amount').astype(np.float64),
+        'claims_per_patient': total_claims / np.maximum(total_patients, 1),
+        'max_claim_amount': col(providers, 'max_claim_amount').astype(np.float64),
+        'avg_length_of_stay': col(providers, 'avg_length_of_stay').astype(np.float64),
+    }
+
+
+def run(
+    providers_path: str,
+    claims_path: str,
+    patients_path: str,
+    out_path: str,
+    min_group_size: int = DEFAULT_MIN_GROUP_SIZE
+) -> Dict:
+    """Load, score and write the provider peer scores."""
+    print("=" * 80)
+    print("PROVIDER PEER GROUPS")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    inputs = load_inputs(providers_path, claims_path, patients_path)
+    loaded = time.perf_counter()
+    print(f"✓ Loaded {len(inputs['provider_sk']):,} providers in {loaded - start:.1f}s")
+
+    table = score_providers(inputs, min_group_size)
+    print(f"✓ Scored {len(METRICS)} metrics across "
+          f"{len(np.unique(table.column('peer_group_id').to_numpy()))} peer groups "
+          f"in {time.perf_counter() - loaded:.2f}s")
+
+    for level, count in zip(*np.unique(table.column('peer_level').to_numpy(zero_copy_only=False), return_counts=True)):
+        print(f"  {level:<16} {count:>8,} providers")
+
+    write_table(table, out_path)
+    high = int(pc.sum(pc.equal(table.column('peer_risk_level'), 'High Risk')).as_py() or 0)
+    return {'status': 'success', 'providers': table.num_rows, 'high_risk': high, 'output': out_path}
+
+
+def register_table() -> Dict:
+    """Create the Athena table over the written scores."""
+    from athena_executor import AthenaExecutor
+
+    executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+    return executor.execute_query(
+        Config.get_sql_file('sql/05-scoring/provider_peer_scores_etl.sql'),
+        Config.DATABASE,
+        label='Register provider_peer_scores_etl'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provider peer-group outlier scores")
+    parser.add_argument('--providers', default=table_uri('dim_provider_etl'))
+    parser.add_argument('--claims', default=table_uri('fact_claims_etl'))
+    parser.add_argument('--patients', default=table_uri('dim_patient_etl'))
+    parser.add_argument('--out', default=table_uri('provider_peer_scores_etl'))
+    parser.add_argument('--min-group-size', type=int, default=DEFAULT_MIN_GROUP_SIZE)
+    parser.add_argument('--register', action='store_true', help="Create the Athena table")
+    args = parser.parse_args()
+
+    result = run(args.providers, args.claims, args.patients, args.out, args.min_group_size)
+    print(f"✓ {result['high_risk']:,} of {result['providers']:,} providers are peer outliers")
+
+    if args.register:
+        res = register_table()
+        if res['status'] != 'success':
+            raise Exception(f"Failed: provider_peer_scores_etl - {res.get('error')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+# lambda/preflight.py
+"""
+Preflight Module
+Scan-size and cost estimates for pipeline nodes, without running them.
+
+For every CTAS node the SELECT body is run through
+EXPLAIN (TYPE IO, FORMAT JSON), which lists the base tables the query
+reads and, when the tables have statistics, their estimated output size.
+Tables without statistics (most Glue tables) fall back to the size of
+their S3 location, an upper bound for CSV and for Parquet without column
+pruning. Views and external-table registrations scan nothing. Jobs that
+read whole tables outside the DAG (the profile step) are added as one
+full-table scan per table.
+
+Nodes that cannot be estimated, typically because they read a table the
+run itself creates, are listed as unknown; in SCAN_BUDGET_MODE=refuse they
+count as violations, since the budget cannot be checked without them.
+
+Costs use Athena's pricing: bytes rounded up to the MB, 10 MB minimum per
+query, Config.ATHENA_PRICE_PER_TB per TB.
+
+Usage:
+    python preflight.py                                    # estimate the whole pipeline
+    python preflight.py --step facts
+    (pipeline) lambda_handler({'step': 'all', 'preflight': True}, None)
+"""
+
+import argparse
+import json
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from aws_clients import get_client
+
+
+MB = 1024 ** 2
+TB = 1024 ** 4
+MIN_BILLED_BYTES = 10 * MB
+
+_CTAS_PATTERN = re.compile(r'^\s*CREATE\s+TABLE\s+\S+\s+WITH\s*\(', re.IGNORECASE)
+
+
+def select_body(query: str) -> Optional[str]:
+    """
+    The SELECT of a 'CREATE TABLE x WITH (...) AS <select> [WITH NO DATA]'
+    statement, or None when the statement is not a CTAS (views, external
+    tables).
+    """
+    query = re.sub(r'--[^\n]*', '', query)
+    match = _CTAS_PATTERN.search(query)
+    if not match:
+        return None
+    depth = 1
+    position = match.end()
+    while depth and position < len(query):
+        if query[position] == '(':
+            depth += 1
+        elif query[position] == ')':
+            depth -= 1
+        position += 1
+    rest = re.match(r'\s*AS\s+(.*)$', query[position:], re.IGNORECASE | re.DOTALL)
+    if not rest:
+        return None
+    return re.sub(r'\s*WITH\s+NO\s+DATA\s*$', '', rest.group(1).strip().rstrip(';').strip(), flags=re.IGNORECASE)
+
+
+def billed_bytes(scanned: float) -> int:
+    """Bytes Athena bills for a query that scans `scanned` bytes."""
+    return max(int(math.ceil(scanned / MB)) * MB, MIN_BILLED_BYTES)
+
+
+def query_cost(scanned: float) -> float:
+    return billed_bytes(scanned) / TB * Config.ATHENA_PRICE_PER_TB
+
+
+def _format_bytes(value: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if value < 1024 or unit == 'TB':
+            return f"{value:,.1f} {unit}"
+        value /= 1024
+    return f"{value:,.1f} TB"
+
+
+class ScanEstimator:
+    """EXPLAIN (TYPE IO) based scan estimates, with S3-size fallback per table."""
+
+    def __init__(self, executor, database: str):
+        self.executor = executor
+        self.database = database
+        self._location_bytes: Dict[str, Optional[int]] = {}
+
+    def table_bytes(self, schema: str, table: str) -> Optional[int]:
+        """Total size of a table's S3 location (cached), None if unknown."""
+        key = f"{schema}.{table}"
+        if key not in self._location_bytes:
+            self._location_bytes[key] = None
+            try:
+                location = get_client('glue').get_table(
+                    DatabaseName=schema, Name=table
+                )['Table']['StorageDescriptor']['Location']
+                bucket, _, prefix = location.replace('s3://', '', 1).partition('/')
+                total = 0
+                paginator = get_client('s3').get_paginator('list_objects_v2')
+                for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+                    total += sum(obj['Size'] for obj in page.get('Contents', []))
+                self._location_bytes[key] = total
+            except Exception as e:
+                print(f"WARNING: No size for {key}: {str(e)}")
+        return self._location_bytes[key]
+
+    def explain_io(self, select: str) -> Dict:
+        """Run EXPLAIN (TYPE IO, FORMAT JSON) and return the parsed plan."""
+        res = self.executor.execute_query(
+            f"EXPLAIN (TYPE IO, FORMAT JSON) {select}", self.database, label=None
+        )
+        if res['status'] != 'success':
+            raise Exception(f"EXPLAIN failed: {res.get('error')}")
+        rows = self.executor.fetch_results(res['query_id'])
+        # One VARCHAR column; the JSON document may be split across rows
+        text = ''.join(str(next(iter(row.values()))) for row in rows)
+        return json.loads(text)
+
+    def estimate_query(self, select: str) -> Tuple[float, List[Dict]]:
+        """
+        Estimated bytes scanned by a SELECT.
+
+        Returns:
+            (bytes, inputs) with one entry per base table read
+        """
+        plan = self.explain_io(select)
+        inputs = []
+        for table_info in plan.get('inputTableColumnInfos', []):
+            schema_table = table_info['table']['schemaTable']
+            schema, table = schema_table['schema'], schema_table['table']
+            size = (table_info.get('estimate') or {}).get('outputSizeInBytes')
+            source = 'stats'
+            if not isinstance(size, (int, float)) or not math.isfinite(size):
+                size = self.table_bytes(schema, table)
+                source = 's3'
+            inputs.append({'table': f"{schema}.{table}", 'bytes': size or 0, 'source': source})
+        return float(sum(entry['bytes'] for entry in inputs)), inputs
+
+    def estimate_nodes(self, nodes: List[Tuple[str, str, str]], report: Dict = None) -> Dict:
+        """
+        Estimate every node of the DAG.
+
+        Args:
+            nodes: (step, name, sql_file) in execution order
+            report: Report to add the nodes to (a new one when omitted)
+
+        Returns:
+            Report dict with per-node and total bytes and cost
+        """
+        if report is None:
+            report = {'nodes': [], 'total_bytes': 0.0, 'total_cost': 0.0, 'unknown': []}
+        for step, name, sql_file in nodes:
+            select = select_body(Config.get_sql_file(sql_file))
+            node = {'step': step, 'name': name, 'bytes': 0.0, 'cost': 0.0, 'inputs': []}
+            if select is not None:
+                try:
+                    node['bytes'], node['inputs'] = self.estimate_query(select)
+                    node['cost'] = query_cost(node['bytes'])
+                except Exception as e:
+                    # Typically a table this run creates that does not exist yet
+                    print(f"WARNING: Could not estimate {name}: {str(e)}")
+                    node['bytes'] = None
+                    report['unknown'].append(name)
+            if node['bytes']:
+                report['total_bytes'] += node['bytes']
+                report['total_cost'] += node['cost']
+            report['nodes'].append(node)
+        return report
+
+    def estimate_table_scans(self, report: Dict, step: str, tables: List[str]) -> Dict:
+        """
+        Add one full scan of each table to a report (e.g. the profile step's
+        aggregation queries), sized by the table's S3 location.
+        """
+        for table in tables:
+            size = self.table_bytes(self.database, table)
+            node = {'step': step, 'name': table, 'bytes': size, 'cost': 0.0,
+                    'inputs': [{'table': f"{self.database}.{table}", 'bytes': size or 0, 'source': 's3'}]}
+            if size is None:
+                report['unknown'].append(f"{step}/{table}")
+            elif size:
+                node['cost'] = query_cost(size)
+                report['total_bytes'] += size
+                report['total_cost'] += node['cost']
+            report['nodes'].append(node)
+        return report
+
+
+def check_budget(
+    report: Dict,
+    run_budget: int = None,
+    query_budget: int = None,
+    allow_unknown: bool = True
+) -> List[str]:
+    """
+    Budget violations in a report (empty when within budget).
+
+    With allow_unknown=False, nodes that could not be estimated are
+    violations too: the run total would otherwise count them as 0 bytes.
+    """
+    run_budget = Config.SCAN_BUDGET_RUN_BYTES if run_budget is None else run_budget
+    query_budget = Config.SCAN_BUDGET_QUERY_BYTES if query_budget is None else query_budget
+
+    violations = [
+        f"{node['name']} scans ~{_format_bytes(node['bytes'])} (query budget {_format_bytes(query_budget)})"
+        for node in report['nodes']
+        if node['bytes'] and node['bytes'] > query_budget
+    ]
+    if report['total_bytes'] > run_budget:
+        violations.append(
+            f"run scans ~{_format_bytes(report['total_bytes'])} (run budget {_format_bytes(run_budget)})"
+        )
+    if report['unknown'] and not allow_unknown:
+        violations.append(
+            f"{len(report['unknown'])} nodes could not be estimated ({', '.join(report['unknown'])}); "
+            f"build their inputs first or run with SCAN_BUDGET_MODE=warn"
+        )
+    return violations
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n{'Node':<40} {'Scan':>12} {'Cost':>10}")
+    print("-" * 64)
+    for node in report['nodes']:
+        if node['bytes'] is None:
+            scan, cost = 'unknown', '-'
+        elif node['bytes'] == 0 and not node['inputs']:
+            scan, cost = '-', '-'
+        else:
+            scan, cost = _format_bytes(node['bytes']), f"${node['cost']:.4f}"
+        print(f"{node['step'] + '/' + node['name']:<40} {scan:>12} {cost:>10}")
+    print("-" * 64)
+    print(f"{'TOTAL':<40} {_format_bytes(report['total_bytes']):>12} {'$' + format(report['total_cost'], '.4f'):>10}")
+    if report['unknown']:
+        print(f"WARNING: {len(report['unknown'])} nodes could not be estimated: {', '.join(report['unknown'])}")
+
+
+def main():
+    from etl_pipeline import ClaimsETLPipeline
+
+    parser = argparse.ArgumentParser(description="Estimate pipeline scan size and cost")
+    parser.add_argument('--step', default='all')
+    args = parser.parse_args()
+
+    report = ClaimsETLPipeline().preflight(args.step)
+    if report['violations']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
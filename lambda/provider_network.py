@@ -0,0 +1,344 @@
+# lambda/provider_network.py
+"""
+Provider Network Module
+Provider-physician-patient graph features for fraud-ring analysis.
+
+Streams fact_claims_etl in record batches into deduplicated integer edge
+lists (provider-physician and provider-patient), builds CSR adjacency and
+computes per provider:
+
+- connected component over provider-physician edges (providers linked by
+  shared attending/operating/other physicians) and its size; physicians
+  seen at more than max_hub_degree providers are left out of the graph
+- physician/patient degree and how many of them are shared with other providers
+- number of distinct other providers reached through shared physicians/patients
+
+Memory is bounded by the number of distinct edges, not claims. Output is
+one row per provider in provider_network_etl.
+
+Usage:
+    python provider_network.py                                 # read/write warehouse S3
+    python provider_network.py --claims ./extract/fact_claims --out ./out/provider_network/
+    python provider_network.py --graph-out ./out/graph.npz     # also keep the CSR arrays
+"""
+
+import argparse
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config import Config
+from group_stats import block_pairs, unique_sorted
+from parquet_io import open_dataset, table_uri, write_table
+
+
+PHYSICIAN_COLUMNS = ['attending_physician_id', 'operating_physician_id', 'other_physician_id']
+
+DEFAULT_BATCH_SIZE = 500_000
+
+# Pending edges are deduplicated together once they exceed this many keys
+DEFAULT_FLUSH_EDGES = 5_000_000
+
+# Physicians/patients linked to more providers than this are left out of the
+# provider-provider counts (their pairs grow quadratically) and, for
+# physicians, out of the component graph (one busy physician would otherwise
+# merge most providers into a single "ring"); they still count as shared.
+DEFAULT_MAX_HUB_DEGREE = 200
+
+OUTPUT_SCHEMA = pa.schema([
+    ('provider_sk', pa.int64()),
+    ('component_id', pa.int64()),
+    ('component_providers', pa.int32()),
+    ('component_physicians', pa.int32()),
+    ('n_physicians', pa.int32()),
+    ('shared_physicians', pa.int32()),
+    ('providers_via_physicians', pa.int32()),
+    ('n_patients', pa.int32()),
+    ('shared_patients', pa.int32()),
+    ('providers_via_patients', pa.int32()),
+    ('is_ring_member', pa.bool_()),
+])
+
+
+class IdIndex:
+    """Grows a string -> dense integer ID mapping batch by batch (vectorized)."""
+
+    def __init__(self):
+        self.values = pa.array([], pa.string())
+
+    def encode(self, column) -> np.ndarray:
+        """IDs for a string column; -1 for null, '' and 'NA'."""
+        column = pc.if_else(pc.is_in(column, value_set=pa.array(['', 'NA'])), None, column)
+        uniques = pc.drop_null(pc.unique(column))
+        known = pc.is_in(uniques, value_set=self.values)
+        new_values = pc.filter(uniques, pc.invert(known))
+        if len(new_values):
+            self.values = pa.concat_arrays([self.values, new_values.cast(pa.string())])
+        return pc.index_in(column, value_set=self.values).fill_null(-1).to_numpy(zero_copy_only=False)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class EdgeSet:
+    """Deduplicated (left, right) integer pairs accumulated in chunks."""
+
+    def __init__(self, flush_edges: int = DEFAULT_FLUSH_EDGES):
+        self.flush_edges = flush_edges
+        self._chunks: List[np.ndarray] = []
+        self._pending = 0
+
+    def add(self, left: np.ndarray, right: np.ndarray) -> None:
+        valid = (left >= 0) & (right >= 0)
+        keys = unique_sorted((left[valid].astype(np.int64) << 32) | right[valid].astype(np.int64))
+        self._chunks.append(keys)
+        self._pending += len(keys)
+        if self._pending > self.flush_edges:
+            self._compact()
+
+    def _compact(self) -> None:
+        merged = unique_sorted(np.concatenate(self._chunks)) if self._chunks else np.array([], np.int64)
+        self._chunks = [merged]
+        self._pending = len(merged)
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        self._compact()
+        keys = self._chunks[0]
+        return keys >> 32, keys & 0xFFFFFFFF
+
+
+def build_csr(rows: np.ndarray, cols: np.ndarray, n_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric CSR adjacency (indptr, indices) for an undirected edge list.
+    """
+    src = np.concatenate([rows, cols])
+    dst = np.concatenate([cols, rows])
+    order = np.argsort(src, kind='stable')
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_nodes), out=indptr[1:])
+    return indptr, dst[order].astype(np.int64)
+
+
+def connected_components(indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """
+    Component label (smallest node ID in the component) for every node.
+
+    Vectorized hook-and-compress: each round takes the minimum label over
+    every node's CSR neighbours, then jumps labels to their own labels
+    until they stop changing.
+    """
+    n_nodes = len(indptr) - 1
+    labels = np.arange(n_nodes, dtype=np.int64)
+    has_edges = np.diff(indptr) > 0
+    starts = indptr[:-1][has_edges]
+    if len(starts) == 0:
+        return labels
+
+    rounds = 0
+    while True:
+        rounds += 1
+        neighbour_min = np.minimum.reduceat(labels[indices], starts)
+        updated = labels.copy()
+        updated[has_edges] = np.minimum(labels[has_edges], neighbour_min)
+        # Hook each old root under the smallest label it now sees
+        np.minimum.at(updated, labels, updated)
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    if Config.VERBOSE:
+        print(f"  components converged in {rounds} rounds")
+    return labels
+
+
+def distinct_pairs_via(
+    hub: np.ndarray,
+    provider: np.ndarray,
+    n_providers: int,
+    max_hub_degree: int
+) -> np.ndarray:
+    """
+    For each provider, the number of distinct other providers that share at
+    least one hub (physician or patient) with it.
+
+    Args:
+        hub, provider: Deduplicated (hub, provider) edges
+        n_providers: Size of the provider ID space
+        max_hub_degree: Hubs with more providers than this are skipped
+    """
+    order = np.argsort(hub, kind='stable')
+    hub, provider = hub[order], provider[order]
+    _, starts, degree = np.unique(hub, return_index=True, return_counts=True)
+
+    keep = (degree > 1) & (degree <= max_hub_degree)
+    starts, degree = starts[keep], degree[keep]
+    if len(starts) == 0:
+        return np.zeros(n_providers, dtype=np.int64)
+
+    left, right = block_pairs(starts, degree)
+    a, b = provider[left], provider[right]
+    distinct = unique_sorted(np.concatenate([(a << 32) | b, (b << 32) | a]))
+    return np.bincount(distinct >> 32, minlength=n_providers)
+
+
+def stream_edges(
+    claims_path: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    flush_edges: int = DEFAULT_FLUSH_EDGES
+):
+    """
+    Read the claims batch by batch into deduplicated edge sets.
+
+    Returns:
+        (physician_edges, patient_edges, physician_index, claims_read)
+    """
+    dataset = open_dataset(claims_path)
+
+    physicians = IdIndex()
+    physician_edges = EdgeSet(flush_edges)
+    patient_edges = EdgeSet(flush_edges)
+    claims_read = 0
+
+    for batch in dataset.to_batches(columns=['provider_sk', 'patient_sk'] + PHYSICIAN_COLUMNS,
+                                    batch_size=batch_size):
+        provider = batch.column('provider_sk').fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+        patient = batch.column('patient_sk').fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int64)
+        for column in PHYSICIAN_COLUMNS:
+            physician_edges.add(provider, physicians.encode(batch.column(column)))
+        patient_edges.add(provider, patient)
+        claims_read += batch.num_rows
+        if Config.VERBOSE:
+            print(f"  streamed {claims_read:,} claims, {len(physicians):,} physicians")
+
+    return physician_edges, patient_edges, physicians, claims_read
+
+
+def provider_features(
+    physician_edges: EdgeSet,
+    patient_edges: EdgeSet,
+    n_physicians: int,
+    max_hub_degree: int = DEFAULT_MAX_HUB_DEGREE,
+    graph_out: Optional[str] = None
+) -> pa.Table:
+    """Build the CSR graph, run components and assemble per-provider features."""
+    prov_ph, phys = physician_edges.pairs()
+    prov_pt, patient = patient_edges.pairs()
+    n_providers = int(max(prov_ph.max(initial=0), prov_pt.max(initial=0))) + 1
+
+    # Edges are deduplicated, so a physician's degree is its number of providers
+    phys_degree = np.bincount(phys, minlength=n_physicians)
+    in_graph = phys_degree[phys] <= max_hub_degree
+    if Config.VERBOSE:
+        print(f"  {int((phys_degree > max_hub_degree).sum()):,} hub physicians left out of the components")
+
+    # Node IDs: providers [0, n_providers), physicians after them
+    n_nodes = n_providers + n_physicians
+    indptr, indices = build_csr(prov_ph[in_graph], phys[in_graph] + n_providers, n_nodes)
+    labels = connected_components(indptr, indices)
+    if graph_out:
+        np.savez_compressed(graph_out, indptr=indptr, indices=indices, labels=labels,
+                            n_providers=n_providers)
+        print(f"✓ Saved CSR graph ({n_nodes:,} nodes, {len(indices) // 2:,} edges) -> {graph_out}")
+
+    is_provider = np.arange(n_nodes) < n_providers
+    component_providers = np.bincount(labels[is_provider], minlength=n_nodes)
+    component_physicians = np.bincount(labels[~is_provider], minlength=n_nodes)
+
+    patient_degree = np.bincount(patient, minlength=int(patient.max(initial=0)) + 1)
+
+    provider_sk = np.unique(np.concatenate([prov_ph, prov_pt]))
+    provider_label = labels[provider_sk]
+
+    def per_provider(provider, mask=None):
+        weights = None if mask is None else mask.astype(np.float64)
+        return np.bincount(provider, weights=weights, minlength=n_providers)[provider_sk].astype(np.int32)
+
+    return pa.table({
+        'provider_sk': provider_sk.astype(np.int64),
+        'component_id': provider_label.astype(np.int64),
+        'component_providers': component_providers[provider_label].astype(np.int32),
+        'component_physicians': component_physicians[provider_label].astype(np.int32),
+        'n_physicians': per_provider(prov_ph),
+        'shared_physicians': per_provider(prov_ph, phys_degree[phys] > 1),
+        'providers_via_physicians': distinct_pairs_via(
+            phys, prov_ph, n_providers, max_hub_degree)[provider_sk].astype(np.int32),
+        'n_patients': per_provider(prov_pt),
+        'shared_patients': per_provider(prov_pt, patient_degree[patient] > 1),
+        'providers_via_patients': distinct_pairs_via(
+            patient, prov_pt, n_providers, max_hub_degree)[provider_sk].astype(np.int32),
+        'is_ring_member': component_providers[provider_label] > 1,
+    }, schema=OUTPUT_SCHEMA)
+
+
+def run(
+    claims_path: str,
+    out_path: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_hub_degree: int = DEFAULT_MAX_HUB_DEGREE,
+    graph_out: Optional[str] = None
+) -> Dict:
+    """Stream the claims, build the graph and write the provider features."""
+    print("=" * 80)
+    print("PROVIDER NETWORK")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    physician_edges, patient_edges, physicians, claims_read = stream_edges(claims_path, batch_size)
+    streamed = time.perf_counter()
+    print(f"✓ Streamed {claims_read:,} claims ({len(physicians):,} physicians) in {streamed - start:.1f}s")
+
+    table = provider_features(physician_edges, patient_edges, len(physicians), max_hub_degree, graph_out)
+    ring_members = int(pc.sum(table.column('is_ring_member')).as_py() or 0)
+    components = len(pc.unique(pc.filter(table.column('component_id'), table.column('is_ring_member'))))
+    print(f"✓ {ring_members:,} of {table.num_rows:,} providers in {components:,} multi-provider components "
+          f"({time.perf_counter() - streamed:.1f}s)")
+
+    write_table(table, out_path)
+    return {
+        'status': 'success',
+        'claims': claims_read,
+        'providers': table.num_rows,
+        'ring_members': ring_members,
+        'output': out_path,
+    }
+
+
+def register_table() -> Dict:
+    """Create the Athena table over the written features."""
+    from athena_executor import AthenaExecutor
+
+    executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+    return executor.execute_query(
+        Config.get_sql_file('sql/05-scoring/provider_network_etl.sql'),
+        Config.DATABASE,
+        label='Register provider_network_etl'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provider-physician-patient network features")
+    parser.add_argument('--claims', default=table_uri('fact_claims_etl'))
+    parser.add_argument('--out', default=table_uri('provider_network_etl'))
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--max-hub-degree', type=int, default=DEFAULT_MAX_HUB_DEGREE)
+    parser.add_argument('--graph-out', default=None, help="Also save CSR arrays to this .npz")
+    parser.add_argument('--register', action='store_true', help="Create the Athena table")
+    args = parser.parse_args()
+
+    run(args.claims, args.out, args.batch_size, args.max_hub_degree, args.graph_out)
+
+    if args.register:
+        res = register_table()
+        if res['status'] != 'success':
+            raise Exception(f"Failed: provider_network_etl - {res.get('error')}")
+
+
+if __name__ == '__main__':
+    main()
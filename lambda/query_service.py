@@ -0,0 +1,316 @@
+# lambda/query_service.py
+"""
+Query Serving Module
+Cached, parameterized lookups over dim_provider_etl and
+fact_provider_summary_etl for analysts and the case-management tool.
+
+- LRU + TTL result cache
+- Identical in-flight queries are coalesced into one Athena execution
+- Cache entries are keyed by the pipeline run ID, so a new build
+  (see etl_pipeline.publish_run_marker) invalidates everything
+
+Runs as a Lambda behind API Gateway (lambda_handler) or as a local
+HTTP server:
+    python query_service.py --port 8080
+    curl localhost:8080/providers/PRV51003/monthly
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from config import Config
+from athena_executor import AthenaExecutor
+from aws_clients import get_client
+
+
+# Endpoint name -> parameterized query ('?' placeholders, in 'params' order)
+ENDPOINTS = {
+    'provider': {
+        'params': ['provider_id'],
+        'sql': """
+            SELECT *
+            FROM dim_provider_etl
+            WHERE provider_id = ?
+        """,
+    },
+    'provider_monthly': {
+        'params': ['provider_id'],
+        'sql': """
+            SELECT
+                s.month_key,
+                s.total_claims,
+                s.inpatient_claims,
+                s.outpatient_claims,
+                s.unique_patients,
+                s.total_claimed,
+                s.avg_claim_amount,
+                s.provider_is_fraudulent,
+                s.fraud_exposure_amount
+            FROM fact_provider_summary_etl s
+            JOIN dim_provider_etl p ON s.provider_sk = p.provider_sk
+            WHERE p.provider_id = ?
+            ORDER BY s.month_key
+        """,
+    },
+}
+
+# URL path -> endpoint name
+ROUTES = [
+    (re.compile(r'^/providers/(?P<provider_id>[^/]+)/?$'), 'provider'),
+    (re.compile(r'^/providers/(?P<provider_id>[^/]+)/monthly/?$'), 'provider_monthly'),
+]
+
+PROVIDER_ID_PATTERN = re.compile(r'^PRV\d+$')
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 900):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        """Return the cached value, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value) -> None:
+        """Insert a value, evicting the least recently used entry if full."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class _InFlight:
+    """Result slot shared by callers waiting on the same query."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """Run identical concurrent requests once and share the result."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _InFlight] = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: Hashable, fn: Callable):
+        with self._lock:
+            slot = self._inflight.get(key)
+            leader = slot is None
+            if leader:
+                slot = _InFlight()
+                self._inflight[key] = slot
+
+        if not leader:
+            slot.done.wait()
+            if slot.error is not None:
+                raise slot.error
+            return slot.value
+
+        try:
+            slot.value = fn()
+            return slot.value
+        except Exception as e:
+            slot.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            slot.done.set()
+
+
+class RunIdWatcher:
+    """Reads the pipeline's run marker from S3, at most once per interval."""
+
+    def __init__(self, bucket: str, key: str, check_interval: float = 60):
+        self.bucket = bucket
+        self.key = key
+        self.check_interval = check_interval
+        self.s3_client = get_client('s3')
+        self._run_id = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[str]:
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return self._run_id
+            try:
+                obj = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
+                self._run_id = json.loads(obj['Body'].read())['run_id']
+            except Exception as e:
+                print(f"WARNING: Could not read run marker: {str(e)}")
+            self._checked_at = time.monotonic()
+            return self._run_id
+
+
+class ProviderQueryService:
+    """Cached, coalesced access to the provider serving queries."""
+
+    def __init__(
+        self,
+        executor: Optional[AthenaExecutor] = None,
+        run_watcher: Optional[RunIdWatcher] = None,
+        cache: Optional[TTLCache] = None
+    ):
+        self.executor = executor or AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+        self.run_watcher = run_watcher or RunIdWatcher(
+            Config.BUCKET, Config.RUN_MARKER_KEY, Config.SERVING_RUN_CHECK_INTERVAL
+        )
+        self.cache = cache or TTLCache(Config.SERVING_CACHE_SIZE, Config.SERVING_CACHE_TTL)
+        self.coalescer = RequestCoalescer()
+        self.database = Config.DATABASE
+        self._last_run_id = None
+
+    def query(self, endpoint: str, params: Dict[str, str]) -> Dict:
+        """
+        Answer an endpoint request from cache or Athena.
+
+        Returns:
+            Dict with rows, run_id and whether it was served from cache
+        """
+        spec = ENDPOINTS[endpoint]
+        values = tuple(params[name] for name in spec['params'])
+
+        run_id = self.run_watcher.current()
+        if run_id != self._last_run_id:
+            # New build: drop everything cached from the previous one
+            self.cache.clear()
+            self._last_run_id = run_id
+
+        key = (run_id, endpoint, values)
+        rows = self.cache.get(key)
+        if rows is not None:
+            return {'rows': rows, 'run_id': run_id, 'cached': True}
+
+        rows = self.coalescer.run(key, lambda: self._fetch(key, spec['sql'], values))
+        return {'rows': rows, 'run_id': run_id, 'cached': False}
+
+    def _fetch(self, key: Tuple, sql: str, values: Tuple[str, ...]) -> List[Dict]:
+        literals = ["'" + v.replace("'", "''") + "'" for v in values]
+        res = self.executor.execute_query(
+            sql, self.database, label=f"Serve {key[1]}", parameters=literals
+        )
+        if res['status'] != 'success':
+            raise Exception(f"Query failed: {res.get('error')}")
+        rows = self.executor.fetch_results(res['query_id'])
+        self.cache.put(key, rows)
+        return rows
+
+
+def resolve(path: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Map a URL path to (endpoint, params).
+
+    Raises:
+        LookupError: Unknown path
+        ValueError: Malformed parameter
+    """
+    for pattern, endpoint in ROUTES:
+        match = pattern.match(path)
+        if match:
+            params = match.groupdict()
+            if not PROVIDER_ID_PATTERN.match(params['provider_id']):
+                raise ValueError(f"Invalid provider_id: {params['provider_id']}")
+            return endpoint, params
+    raise LookupError(f"No endpoint for {path}")
+
+
+def handle(service: ProviderQueryService, path: str) -> Tuple[int, Dict]:
+    """Shared request handling for Lambda and the local server."""
+    try:
+        endpoint, params = resolve(path)
+        return 200, service.query(endpoint, params)
+    except LookupError as e:
+        return 404, {'error': str(e)}
+    except ValueError as e:
+        return 400, {'error': str(e)}
+    except Exception as e:
+        print(f"ERROR: {str(e)}")
+        return 502, {'error': str(e)}
+
+
+_service = None
+
+
+def _get_service() -> ProviderQueryService:
+    """One service (and cache) per Lambda container."""
+    global _service
+    if _service is None:
+        _service = ProviderQueryService()
+    return _service
+
+
+def lambda_handler(event, context):
+    """
+    API Gateway (REST or HTTP API) proxy handler.
+
+    GET /providers/{provider_id}
+    GET /providers/{provider_id}/monthly
+    """
+    event = event or {}
+    path = event.get('rawPath') or event.get('path') or ''
+    status, body = handle(_get_service(), path)
+    return {
+        'statusCode': status,
+        'headers': {'Content-Type': 'application/json'},
+        'body': json.dumps(body, default=str),
+    }
+
+
+class _LocalHandler(BaseHTTPRequestHandler):
+    service: ProviderQueryService = None
+
+    def do_GET(self):
+        status, body = handle(self.service, self.path.split('?')[0])
+        payload = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(port: int = 8080) -> None:
+    """Run the service as a local threaded HTTP server."""
+    _LocalHandler.service = ProviderQueryService()
+    server = ThreadingHTTPServer(('0.0.0.0', port), _LocalHandler)
+    print(f"Serving on http://localhost:{port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Provider query serving layer")
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+    serve(args.port)
@@ -0,0 +1,408 @@
+# lambda/query_slots.py
+"""
+Query Slots Module
+Shared limit on concurrent Athena queries across Lambda invocations,
+scheduled runs and local jobs.
+
+The pool is Config.QUERY_SLOTS_LIMIT numbered slots. An executor takes a
+slot before StartQueryExecution and gives it back when the query finishes.
+A slot is a lease: it carries an owner and an expiry, the executor renews
+it while polling, and a slot whose lease has expired is free again. A
+Lambda that times out or crashes therefore loses its slots after
+Config.QUERY_SLOTS_TTL seconds without anyone cleaning up.
+
+Priorities reserve the top of the pool:
+
+    high    all slots                (nightly pipeline)
+    normal  all but 20% of slots     (default)
+    low     all but 40% of slots     (ad hoc validation, analysts)
+
+and every acquirer takes the highest free slot it may use, so reserved
+slots are used by higher priorities first and lower priorities are never
+blocked while their own slots are free.
+
+Backends:
+    dynamodb  one item per slot (pool, slot) in Config.QUERY_SLOTS_TABLE,
+              taken with conditional writes
+    sqlite    a database file (Config.QUERY_SLOTS_PATH), for local runs and
+              several processes on one machine
+
+Usage:
+    QUERY_SLOTS_BACKEND=dynamodb QUERY_SLOTS_LIMIT=20 ...   # executors pick it up
+
+    slots = get_slots()
+    with slots.slot('low'):
+        ...
+
+    python query_slots.py status
+    python query_slots.py create-table        # DynamoDB table for the pool
+"""
+
+import argparse
+import math
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from config import Config
+
+
+# Fraction of the pool each priority leaves free for higher ones
+PRIORITIES = {'high': 0.0, 'normal': 0.2, 'low': 0.4}
+
+# Identifies the holder in status output: Lambda log stream, else host and pid
+_OWNER = os.getenv('AWS_LAMBDA_LOG_STREAM_NAME') or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Lease:
+    """A held slot."""
+
+    def __init__(self, slot: int, owner: str, priority: str, expires_at: float):
+        self.slot = slot
+        self.owner = owner
+        self.priority = priority
+        self.expires_at = expires_at
+
+    def __repr__(self):
+        return f"Lease(slot={self.slot}, owner={self.owner!r}, priority={self.priority!r})"
+
+
+class QuerySlots:
+    """Lease-based counting semaphore; backends implement _holders, _take, _renew, _release."""
+
+    def __init__(self, limit: int = Config.QUERY_SLOTS_LIMIT, ttl: int = Config.QUERY_SLOTS_TTL):
+        """
+        Args:
+            limit: Slots in the pool
+            ttl: Lease length in seconds; leases are renewed at half of it
+        """
+        self.limit = limit
+        self.ttl = ttl
+
+    # -- backend --------------------------------------------------------
+
+    def _holders(self) -> Dict[int, Dict]:
+        """Current slot records {slot: {'owner', 'priority', 'expires_at'}}, expired ones included."""
+        raise NotImplementedError
+
+    def _take(self, slot: int, lease: Lease, now: float) -> bool:
+        """Take a slot if it is empty or expired at now."""
+        raise NotImplementedError
+
+    def _renew(self, lease: Lease, expires_at: float) -> bool:
+        """Push a held lease's expiry to expires_at; False if it was lost."""
+        raise NotImplementedError
+
+    def _release(self, lease: Lease) -> None:
+        """Free a slot if lease still holds it."""
+        raise NotImplementedError
+
+    # -- API ------------------------------------------------------------
+
+    def allowed(self, priority: str) -> int:
+        """Slots a priority may use (at least one)."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {sorted(PRIORITIES)}")
+        return max(1, math.ceil(self.limit * (1 - PRIORITIES[priority])))
+
+    def try_acquire(self, priority: str = Config.QUERY_SLOTS_PRIORITY) -> Optional[Lease]:
+        """Take the highest free slot the priority may use, or None when all are held."""
+        now = time.time()
+        holders = self._holders()
+        owner = f"{_OWNER}:{uuid.uuid4().hex[:12]}"
+        for slot in reversed(range(self.allowed(priority))):
+            held = holders.get(slot)
+            if held is not None and held['expires_at'] > now:
+                continue
+            lease = Lease(slot, owner, priority, now + self.ttl)
+            if self._take(slot, lease, now):
+                return lease
+        return None
+
+    def acquire(self, priority: str = Config.QUERY_SLOTS_PRIORITY, timeout: float = Config.QUERY_SLOTS_WAIT) -> Lease:
+        """
+        Wait for a slot.
+
+        Args:
+            priority: 'high', 'normal' or 'low'
+            timeout: Seconds to wait before giving up
+
+        Returns:
+            Lease to pass to renew() and release()
+        """
+        deadline = time.monotonic() + timeout
+        delay = Config.POLL_INITIAL_INTERVAL
+        waited = False
+        while True:
+            lease = self.try_acquire(priority)
+            if lease is not None:
+                return lease
+            if time.monotonic() >= deadline:
+                raise Exception(f"Failed: no Athena query slot free after {timeout:.0f}s "
+                                f"({priority} priority, pool of {self.limit})")
+            if not waited:
+                print(f"Waiting for an Athena query slot ({priority} priority)...")
+                waited = True
+            # Jitter so waiters released by the same finish don't all retry at once
+            time.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 1.5, Config.POLL_MAX_INTERVAL)
+
+    def renew(self, lease: Lease) -> None:
+        """Extend a lease once half of it has run out (cheap to call on every poll)."""
+        now = time.time()
+        if lease.expires_at - now > self.ttl / 2:
+            return
+        expires_at = now + self.ttl
+        try:
+            if not self._renew(lease, expires_at):
+                print(f"WARNING: Lost Athena query slot {lease.slot} (lease expired and was taken)")
+        except Exception as e:
+            # expires_at is left alone so the next poll retries; the query itself is unaffected
+            print(f"WARNING: Could not renew Athena query slot {lease.slot}: {e}")
+            return
+        lease.expires_at = expires_at
+
+    def release(self, lease: Lease) -> None:
+        try:
+            self._release(lease)
+        except Exception as e:
+            # The lease expires on its own; a failed release only delays that slot
+            print(f"WARNING: Could not release Athena query slot {lease.slot}: {e}")
+
+    @contextmanager
+    def slot(self, priority: str = Config.QUERY_SLOTS_PRIORITY, timeout: float = Config.QUERY_SLOTS_WAIT):
+        lease = self.acquire(priority, timeout)
+        try:
+            yield lease
+        finally:
+            self.release(lease)
+
+    def status(self) -> List[Dict]:
+        """Live leases, by slot."""
+        now = time.time()
+        return [
+            {'slot': slot, **held, 'expires_in': round(held['expires_at'] - now, 1)}
+            for slot, held in sorted(self._holders().items())
+            if held['expires_at'] > now
+        ]
+
+
+class DynamoDBSlots(QuerySlots):
+    """Slots as items (pool, slot) in a DynamoDB table; absent item = free slot."""
+
+    def __init__(
+        self,
+        table: str = Config.QUERY_SLOTS_TABLE,
+        pool: str = Config.QUERY_SLOTS_POOL,
+        client=None,
+        **kwargs
+    ):
+        """
+        Args:
+            table: DynamoDB table with partition key 'pool' (S) and sort key 'slot' (N)
+            pool: Pool name, so several limits can share one table
+            client: DynamoDB client (defaults to the shared one)
+        """
+        super().__init__(**kwargs)
+        from aws_clients import get_client
+
+        self.table = table
+        self.pool = pool
+        self.client = client or get_client('dynamodb')
+
+    def _key(self, slot: int) -> Dict:
+        return {'pool': {'S': self.pool}, 'slot': {'N': str(slot)}}
+
+    def _conditional(self, call, **kwargs) -> bool:
+        try:
+            call(**kwargs)
+            return True
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def _holders(self) -> Dict[int, Dict]:
+        holders = {}
+        paginator = self.client.get_paginator('query')
+        pages = paginator.paginate(
+            TableName=self.table,
+            KeyConditionExpression='#pool = :pool',
+            ExpressionAttributeNames={'#pool': 'pool'},
+            ExpressionAttributeValues={':pool': {'S': self.pool}},
+            ConsistentRead=True,
+        )
+        for page in pages:
+            for item in page['Items']:
+                holders[int(item['slot']['N'])] = {
+                    'owner': item['owner']['S'],
+                    'priority': item['priority']['S'],
+                    'expires_at': float(item['expires_at']['N']),
+                }
+        return holders
+
+    def _take(self, slot: int, lease: Lease, now: float) -> bool:
+        return self._conditional(
+            self.client.put_item,
+            TableName=self.table,
+            Item={
+                **self._key(slot),
+                'owner': {'S': lease.owner},
+                'priority': {'S': lease.priority},
+                'expires_at': {'N': repr(lease.expires_at)},
+            },
+            ConditionExpression='attribute_not_exists(#owner) OR expires_at < :now',
+            ExpressionAttributeNames={'#owner': 'owner'},
+            ExpressionAttributeValues={':now': {'N': repr(now)}},
+        )
+
+    def _renew(self, lease: Lease, expires_at: float) -> bool:
+        return self._conditional(
+            self.client.update_item,
+            TableName=self.table,
+            Key=self._key(lease.slot),
+            UpdateExpression='SET expires_at = :expires',
+            ConditionExpression='#owner = :owner',
+            ExpressionAttributeNames={'#owner': 'owner'},
+            ExpressionAttributeValues={':expires': {'N': repr(expires_at)}, ':owner': {'S': lease.owner}},
+        )
+
+    def _release(self, lease: Lease) -> None:
+        self._conditional(
+            self.client.delete_item,
+            TableName=self.table,
+            Key=self._key(lease.slot),
+            ConditionExpression='#owner = :owner',
+            ExpressionAttributeNames={'#owner': 'owner'},
+            ExpressionAttributeValues={':owner': {'S': lease.owner}},
+        )
+
+    def create_table(self) -> None:
+        """Create the slots table (on-demand billing) and wait until it exists."""
+        self.client.create_table(
+            TableName=self.table,
+            AttributeDefinitions=[
+                {'AttributeName': 'pool', 'AttributeType': 'S'},
+                {'AttributeName': 'slot', 'AttributeType': 'N'},
+            ],
+            KeySchema=[
+                {'AttributeName': 'pool', 'KeyType': 'HASH'},
+                {'AttributeName': 'slot', 'KeyType': 'RANGE'},
+            ],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        self.client.get_waiter('table_exists').wait(TableName=self.table)
+
+
+class SQLiteSlots(QuerySlots):
+    """Slots as rows in a SQLite file; IMMEDIATE transactions serialize takers across processes."""
+
+    def __init__(self, path: str = Config.QUERY_SLOTS_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS slots "
+                "(slot INTEGER PRIMARY KEY, owner TEXT NOT NULL, priority TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections can't be shared across threads)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _holders(self) -> Dict[int, Dict]:
+        rows = self._connect().execute("SELECT slot, owner, priority, expires_at FROM slots").fetchall()
+        return {slot: {'owner': owner, 'priority': priority, 'expires_at': expires_at}
+                for slot, owner, priority, expires_at in rows}
+
+    def _take(self, slot: int, lease: Lease, now: float) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT expires_at FROM slots WHERE slot = ?", (slot,)).fetchone()
+            if row is not None and row[0] >= now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO slots (slot, owner, priority, expires_at) VALUES (?, ?, ?, ?)",
+                (slot, lease.owner, lease.priority, lease.expires_at)
+            )
+            return True
+
+    def _renew(self, lease: Lease, expires_at: float) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE slots SET expires_at = ? WHERE slot = ? AND owner = ?",
+                (expires_at, lease.slot, lease.owner)
+            )
+            return cursor.rowcount == 1
+
+    def _release(self, lease: Lease) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM slots WHERE slot = ? AND owner = ?", (lease.slot, lease.owner))
+
+
+BACKENDS = {'dynamodb': DynamoDBSlots, 'sqlite': SQLiteSlots}
+
+_slots: Optional[QuerySlots] = None
+_slots_lock = threading.Lock()
+
+
+def get_slots() -> Optional[QuerySlots]:
+    """The configured pool, shared by all executors in the process; None when QUERY_SLOTS_BACKEND is 'off'."""
+    global _slots
+    if Config.QUERY_SLOTS_BACKEND == 'off':
+        return None
+    with _slots_lock:
+        if _slots is None:
+            if Config.QUERY_SLOTS_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown QUERY_SLOTS_BACKEND {Config.QUERY_SLOTS_BACKEND!r}, "
+                                 f"expected 'off' or one of {sorted(BACKENDS)}")
+            _slots = BACKENDS[Config.QUERY_SLOTS_BACKEND]()
+    return _slots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or set up the shared Athena query slots")
+    parser.add_argument('command', choices=['status', 'create-table'])
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=None,
+                        help="Defaults to QUERY_SLOTS_BACKEND")
+    args = parser.parse_args()
+
+    backend = args.backend or Config.QUERY_SLOTS_BACKEND
+    if backend not in BACKENDS:
+        parser.error("set QUERY_SLOTS_BACKEND or pass --backend")
+    slots = BACKENDS[backend]()
+
+    if args.command == 'create-table':
+        if not isinstance(slots, DynamoDBSlots):
+            parser.error("create-table is for the dynamodb backend")
+        slots.create_table()
+        print(f"✓ Created {slots.table}")
+        return
+
+    leases = slots.status()
+    print(f"{len(leases)}/{slots.limit} slots held ({backend})")
+    for lease in leases:
+        print(f"  slot {lease['slot']:>3}  {lease['priority']:<7} {lease['owner']}  expires in {lease['expires_in']}s")
+
+
+if __name__ == '__main__':
+    main()
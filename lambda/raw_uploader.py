@@ -0,0 +1,327 @@
+# lambda/raw_uploader.py
+"""
+Raw Uploader Module
+Uploads the raw Kaggle CSVs (provider, beneficiary, inpatient, outpatient)
+to s3://<bucket>/<RAW_PREFIX>/<table>/, one folder per raw table.
+
+- Files upload in parallel, each as a multipart upload (boto3 TransferConfig)
+- The sha256 of the local file is stored as object metadata; a file whose
+  checksum and encoding match the stored object is skipped
+- --encoding gzip compresses on the fly (Athena reads .csv.gz transparently);
+  --encoding parquet converts to Parquet with every column kept as string,
+  which needs Parquet table DDL for the raw tables
+- Other objects in a table's folder are removed after its upload, so a
+  table never reads the same rows twice in two encodings
+- <RAW_PREFIX>/_manifest.json records checksum, size and the time each
+  table last changed (UTC ISO 8601); changed_tables() compares it with the
+  build marker of the last pipeline run that rebuilt from raw ('all',
+  'dims', 'facts'), and the pipeline's if_changed option skips a build
+  when nothing changed
+
+Works against any S3 API: set S3_ENDPOINT_URL (or --endpoint-url) to a
+MinIO or moto server for local testing.
+
+Usage:
+    python raw_uploader.py data/sample-data
+    python raw_uploader.py data/sample-data --encoding gzip --workers 4
+    python raw_uploader.py data/sample-data --endpoint-url http://localhost:9000 --bucket test
+"""
+
+import argparse
+import fnmatch
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from config import Config
+from aws_clients import get_client
+
+
+# Raw table -> file name pattern of the Kaggle export
+RAW_FILES = {
+    'provider': 'Train_Provider*.csv',
+    'beneficiary': 'Train_Beneficiary*.csv',
+    'inpatient': 'Train_Inpatient*.csv',
+    'outpatient': 'Train_Outpatient*.csv',
+}
+
+ENCODINGS = {'csv': '', 'gzip': '.gz', 'parquet': '.parquet'}
+
+MANIFEST_NAME = '_manifest.json'
+
+DEFAULT_WORKERS = 4
+DEFAULT_PART_BYTES = 16 * 1024 ** 2
+HASH_BLOCK_BYTES = 8 * 1024 ** 2
+
+
+def utc_now() -> str:
+    """Timezone-aware UTC ISO timestamp, comparable across machines and the Lambda."""
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _as_utc(timestamp: str) -> datetime:
+    """Parse a stored timestamp; naive ones (older manifests, markers) are local time."""
+    parsed = datetime.fromisoformat(timestamp)
+    return parsed.astimezone(timezone.utc)
+
+
+def find_raw_files(source_dir: str) -> Dict[str, str]:
+    """Raw table -> local path of its CSV in source_dir (missing tables are left out)."""
+    names = sorted(os.listdir(source_dir))
+    found = {}
+    for table, pattern in RAW_FILES.items():
+        matches = [name for name in names if fnmatch.fnmatch(name.lower(), pattern.lower())]
+        if len(matches) > 1:
+            raise ValueError(f"Several files for {table}: {matches}")
+        if matches:
+            found[table] = os.path.join(source_dir, matches[0])
+    return found
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def raw_key(table: str, path: str, encoding: str) -> str:
+    name = os.path.basename(path)
+    if encoding == 'parquet':
+        name = os.path.splitext(name)[0]
+    return f"{Config.RAW_PREFIX}/{table}/{name}{ENCODINGS[encoding]}"
+
+
+def stored_checksum(bucket: str, key: str) -> Optional[Dict[str, str]]:
+    """Metadata of an existing object, None when it does not exist."""
+    s3 = get_client('s3')
+    try:
+        return s3.head_object(Bucket=bucket, Key=key).get('Metadata', {})
+    except s3.exceptions.ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+
+
+def encode_file(path: str, encoding: str, work_dir: str) -> str:
+    """Local file to upload: the CSV itself, or a gzip / Parquet copy in work_dir."""
+    if encoding == 'csv':
+        return path
+    target = os.path.join(work_dir, os.path.basename(path))
+    if encoding == 'gzip':
+        target += '.gz'
+        with open(path, 'rb') as source, gzip.open(target, 'wb', compresslevel=6) as sink:
+            shutil.copyfileobj(source, sink, HASH_BLOCK_BYTES)
+        return target
+
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+
+    # Every column stays a string, like the CSV tables the views TRY_CAST from
+    with pacsv.open_csv(path) as reader:
+        header = reader.schema.names
+    table = pacsv.read_csv(path, convert_options=pacsv.ConvertOptions(
+        column_types={name: 'string' for name in header}, strings_can_be_null=False
+    ))
+    target = os.path.splitext(target)[0] + '.parquet'
+    pq.write_table(table, target, compression='snappy')
+    return target
+
+
+def remove_stale(bucket: str, prefix: str, keep: str) -> List[str]:
+    """Delete every object under a table folder except `keep`."""
+    s3 = get_client('s3')
+    stale = []
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        stale.extend(obj['Key'] for obj in page.get('Contents', []) if obj['Key'] != keep)
+    for i in range(0, len(stale), 1000):
+        s3.delete_objects(
+            Bucket=bucket,
+            Delete={'Objects': [{'Key': key} for key in stale[i:i + 1000]], 'Quiet': True}
+        )
+    return stale
+
+
+def upload_one(
+    table: str,
+    path: str,
+    bucket: str,
+    encoding: str = 'csv',
+    transfer_config=None,
+    force: bool = False,
+    work_dir: Optional[str] = None
+) -> Dict:
+    """
+    Upload one raw file unless the stored object already has its checksum.
+
+    Returns:
+        Manifest entry for the table, with 'changed' set when uploaded
+    """
+    source_sha = file_sha256(path)
+    key = raw_key(table, path, encoding)
+    entry = {
+        'key': key,
+        'source': os.path.basename(path),
+        'source_sha256': source_sha,
+        'source_bytes': os.path.getsize(path),
+        'encoding': encoding,
+        'changed': False,
+    }
+
+    stored = None if force else stored_checksum(bucket, key)
+    if stored and stored.get('source-sha256') == source_sha and stored.get('encoding') == encoding:
+        print(f"  {table:<12} unchanged ({key})")
+        return entry
+
+    start = time.perf_counter()
+    upload_path = encode_file(path, encoding, work_dir or tempfile.gettempdir())
+    try:
+        entry['bytes'] = os.path.getsize(upload_path)
+        get_client('s3').upload_file(
+            upload_path, bucket, key,
+            ExtraArgs={'Metadata': {'source-sha256': source_sha, 'encoding': encoding}},
+            Config=transfer_config
+        )
+    finally:
+        if upload_path != path:
+            os.remove(upload_path)
+
+    stale = remove_stale(bucket, f"{key.rsplit('/', 1)[0]}/", key)
+    elapsed = time.perf_counter() - start
+    entry.update({'changed': True, 'changed_at': utc_now(), 'removed': stale})
+    print(f"✓ {table:<12} {entry['bytes']:,} bytes in {elapsed:.1f}s "
+          f"({entry['bytes'] / max(elapsed, 1e-9) / 1024 ** 2:.0f} MB/s) -> {key}")
+    return entry
+
+
+def load_manifest(bucket: str = Config.BUCKET) -> Dict:
+    """The stored upload manifest ({} when there is none)."""
+    s3 = get_client('s3')
+    try:
+        body = s3.get_object(Bucket=bucket, Key=f"{Config.RAW_PREFIX}/{MANIFEST_NAME}")['Body'].read()
+    except s3.exceptions.NoSuchKey:
+        return {}
+    return json.loads(body)
+
+
+def changed_tables(since: Optional[str] = None, bucket: str = Config.BUCKET) -> List[str]:
+    """
+    Raw tables changed after `since` (an ISO timestamp), or after the last
+    pipeline run that rebuilt from raw (Config.BUILD_MARKER_KEY) when omitted.
+
+    Other steps (labels, backfill, views, ...) don't read the uploads, so
+    their run markers don't count. Without a build marker or a manifest,
+    every raw table counts as changed.
+    """
+    if since is None:
+        s3 = get_client('s3')
+        try:
+            marker = json.loads(s3.get_object(Bucket=bucket, Key=Config.BUILD_MARKER_KEY)['Body'].read())
+            since = marker.get('completed_at')
+        except s3.exceptions.NoSuchKey:
+            since = None
+    manifest = load_manifest(bucket)
+    if not manifest:
+        return sorted(RAW_FILES)
+    tables = manifest.get('tables', {})
+    if since is None:
+        return sorted(tables)
+    # Compared as datetimes: the manifest and the marker may come from different time zones
+    since_utc = _as_utc(since)
+    return sorted(
+        table for table, entry in tables.items()
+        if entry.get('changed_at') and _as_utc(entry['changed_at']) > since_utc
+    )
+
+
+def upload(
+    source_dir: str,
+    bucket: str = Config.BUCKET,
+    encoding: str = 'csv',
+    workers: int = DEFAULT_WORKERS,
+    part_bytes: int = DEFAULT_PART_BYTES,
+    force: bool = False
+) -> Dict:
+    """
+    Upload every raw file found in source_dir and update the manifest.
+
+    Returns:
+        The new manifest
+    """
+    from boto3.s3.transfer import TransferConfig
+
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding: {encoding}")
+    files = find_raw_files(source_dir)
+    if not files:
+        raise Exception(f"Failed: no raw files in {source_dir} (expected {', '.join(RAW_FILES.values())})")
+
+    print("=" * 80)
+    print(f"RAW UPLOAD -> s3://{bucket}/{Config.RAW_PREFIX}/")
+    print("=" * 80)
+
+    # Files run in parallel, and each file's parts run in parallel within its upload
+    transfer_config = TransferConfig(
+        multipart_threshold=part_bytes,
+        multipart_chunksize=part_bytes,
+        max_concurrency=max(Config.CLIENT_MAX_POOL_CONNECTIONS // max(workers, 1), 1),
+    )
+    previous = load_manifest(bucket).get('tables', {})
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as work_dir, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            table: pool.submit(upload_one, table, path, bucket, encoding, transfer_config, force, work_dir)
+            for table, path in files.items()
+        }
+        entries = {table: future.result() for table, future in futures.items()}
+
+    tables = dict(previous)
+    for table, entry in entries.items():
+        if not entry['changed']:
+            entry = {**previous.get(table, {}), **entry, 'changed': False}
+        tables[table] = entry
+
+    manifest = {
+        'uploaded_at': utc_now(),
+        'bucket': bucket,
+        'prefix': Config.RAW_PREFIX,
+        'changed': sorted(table for table, entry in entries.items() if entry['changed']),
+        'tables': tables,
+    }
+    get_client('s3').put_object(
+        Bucket=bucket,
+        Key=f"{Config.RAW_PREFIX}/{MANIFEST_NAME}",
+        Body=json.dumps(manifest, indent=2).encode('utf-8'),
+        ContentType='application/json'
+    )
+    print(f"✓ {len(manifest['changed'])} of {len(entries)} tables uploaded "
+          f"({time.perf_counter() - start:.1f}s); manifest -> {Config.RAW_PREFIX}/{MANIFEST_NAME}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload the raw claim CSVs to S3")
+    parser.add_argument('source_dir', help="Folder with the Kaggle CSVs")
+    parser.add_argument('--bucket', default=Config.BUCKET)
+    parser.add_argument('--encoding', choices=sorted(ENCODINGS), default='csv')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--part-mb', type=int, default=DEFAULT_PART_BYTES // 1024 ** 2)
+    parser.add_argument('--force', action='store_true', help="Upload even when the checksum matches")
+    parser.add_argument('--endpoint-url', default=None, help="S3-compatible endpoint (MinIO, moto server)")
+    args = parser.parse_args()
+
+    if args.endpoint_url:
+        Config.S3_ENDPOINT_URL = args.endpoint_url
+    upload(args.source_dir, args.bucket, args.encoding, args.workers, args.part_mb * 1024 ** 2, args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+# lambda/reference_tables.py
+"""
+Reference Tables Module
+Generates the static lookup tables the dimensions join against:
+ICD-9 diagnosis chapters, ICD-9 procedure chapters and a calendar spine.
+
+The tables are tiny and only change when the classification changes, so they
+are written once as Parquet and uploaded to S3. The pipeline's 'reference'
+step registers them in Athena (see sql/00-reference/).
+
+Usage:
+    python reference_tables.py --out-dir ./reference            # write locally
+    python reference_tables.py --out-dir ./reference --upload   # and push to S3
+"""
+
+import argparse
+import calendar
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import Config
+from aws_clients import get_client
+
+
+# ICD-9-CM diagnosis chapters, keyed on the 3-character code category.
+# Ranges are compared as strings, so V and E codes get their own rows.
+# (range_start, range_end, icd9_chapter, risk_level, cost_category)
+ICD9_CHAPTERS = [
+    ('000', '139', 'Infectious and Parasitic Diseases', 'Standard', 'Standard'),
+    ('140', '239', 'Neoplasms', 'High', 'Very High'),
+    ('240', '279', 'Endocrine, Nutritional and Metabolic', 'Standard', 'Standard'),
+    ('280', '289', 'Blood and Blood-Forming Organs', 'Standard', 'Standard'),
+    ('290', '319', 'Mental Disorders', 'Standard', 'Standard'),
+    ('320', '389', 'Nervous System and Sense Organs', 'Standard', 'Standard'),
+    ('390', '459', 'Circulatory System', 'High', 'Standard'),
+    ('460', '519', 'Respiratory System', 'Standard', 'Standard'),
+    ('520', '579', 'Digestive System', 'Standard', 'Standard'),
+    ('580', '629', 'Genitourinary System', 'High', 'Standard'),
+    ('630', '679', 'Pregnancy, Childbirth and Puerperium', 'Standard', 'Standard'),
+    ('680', '709', 'Skin and Subcutaneous Tissue', 'Standard', 'Standard'),
+    ('710', '739', 'Musculoskeletal and Connective Tissue', 'Standard', 'Standard'),
+    ('740', '759', 'Congenital Anomalies', 'Standard', 'Standard'),
+    ('760', '779', 'Perinatal Period Conditions', 'Standard', 'Standard'),
+    ('780', '799', 'Symptoms, Signs and Ill-Defined Conditions', 'Standard', 'Standard'),
+    ('800', '999', 'Injury and Poisoning', 'Standard', 'High'),
+    ('E00', 'E99', 'External Causes of Injury (E Codes)', 'Standard', 'Standard'),
+    ('V00', 'V99', 'Supplementary Classification (V Codes)', 'Low', 'Standard'),
+]
+
+# ICD-9-CM procedure chapters, keyed on the 2-digit code prefix.
+# (range_start, range_end, procedure_category, is_major_procedure, risk_level, cost_category)
+PROCEDURE_CHAPTERS = [
+    (0, 0, 'Operations on Nervous System', False, 'Medium', 'Medium'),
+    (1, 5, 'Operations on Nervous System', True, 'High', 'Very High'),
+    (6, 7, 'Operations on Endocrine System', False, 'Medium', 'Medium'),
+    (8, 16, 'Operations on Eye', False, 'Medium', 'Medium'),
+    (17, 20, 'Operations on Ear', False, 'Medium', 'Medium'),
+    (21, 29, 'Operations on Nose, Mouth, and Pharynx', False, 'Medium', 'Medium'),
+    (30, 34, 'Operations on Respiratory System', False, 'Medium', 'Medium'),
+    (35, 39, 'Operations on Cardiovascular System', True, 'High', 'Very High'),
+    (40, 41, 'Operations on Hemic and Lymphatic System', False, 'Medium', 'Medium'),
+    (42, 54, 'Operations on Digestive System', False, 'Medium', 'Medium'),
+    (55, 59, 'Operations on Urinary System', False, 'Medium', 'Medium'),
+    (60, 64, 'Operations on Male Genital Organs', True, 'Medium', 'Medium'),
+    (65, 71, 'Operations on Female Genital Organs', True, 'Medium', 'Medium'),
+    (72, 75, 'Obstetrical Procedures', False, 'Medium', 'Medium'),
+    (76, 84, 'Operations on Musculoskeletal System', False, 'Medium', 'High'),
+    (85, 86, 'Operations on Integumentary System', False, 'Medium', 'Medium'),
+    (87, 99, 'Miscellaneous Diagnostic and Therapeutic Procedures', False, 'Low', 'Low'),
+]
+
+# Table name -> S3 folder under Config.REFERENCE_PREFIX
+REFERENCE_TABLES = {
+    'ref_icd9_chapter_etl': 'ref_icd9_chapter',
+    'ref_procedure_chapter_etl': 'ref_procedure_chapter',
+    'ref_calendar_etl': 'ref_calendar',
+}
+
+
+def build_icd9_chapters() -> pa.Table:
+    """Build the ICD-9 diagnosis chapter range table."""
+    columns = list(zip(*ICD9_CHAPTERS))
+    return pa.table({
+        'range_start': pa.array(columns[0], pa.string()),
+        'range_end': pa.array(columns[1], pa.string()),
+        'icd9_chapter': pa.array(columns[2], pa.string()),
+        'risk_level': pa.array(columns[3], pa.string()),
+        'cost_category': pa.array(columns[4], pa.string()),
+    })
+
+
+def build_procedure_chapters() -> pa.Table:
+    """Build the ICD-9 procedure chapter range table."""
+    columns = list(zip(*PROCEDURE_CHAPTERS))
+    return pa.table({
+        'range_start': pa.array(columns[0], pa.int32()),
+        'range_end': pa.array(columns[1], pa.int32()),
+        'procedure_category': pa.array(columns[2], pa.string()),
+        'is_major_procedure': pa.array(columns[3], pa.bool_()),
+        'risk_level': pa.array(columns[4], pa.string()),
+        'cost_category': pa.array(columns[5], pa.string()),
+    })
+
+
+def build_calendar(start: date, end: date) -> pa.Table:
+    """
+    Build a calendar spine with one row per day between start and end.
+
+    Columns match dim_date_etl; day_of_week follows ISO (1 = Monday)
+    like Athena's DAY_OF_WEEK.
+    """
+    if end < start:
+        raise ValueError(f"Calendar end {end} is before start {start}")
+
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    return pa.table({
+        'date_key': pa.array([int(d.strftime('%Y%m%d')) for d in days], pa.int32()),
+        'full_date': pa.array(days, pa.date32()),
+        'year': pa.array([d.year for d in days], pa.int32()),
+        'quarter': pa.array([(d.month - 1) // 3 + 1 for d in days], pa.int32()),
+        'month': pa.array([d.month for d in days], pa.int32()),
+        'month_name': pa.array([calendar.month_name[d.month] for d in days], pa.string()),
+        'day_of_month': pa.array([d.day for d in days], pa.int32()),
+        'day_of_week': pa.array([d.isoweekday() for d in days], pa.int32()),
+        'day_name': pa.array([calendar.day_name[d.weekday()] for d in days], pa.string()),
+        'is_weekend': pa.array([d.isoweekday() in (6, 7) for d in days], pa.bool_()),
+        'year_month': pa.array([d.strftime('%Y-%m') for d in days], pa.string()),
+    })
+
+
+def build_reference_tables(start: date, end: date) -> Dict[str, pa.Table]:
+    """Build all reference tables keyed by Athena table name."""
+    return {
+        'ref_icd9_chapter_etl': build_icd9_chapters(),
+        'ref_procedure_chapter_etl': build_procedure_chapters(),
+        'ref_calendar_etl': build_calendar(start, end),
+    }
+
+
+def write_reference_tables(tables: Dict[str, pa.Table], out_dir: str) -> List[str]:
+    """
+    Write each reference table as a single Parquet file.
+
+    Args:
+        tables: Table name -> Arrow table
+        out_dir: Local output directory
+
+    Returns:
+        List of written file paths
+    """
+    written = []
+    for table_name, table in tables.items():
+        folder = os.path.join(out_dir, REFERENCE_TABLES[table_name])
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, 'part-00000.parquet')
+        pq.write_table(table, path, compression='snappy')
+        print(f"✓ Wrote {table_name}: {table.num_rows} rows -> {path}")
+        written.append(path)
+    return written
+
+
+def upload_reference_tables(out_dir: str, bucket: str = Config.BUCKET) -> List[str]:
+    """
+    Upload the written Parquet files to the reference prefix in S3.
+
+    Returns:
+        List of uploaded S3 URIs
+    """
+    s3_client = get_client('s3')
+    uploaded = []
+    for folder in REFERENCE_TABLES.values():
+        local_path = os.path.join(out_dir, folder, 'part-00000.parquet')
+        key = f"{Config.REFERENCE_PREFIX}/{folder}/part-00000.parquet"
+        s3_client.upload_file(local_path, bucket, key)
+        uri = f"s3://{bucket}/{key}"
+        print(f"✓ Uploaded {local_path} -> {uri}")
+        uploaded.append(uri)
+    return uploaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate ETL reference tables")
+    parser.add_argument('--out-dir', default='reference', help="Local output directory")
+    parser.add_argument('--start', default=Config.CALENDAR_START, help="Calendar start (YYYY-MM-DD)")
+    parser.add_argument('--end', default=Config.CALENDAR_END, help="Calendar end (YYYY-MM-DD)")
+    parser.add_argument('--upload', action='store_true', help="Upload files to S3")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, '%Y-%m-%d').date()
+    end = datetime.strptime(args.end, '%Y-%m-%d').date()
+
+    tables = build_reference_tables(start, end)
+    write_reference_tables(tables, args.out_dir)
+
+    if args.upload:
+        upload_reference_tables(args.out_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+# lambda/rollup_router.py
+"""
+Rollup Router Module
+Maps a dashboard filter / group-by combination to the smallest grouping set
+of rollup_fraud_exposure_etl that can answer it, and renders the query.
+
+Usage:
+    python rollup_router.py --group-by month_key --filter claim_type=Inpatient
+"""
+
+import argparse
+from itertools import combinations
+from typing import Dict, List, Optional, Union
+
+from config import Config
+
+
+ROLLUP_TABLE = 'rollup_fraud_exposure_etl'
+
+# Order matches the GROUPING(...) call in sql/04-rollups/rollup_fraud_exposure_etl.sql
+ROLLUP_DIMENSIONS = ['month_key', 'state_code', 'claim_type', 'provider_type', 'risk_category']
+
+# Additive measures only - they can be re-summed from a coarser grouping set
+ROLLUP_MEASURES = ['total_claims', 'fraud_claims', 'total_claimed', 'fraud_exposure_amount']
+
+# Rough distinct counts, used to rank candidate grouping sets by size
+DIMENSION_CARDINALITY = {
+    'month_key': 36,
+    'state_code': 52,
+    'claim_type': 2,
+    'provider_type': 5,
+    'risk_category': 4,
+}
+
+# Dimensions stored as numbers (rendered without quotes)
+NUMERIC_DIMENSIONS = {'state_code'}
+
+# The rollup is built with CUBE, so every subset of dimensions is available
+ROLLUP_GROUPING_SETS = [
+    frozenset(dims)
+    for size in range(len(ROLLUP_DIMENSIONS) + 1)
+    for dims in combinations(ROLLUP_DIMENSIONS, size)
+]
+
+FilterValue = Union[str, int, List[Union[str, int]]]
+
+
+def grouping_id(dimensions) -> int:
+    """Return the GROUPING() bitmask for a set of grouped dimensions."""
+    bits = 0
+    for position, dim in enumerate(ROLLUP_DIMENSIONS):
+        if dim not in dimensions:
+            bits |= 1 << (len(ROLLUP_DIMENSIONS) - 1 - position)
+    return bits
+
+
+def estimated_rows(dimensions) -> int:
+    """Upper bound on the row count of a grouping set."""
+    rows = 1
+    for dim in dimensions:
+        rows *= DIMENSION_CARDINALITY[dim]
+    return rows
+
+
+def choose_grouping_set(required) -> frozenset:
+    """
+    Pick the smallest grouping set containing every required dimension.
+
+    Raises:
+        ValueError: If a dimension is not in the rollup, or no set covers it
+    """
+    required = set(required)
+    unknown = required - set(ROLLUP_DIMENSIONS)
+    if unknown:
+        raise ValueError(
+            f"Dimensions not in {ROLLUP_TABLE}: {sorted(unknown)}; query fact_claims_etl instead"
+        )
+
+    candidates = [s for s in ROLLUP_GROUPING_SETS if required <= s]
+    if not candidates:
+        raise ValueError(f"No grouping set in {ROLLUP_TABLE} covers {sorted(required)}")
+    return min(candidates, key=lambda s: (estimated_rows(s), len(s)))
+
+
+def _literal(dim: str, value: Union[str, int]) -> str:
+    """Render a filter value as a SQL literal."""
+    if dim in NUMERIC_DIMENSIONS:
+        return str(int(value))
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def route(
+    filters: Optional[Dict[str, FilterValue]] = None,
+    group_by: Optional[List[str]] = None,
+    measures: Optional[List[str]] = None
+) -> Dict:
+    """
+    Build the rollup query for a dashboard request.
+
+    Args:
+        filters: Dimension -> value or list of values
+        group_by: Dimensions to break the measures down by
+        measures: Measures to return (default: all)
+
+    Returns:
+        Dict with the chosen grouping set, grouping_id and query
+    """
+    filters = filters or {}
+    group_by = list(group_by or [])
+    measures = list(measures or ROLLUP_MEASURES)
+
+    bad_measures = set(measures) - set(ROLLUP_MEASURES)
+    if bad_measures:
+        raise ValueError(f"Measures not in {ROLLUP_TABLE}: {sorted(bad_measures)}")
+
+    grouping_set = choose_grouping_set(set(filters) | set(group_by))
+    gid = grouping_id(grouping_set)
+
+    predicates = [f"grouping_id = {gid}"]
+    for dim, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            values = ', '.join(_literal(dim, v) for v in value)
+            predicates.append(f"{dim} IN ({values})")
+        else:
+            predicates.append(f"{dim} = {_literal(dim, value)}")
+
+    select_cols = group_by + [f"SUM({m}) AS {m}" for m in measures]
+    query = (
+        f"SELECT {', '.join(select_cols)}\n"
+        f"FROM {ROLLUP_TABLE}\n"
+        f"WHERE {' AND '.join(predicates)}"
+    )
+    if group_by:
+        query += f"\nGROUP BY {', '.join(group_by)}\nORDER BY {', '.join(group_by)}"
+
+    return {
+        'table': ROLLUP_TABLE,
+        'grouping_set': sorted(grouping_set, key=ROLLUP_DIMENSIONS.index),
+        'grouping_id': gid,
+        'estimated_rows': estimated_rows(grouping_set),
+        'query': query,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route a dashboard slice to the rollup table")
+    parser.add_argument('--group-by', nargs='*', default=[], help="Dimensions to group by")
+    parser.add_argument('--filter', nargs='*', default=[], help="dim=value (comma separates IN lists)")
+    parser.add_argument('--run', action='store_true', help="Execute the query in Athena")
+    args = parser.parse_args()
+
+    filters = {}
+    for item in args.filter:
+        dim, _, value = item.partition('=')
+        filters[dim] = value.split(',') if ',' in value else value
+
+    routed = route(filters, args.group_by)
+    print(f"Grouping set: {routed['grouping_set']} (grouping_id={routed['grouping_id']})")
+    print(routed['query'])
+
+    if args.run:
+        from athena_executor import AthenaExecutor
+        executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+        executor.execute_query(routed['query'], Config.DATABASE, label="Rollup query")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# lambda/sampling.py
+"""
+Sampling Module
+Deterministic provider-sample builds for development.
+
+A sampled run builds the normal views -> dims -> facts chain in a separate
+database (Config.SAMPLE_DATABASE) and S3 prefix (Config.SAMPLE_PREFIX):
+
+    - the sample database gets views named like the raw tables
+      (provider, inpatient, outpatient, beneficiary) that read the main
+      database's raw tables, filtered to a hash sample of providers:
+
+          bitwise_and(from_big_endian_64(xxhash64(to_utf8(Provider))), 2^63 - 1) % 100 < k
+
+      beneficiary keeps the patients with a claim from a sampled provider,
+      so every claim joins to its patient and provider
+    - the pipeline's SQL runs unchanged against those views; only the CTAS
+      external_location is moved under the sample prefix
+
+The same k always selects the same providers, and a larger k selects a
+superset. Provider-level statistics (e.g. dim_provider_etl risk cutoffs)
+are computed over the sample.
+
+Usage:
+    lambda_handler({'step': 'all', 'sample': 5}, None)     # 5% of providers
+"""
+
+import re
+from typing import List, Tuple
+
+from config import Config
+
+
+SAMPLE_BUCKETS = 100
+
+
+def provider_predicate(column: str, percent: int) -> str:
+    """SQL predicate selecting `percent` of SAMPLE_BUCKETS by provider hash (sign bit masked)."""
+    return (f"bitwise_and(from_big_endian_64(xxhash64(to_utf8({column}))), 9223372036854775807) "
+            f"% {SAMPLE_BUCKETS} < {percent}")
+
+
+def raw_sample_views(percent: int, source_database: str = Config.DATABASE) -> List[Tuple[str, str]]:
+    """(name, CREATE VIEW) for the sampled stand-ins of the raw tables."""
+    claims = ' UNION '.join(
+        f"SELECT BeneID FROM {source_database}.{table} WHERE {provider_predicate('Provider', percent)}"
+        for table in ['inpatient', 'outpatient']
+    )
+    bodies = {
+        'provider': f"SELECT * FROM {source_database}.provider WHERE {provider_predicate('Provider', percent)}",
+        'inpatient': f"SELECT * FROM {source_database}.inpatient WHERE {provider_predicate('Provider', percent)}",
+        'outpatient': f"SELECT * FROM {source_database}.outpatient WHERE {provider_predicate('Provider', percent)}",
+        'beneficiary': f"SELECT * FROM {source_database}.beneficiary WHERE BeneID IN ({claims})",
+    }
+    return [(name, f"CREATE OR REPLACE VIEW {name} AS\n{body}") for name, body in bodies.items()]
+
+
+_LOCATION_PATTERN = re.compile(r"(external_location\s*=\s*'s3://[^/]+/)" + re.escape(Config.WAREHOUSE_PREFIX) + "/")
+
+
+def sample_query(query: str) -> str:
+    """Move a CTAS's external_location from the warehouse prefix to the sample prefix."""
+    return _LOCATION_PATTERN.sub(lambda match: match.group(1) + Config.SAMPLE_PREFIX + '/', query)
+
+
+def output_location(query: str):
+    """The external_location of a CTAS, None for other statements."""
+    match = re.search(r"external_location\s*=\s*'([^']+)'", query)
+    return match.group(1) if match else None
+
+
+def prepare(executor, percent: int, nodes: List[Tuple[str, str, str]]) -> None:
+    """
+    Create the sample database and its raw-table views, and empty the
+    sample locations of the CTAS nodes about to run.
+
+    Args:
+        executor: AthenaExecutor
+        percent: Providers kept, out of SAMPLE_BUCKETS
+        nodes: (step, name, sql_file) the run will execute
+    """
+    from parquet_io import clear_directory
+
+    if not 0 < percent < SAMPLE_BUCKETS:
+        raise ValueError(f"sample must be between 1 and {SAMPLE_BUCKETS - 1}, got {percent}")
+
+    print("\n" + "=" * 80)
+    print(f"SAMPLE: {percent}% of providers -> {Config.SAMPLE_DATABASE}, s3://{Config.BUCKET}/{Config.SAMPLE_PREFIX}/")
+    print("=" * 80)
+
+    res = executor.execute_query(f"CREATE DATABASE IF NOT EXISTS {Config.SAMPLE_DATABASE}")
+    if res['status'] != 'success':
+        raise Exception(f"Failed: create {Config.SAMPLE_DATABASE} - {res.get('error')}")
+    for name, query in raw_sample_views(percent):
+        res = executor.execute_query(query, Config.SAMPLE_DATABASE, label=f"Sample view {name}")
+        if res['status'] != 'success':
+            raise Exception(f"Failed: sample view {name} - {res.get('error')}")
+
+    for _, _, sql_file in nodes:
+        location = output_location(sample_query(Config.get_sql_file(sql_file)))
+        if location and f"/{Config.SAMPLE_PREFIX}/" in location:
+            clear_directory(location)
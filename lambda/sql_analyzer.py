@@ -0,0 +1,391 @@
+# lambda/sql_analyzer.py
+"""
+SQL Analyzer Module
+Static cost anti-pattern checks for the pipeline's SQL, built on sqlglot.
+
+Reads every file under sql/ and every SQL string literal in
+all-in-one-lambda-etl.py, and for each statement builds a scan graph:
+how often each table or view is read once CTEs are inlined (Athena
+re-evaluates a CTE at every reference) and, with views expanded, how often
+each raw table is read.
+
+Checks:
+    repeated_scan           same table/view read more than once in a statement
+    scalar_subquery_in_case scalar subquery inside CASE (an extra scan per subquery)
+    distinct_over_union     SELECT DISTINCT over a UNION (two deduplications)
+    union_distinct          UNION where UNION ALL may do (global dedup)
+    global_row_number       ROW_NUMBER() without PARTITION BY (single-node sort)
+    order_without_limit     ORDER BY in a view/CTAS body (sort thrown away)
+    multiple_count_distinct several COUNT(DISTINCT) in one SELECT
+    cross_join              join without condition (not UNNEST)
+
+Impact is estimated in rows: extra rows read, or rows pushed through a
+single-node sort, from ROW_ESTIMATES for the raw and main warehouse tables.
+
+Usage:
+    python sql_analyzer.py                      # report
+    python sql_analyzer.py --json
+    python sql_analyzer.py --fail-on repeated_scan scalar_subquery_in_case
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from config import Config
+
+
+DIALECT = 'athena'
+
+ALL_IN_ONE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'all-in-one-lambda-etl.py')
+
+# Approximate row counts (Kaggle training set and the warehouse built from it)
+ROW_ESTIMATES = {
+    'provider': 5_410,
+    'beneficiary': 138_556,
+    'inpatient': 40_474,
+    'outpatient': 517_737,
+    'dim_date_etl': 1_100,
+    'dim_provider_etl': 5_410,
+    'dim_patient_etl': 138_556,
+    'dim_diagnosis_etl': 1_200,
+    'dim_procedure_etl': 320,
+    'fact_claims_etl': 558_211,
+    'claim_codes_etl': 558_211,
+    'fact_claims_summary_grouped_etl': 570_000,
+    'fact_provider_summary_etl': 70_000,
+    'fact_patient_claims_summary_etl': 500_000,
+    'bridge_claim_diagnosis_etl': 3_000_000,
+    'bridge_claim_procedure_etl': 200_000,
+}
+
+# Upper-case keyword and at least three words, so labels ("Create view x") and
+# keyword lists ('CREATE DATABASE') are not taken for statements
+_SQL_START = re.compile(r'^\s*(?:--[^\n]*\n\s*)*(CREATE|SELECT|WITH|INSERT|UNLOAD)\s+\S+\s+\S')
+
+
+# -- sources ------------------------------------------------------------
+
+def sql_file_sources(sql_dir: str = Config.SQL_DIR) -> List[Tuple[str, str]]:
+    """(source, sql) for every .sql file, source relative to the repo root."""
+    sources = []
+    for root, _, files in os.walk(sql_dir):
+        for name in sorted(files):
+            if name.endswith('.sql'):
+                path = os.path.join(root, name)
+                with open(path) as f:
+                    sources.append(('sql/' + os.path.relpath(path, sql_dir).replace(os.sep, '/'), f.read()))
+    return sorted(sources)
+
+
+def embedded_sources(path: str = ALL_IN_ONE_FILE) -> List[Tuple[str, str]]:
+    """(source, sql) for every SQL string literal in a Python file (f-string fields become 'x')."""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    names = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            names[id(node.value)] = node.targets[0].id
+
+    sources = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            text = node.value
+        elif isinstance(node, ast.JoinedStr):
+            text = ''.join(
+                part.value if isinstance(part, ast.Constant) else 'x' for part in node.values
+            )
+        else:
+            continue
+        if _SQL_START.match(text):
+            label = names.get(id(node), f"line {node.lineno}")
+            sources.append((f"{os.path.basename(path)}:{label}", text))
+    return sources
+
+
+def parse_statements(sources: List[Tuple[str, str]]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Parse sources into statements.
+
+    Returns:
+        (statements, errors); a statement is {'source', 'name', 'kind', 'body', 'tree'}
+    """
+    statements, errors = [], []
+    for source, text in sources:
+        try:
+            trees = [tree for tree in sqlglot.parse(text, read=DIALECT) if tree is not None]
+        except sqlglot.errors.ParseError as e:
+            errors.append({'source': source, 'error': str(e).splitlines()[0]})
+            continue
+        for tree in trees:
+            name, kind, body = None, 'query', tree
+            if isinstance(tree, exp.Create):
+                target = tree.this.this if isinstance(tree.this, exp.Schema) else tree.this
+                name = target.name.lower() if isinstance(target, exp.Table) else None
+                kind = str(tree.args.get('kind') or 'TABLE').lower()
+                body = tree.expression
+            elif isinstance(tree, exp.Insert):
+                body = tree.expression
+            if body is None:
+                continue  # external table registration, DDL without a query
+            statements.append({'source': source, 'name': name, 'kind': kind, 'body': body, 'tree': tree})
+    return statements, errors
+
+
+# -- scan graph ---------------------------------------------------------
+
+def _in_cte_definition(table: exp.Table, root: exp.Expression) -> bool:
+    """True when a table sits in a CTE defined below root (counted at each reference instead)."""
+    node = table.parent
+    while node is not None and node is not root:
+        if isinstance(node, exp.CTE):
+            return True
+        node = node.parent
+    return False
+
+
+def relation_reads(body: exp.Expression) -> Counter:
+    """Reads per table/view in a query, with every CTE reference inlined."""
+    ctes = {cte.alias_or_name.lower(): cte.this for cte in body.find_all(exp.CTE)}
+    memo: Dict[str, Counter] = {}
+
+    def reads(root: exp.Expression, stack: Tuple[str, ...]) -> Counter:
+        counts = Counter()
+        for table in root.find_all(exp.Table):
+            name = table.name.lower()
+            if not name or _in_cte_definition(table, root):
+                continue
+            if not table.db and name in ctes and name not in stack:
+                if name not in memo:
+                    memo[name] = reads(ctes[name], stack + (name,))
+                counts.update(memo[name])
+            else:
+                counts[f"{table.db.lower()}.{name}" if table.db else name] += 1
+        return counts
+
+    return reads(body, ())
+
+
+class ScanGraph:
+    """Relation reads per statement, and raw-table reads through views."""
+
+    def __init__(self, statements: List[Dict]):
+        self.statements = statements
+        for statement in statements:
+            statement['reads'] = relation_reads(statement['body'])
+        # Last definition wins (the all-in-one script repeats the sql/ views)
+        self.views = {s['name']: s['reads'] for s in statements if s['kind'] == 'view' and s['name']}
+
+    def base_reads(self, reads: Counter, stack: Tuple[str, ...] = ()) -> Counter:
+        """Expand views down to the tables they read."""
+        counts = Counter()
+        for relation, n in reads.items():
+            name = relation.split('.')[-1]
+            if name in self.views and name not in stack:
+                for base, m in self.base_reads(self.views[name], stack + (name,)).items():
+                    counts[base] += n * m
+            else:
+                counts[relation] += n
+        return counts
+
+    def rows(self, relation: str) -> Optional[int]:
+        """Estimated rows produced by reading a relation once (views: their base reads)."""
+        name = relation.split('.')[-1]
+        if name in ROW_ESTIMATES:
+            return ROW_ESTIMATES[name]
+        if name in self.views:
+            total = 0
+            for base, n in self.base_reads(Counter({name: 1})).items():
+                base_rows = ROW_ESTIMATES.get(base.split('.')[-1])
+                if base_rows is None:
+                    return None
+                total += n * base_rows
+            return total
+        return None
+
+    def rows_read(self, reads: Counter) -> Optional[int]:
+        estimates = [self.rows(relation) for relation in reads]
+        if any(value is None for value in estimates):
+            known = [value * n for value, n in zip(estimates, reads.values()) if value is not None]
+            return sum(known) if known else None
+        return sum(value * n for value, n in zip(estimates, reads.values()))
+
+
+# -- checks -------------------------------------------------------------
+
+def _finding(statement: Dict, rule: str, detail: str, impact: Optional[int]) -> Dict:
+    return {
+        'source': statement['source'],
+        'object': statement['name'],
+        'rule': rule,
+        'detail': detail,
+        'impact_rows': impact,
+    }
+
+
+def check_statement(statement: Dict, graph: ScanGraph) -> List[Dict]:
+    body = statement['body']
+    findings = []
+
+    for relation, n in statement['reads'].items():
+        if n > 1:
+            rows = graph.rows(relation)
+            findings.append(_finding(
+                statement, 'repeated_scan', f"{relation} read {n}x", (n - 1) * rows if rows else None
+            ))
+
+    for case in body.find_all(exp.Case):
+        for subquery in case.find_all(exp.Subquery):
+            reads = relation_reads(subquery.this)
+            findings.append(_finding(
+                statement, 'scalar_subquery_in_case',
+                f"scalar subquery over {', '.join(sorted(reads)) or 'a constant'} inside CASE",
+                graph.rows_read(reads)
+            ))
+
+    for select in body.find_all(exp.Select):
+        source = select.args.get('from_') or select.args.get('from')
+        inner = source.this.this if source is not None and isinstance(source.this, exp.Subquery) else None
+        if select.args.get('distinct') and isinstance(inner, exp.Union):
+            findings.append(_finding(
+                statement, 'distinct_over_union', "SELECT DISTINCT over a UNION subquery",
+                graph.rows_read(relation_reads(inner))
+            ))
+
+        count_distinct = [
+            agg for agg in select.expressions
+            for agg in agg.find_all(exp.Count) if isinstance(agg.this, exp.Distinct)
+        ]
+        if len(count_distinct) > 1:
+            findings.append(_finding(
+                statement, 'multiple_count_distinct',
+                f"{len(count_distinct)} COUNT(DISTINCT) in one SELECT", graph.rows_read(relation_reads(select))
+            ))
+
+        for join in select.args.get('joins') or []:
+            if join.args.get('on') or join.args.get('using') or isinstance(join.this, exp.Unnest):
+                continue
+            if isinstance(join.this, exp.Lateral):
+                continue
+            findings.append(_finding(
+                statement, 'cross_join', f"join to {join.this.sql(dialect=DIALECT)[:60]} without a condition", None
+            ))
+
+    for union in body.find_all(exp.Union):
+        if union.args.get('distinct') and not isinstance(union.parent, exp.Union):
+            findings.append(_finding(
+                statement, 'union_distinct', "UNION deduplicates; UNION ALL if branches are disjoint",
+                graph.rows_read(relation_reads(union))
+            ))
+
+    for window in body.find_all(exp.Window):
+        if isinstance(window.this, exp.RowNumber) and not window.args.get('partition_by'):
+            findings.append(_finding(
+                statement, 'global_row_number', "ROW_NUMBER() without PARTITION BY sorts on one node",
+                graph.rows_read(statement['reads'])
+            ))
+
+    if statement['kind'] in ('view', 'table') and body.args.get('order') and not body.args.get('limit'):
+        findings.append(_finding(
+            statement, 'order_without_limit', "ORDER BY in a view/CTAS body is not preserved",
+            graph.rows_read(statement['reads'])
+        ))
+    return findings
+
+
+def analyze(sources: Optional[List[Tuple[str, str]]] = None) -> Dict:
+    """
+    Scan graph and findings for the given sources (default: sql/ and the
+    all-in-one script).
+    """
+    sources = sources if sources is not None else sql_file_sources() + embedded_sources()
+    statements, errors = parse_statements(sources)
+    graph = ScanGraph(statements)
+
+    queries, findings = [], []
+    for statement in statements:
+        base = graph.base_reads(statement['reads'])
+        queries.append({
+            'source': statement['source'],
+            'object': statement['name'],
+            'reads': dict(statement['reads']),
+            'base_reads': dict(base),
+            'rows_read': graph.rows_read(base),
+        })
+        findings.extend(check_statement(statement, graph))
+
+    table_totals = Counter()
+    for query in queries:
+        table_totals.update(query['base_reads'])
+    findings.sort(key=lambda f: -(f['impact_rows'] or 0))
+    return {
+        'queries': queries,
+        'findings': findings,
+        'table_reads': dict(table_totals.most_common()),
+        'errors': errors,
+    }
+
+
+def _format_rows(rows: Optional[int]) -> str:
+    if rows is None:
+        return '?'
+    for unit, size in (('M', 1_000_000), ('K', 1_000)):
+        if rows >= size:
+            return f"{rows / size:.1f}{unit}"
+    return str(rows)
+
+
+def print_report(result: Dict) -> None:
+    print("=" * 80)
+    print("SQL SCAN GRAPH")
+    print("=" * 80)
+    for query in result['queries']:
+        reads = ', '.join(f"{name}x{n}" for name, n in sorted(query['reads'].items()))
+        base = ', '.join(f"{name}x{n}" for name, n in sorted(query['base_reads'].items()))
+        print(f"{query['source']}  [{query['object'] or '-'}]  ~{_format_rows(query['rows_read'])} rows")
+        print(f"    reads: {reads}")
+        if base != reads:
+            print(f"    base:  {base}")
+
+    print("\nBase table reads across all statements:")
+    for table, n in result['table_reads'].items():
+        print(f"    {table:<36} {n:>4}")
+
+    print("\n" + "=" * 80)
+    print(f"HOT SPOTS ({len(result['findings'])})")
+    print("=" * 80)
+    for finding in result['findings']:
+        print(f"  ~{_format_rows(finding['impact_rows']):>7} rows  [{finding['rule']}] "
+              f"{finding['source']}: {finding['detail']}")
+    for error in result['errors']:
+        print(f"WARNING: Could not parse {error['source']}: {error['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static cost anti-pattern checks for the pipeline SQL")
+    parser.add_argument('--json', action='store_true', help="Print the result as JSON")
+    parser.add_argument('--no-embedded', action='store_true', help="Skip all-in-one-lambda-etl.py")
+    parser.add_argument('--fail-on', nargs='*', default=[], metavar='RULE',
+                        help="Exit 1 when any finding has one of these rules")
+    args = parser.parse_args()
+
+    sources = sql_file_sources() + ([] if args.no_embedded else embedded_sources())
+    result = analyze(sources)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+    if any(finding['rule'] in args.fail_on for finding in result['findings']):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
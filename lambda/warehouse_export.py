@@ -0,0 +1,333 @@
+# lambda/warehouse_export.py
+"""
+Warehouse Export Module
+Snapshots the star schema to local Parquet or Arrow IPC files, and opens
+those snapshots memory-mapped.
+
+Export:
+    1. UNLOAD (SELECT * FROM <table>) to a fresh S3 prefix per table, as Parquet
+    2. Download every unloaded object in byte ranges, all (file, range) parts of
+       all tables in one thread pool, so many small UNLOAD files and a few large
+       ones both keep the connections busy
+    3. Keep the Parquet files, or stream each table into one uncompressed
+       Arrow IPC file of large record batches (ARROW_BATCH_ROWS rows each, so
+       the whole table is never held in memory and no string buffer passes 2 GB)
+
+Access:
+    ArrowSnapshot memory-maps the .arrow files. Opening a multi-GB fact table
+    reads only the IPC footer; numeric columns come back as zero-copy NumPy
+    views over the mapping (one per record batch), and the OS pages in only
+    the parts a job touches.
+
+    >>> snapshot = ArrowSnapshot('./snapshot')
+    >>> amount = snapshot.numpy('fact_claims_etl', 'claim_amount')   # no copy in one batch
+    >>> parts = snapshot.chunks('fact_claims_etl', 'claim_amount')   # no copy, per batch
+
+Usage:
+    python warehouse_export.py --out ./snapshot                       # Arrow IPC
+    python warehouse_export.py --out ./snapshot --format parquet
+    python warehouse_export.py --out ./snapshot --tables fact_claims_etl dim_provider_etl
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.ipc as ipc
+
+from config import Config
+from aws_clients import get_client
+
+
+EXPORT_TABLES = [
+    'fact_claims_etl',
+    'dim_date_etl',
+    'dim_provider_etl',
+    'dim_patient_etl',
+    'dim_diagnosis_etl',
+    'dim_procedure_etl',
+]
+
+EXPORT_PREFIX = f"{Config.WAREHOUSE_PREFIX}/_exports"
+
+DEFAULT_PART_BYTES = 8 * 1024 ** 2
+DEFAULT_WORKERS = 16
+
+# Rows per record batch of an Arrow snapshot (fact_claims_etl fits in one)
+ARROW_BATCH_ROWS = 4 * 1024 ** 2
+
+
+def unload_table(executor, table: str, prefix: str) -> Dict:
+    """UNLOAD a table to s3://<bucket>/<prefix>/ as Parquet."""
+    res = executor.execute_query(
+        f"UNLOAD (SELECT * FROM {table}) "
+        f"TO 's3://{Config.BUCKET}/{prefix}/' "
+        f"WITH (format = 'PARQUET', compression = 'SNAPPY')",
+        Config.DATABASE,
+        label=f"Unload {table}"
+    )
+    if res['status'] != 'success':
+        raise Exception(f"Failed: unload {table} - {res.get('error')}")
+    return res
+
+
+def list_objects(prefix: str) -> List[Tuple[str, int]]:
+    """(key, size) of every object under a prefix."""
+    objects = []
+    paginator = get_client('s3').get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=Config.BUCKET, Prefix=prefix.rstrip('/') + '/'):
+        objects.extend((obj['Key'], obj['Size']) for obj in page.get('Contents', []))
+    return objects
+
+
+def _download_range(key: str, path: str, start: int, end: int) -> int:
+    """Fetch bytes [start, end] of an object into the same offset of a local file."""
+    body = get_client('s3').get_object(
+        Bucket=Config.BUCKET, Key=key, Range=f"bytes={start}-{end}"
+    )['Body'].read()
+    with open(path, 'r+b') as f:
+        f.seek(start)
+        f.write(body)
+    return len(body)
+
+
+def download_objects(
+    objects: List[Tuple[str, int, str]],
+    part_bytes: int = DEFAULT_PART_BYTES,
+    workers: int = DEFAULT_WORKERS
+) -> int:
+    """
+    Download (key, size, local_path) objects with parallel ranged GETs.
+
+    Every file is preallocated, then all ranges of all files go through one
+    thread pool.
+
+    Returns:
+        Bytes downloaded
+    """
+    parts = []
+    for key, size, path in objects:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.truncate(size)
+        parts.extend((key, path, start, min(start + part_bytes, size) - 1)
+                     for start in range(0, size, part_bytes))
+
+    downloaded = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_download_range, *part) for part in parts]
+        for future in as_completed(futures):
+            downloaded += future.result()
+    return downloaded
+
+
+def parquet_to_arrow(parquet_dir: str, arrow_path: str, batch_rows: int = ARROW_BATCH_ROWS) -> int:
+    """
+    Stream a directory of Parquet files into one uncompressed Arrow IPC file.
+
+    Scanner batches are gathered into record batches of batch_rows, so each
+    column is contiguous within a batch (mmap-friendly) while only one batch
+    is in memory at a time.
+
+    Returns:
+        Rows written
+    """
+    dataset = ds.dataset(parquet_dir, format='parquet')
+    rows = 0
+    with pa.OSFile(arrow_path, 'wb') as sink:
+        with ipc.new_file(sink, dataset.schema) as writer:
+            pending, pending_rows = [], 0
+
+            def flush():
+                if pending:
+                    batch = pa.Table.from_batches(pending, dataset.schema).combine_chunks()
+                    writer.write_table(batch, max_chunksize=max(batch.num_rows, 1))
+                    pending.clear()
+
+            for batch in dataset.to_batches(batch_size=batch_rows):
+                if pending_rows + batch.num_rows > batch_rows:
+                    flush()
+                    pending_rows = 0
+                pending.append(batch)
+                pending_rows += batch.num_rows
+                rows += batch.num_rows
+            flush()
+    return rows
+
+
+def export(
+    out_dir: str,
+    tables: Optional[List[str]] = None,
+    file_format: str = 'arrow',
+    part_bytes: int = DEFAULT_PART_BYTES,
+    workers: int = DEFAULT_WORKERS,
+    keep_remote: bool = False,
+    executor=None
+) -> Dict:
+    """
+    Snapshot tables to out_dir as <table>.arrow or <table>/*.parquet.
+
+    Returns:
+        The snapshot manifest (also written to out_dir/manifest.json)
+    """
+    if file_format not in ('arrow', 'parquet'):
+        raise ValueError(f"Unknown format: {file_format}")
+    tables = tables or EXPORT_TABLES
+    if executor is None:
+        from athena_executor import AthenaExecutor
+        executor = AthenaExecutor(bucket=Config.BUCKET, region=Config.REGION)
+
+    print("=" * 80)
+    print("WAREHOUSE EXPORT")
+    print("=" * 80)
+
+    snapshot_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    start = time.perf_counter()
+
+    # UNLOAD each table; Athena runs them concurrently
+    prefixes = {table: f"{EXPORT_PREFIX}/{snapshot_id}/{table}" for table in tables}
+    with ThreadPoolExecutor(max_workers=len(tables)) as pool:
+        list(pool.map(lambda table: unload_table(executor, table, prefixes[table]), tables))
+    unloaded = time.perf_counter()
+    print(f"✓ Unloaded {len(tables)} tables in {unloaded - start:.1f}s")
+
+    staging = os.path.join(out_dir, f".download-{snapshot_id}")
+    objects = []
+    for table in tables:
+        for key, size in list_objects(prefixes[table]):
+            objects.append((key, size, os.path.join(staging, table, os.path.basename(key) + '.parquet')))
+    downloaded = download_objects(objects, part_bytes, workers)
+    fetched = time.perf_counter()
+    print(f"✓ Downloaded {len(objects)} files, {downloaded:,} bytes in {fetched - unloaded:.1f}s "
+          f"({downloaded / max(fetched - unloaded, 1e-9) / 1024 ** 2:.0f} MB/s)")
+
+    manifest = {
+        'snapshot_id': snapshot_id,
+        'created_at': str(datetime.now()),
+        'database': Config.DATABASE,
+        'format': file_format,
+        'tables': {},
+    }
+    for table in tables:
+        source = os.path.join(staging, table)
+        os.makedirs(source, exist_ok=True)
+        if file_format == 'arrow':
+            target = os.path.join(out_dir, f"{table}.arrow")
+            rows = parquet_to_arrow(source, target)
+        else:
+            target = os.path.join(out_dir, table)
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(source, target)
+            rows = ds.dataset(target, format='parquet').count_rows()
+        manifest['tables'][table] = {
+            'path': os.path.relpath(target, out_dir),
+            'rows': rows,
+            'bytes': os.path.getsize(target) if os.path.isfile(target) else sum(
+                os.path.getsize(os.path.join(target, name)) for name in os.listdir(target)
+            ),
+        }
+        print(f"  {table:<24} {rows:>12,} rows -> {manifest['tables'][table]['path']}")
+    shutil.rmtree(staging, ignore_errors=True)
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if not keep_remote:
+        s3 = get_client('s3')
+        keys = [key for key, _, _ in objects]
+        for i in range(0, len(keys), 1000):
+            s3.delete_objects(
+                Bucket=Config.BUCKET,
+                Delete={'Objects': [{'Key': key} for key in keys[i:i + 1000]], 'Quiet': True}
+            )
+
+    print(f"✓ Snapshot {snapshot_id} -> {out_dir} ({time.perf_counter() - start:.1f}s)")
+    return manifest
+
+
+class ArrowSnapshot:
+    """Memory-mapped access to an exported Arrow snapshot."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        manifest_path = os.path.join(directory, 'manifest.json')
+        self.manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        self._tables: Dict[str, pa.Table] = {}
+
+    def tables(self) -> List[str]:
+        return sorted(name[:-len('.arrow')] for name in os.listdir(self.directory) if name.endswith('.arrow'))
+
+    def table(self, name: str) -> pa.Table:
+        """The table backed by the memory map (only the IPC footer is read here)."""
+        if name not in self._tables:
+            source = pa.memory_map(os.path.join(self.directory, f"{name}.arrow"), 'r')
+            self._tables[name] = ipc.open_file(source).read_all()
+        return self._tables[name]
+
+    def numpy(self, table: str, column: str) -> np.ndarray:
+        """
+        A column as a NumPy array.
+
+        Zero-copy (a read-only view over the mapping) for numeric and
+        timestamp columns without nulls when the table is one record batch.
+        Dates (stored as day counts, returned as datetime64[D]), strings,
+        booleans (bit-packed), columns with nulls and multi-batch tables are
+        converted with parquet_io.column_to_numpy; see chunks() for per-batch
+        views.
+        """
+        data = self.table(table).column(column)
+        if data.num_chunks == 1 and data.null_count == 0:
+            try:
+                return data.chunk(0).to_numpy(zero_copy_only=True)
+            except pa.ArrowInvalid:
+                pass
+        from parquet_io import column_to_numpy
+        return column_to_numpy(data)
+
+    def chunks(self, table: str, column: str) -> List[np.ndarray]:
+        """A column as one NumPy array per record batch, zero-copy where numpy() would be."""
+        from parquet_io import column_to_numpy
+
+        arrays = []
+        for chunk in self.table(table).column(column).chunks:
+            view = None
+            if chunk.null_count == 0:
+                try:
+                    view = chunk.to_numpy(zero_copy_only=True)
+                except pa.ArrowInvalid:
+                    pass
+            arrays.append(view if view is not None else column_to_numpy(chunk))
+        return arrays
+
+    def columns(self, table: str, names: List[str]) -> Dict[str, np.ndarray]:
+        return {name: self.numpy(table, name) for name in names}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the star schema to local Arrow/Parquet files")
+    parser.add_argument('--out', required=True, help="Local snapshot directory")
+    parser.add_argument('--tables', nargs='+', default=EXPORT_TABLES)
+    parser.add_argument('--format', choices=['arrow', 'parquet'], default='arrow')
+    parser.add_argument('--part-mb', type=int, default=DEFAULT_PART_BYTES // 1024 ** 2)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--keep-remote', action='store_true', help="Keep the UNLOAD output in S3")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    export(args.out, args.tables, args.format, args.part_mb * 1024 ** 2, args.workers, args.keep_remote)
+
+
+if __name__ == '__main__':
+    main()
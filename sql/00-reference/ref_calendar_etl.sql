@@ -0,0 +1,24 @@
+-- sql/00-reference/ref_calendar_etl.sql
+--
+-- TABLE: ref_calendar_etl
+-- GRAIN: One row per calendar day (CALENDAR_START..CALENDAR_END)
+-- PURPOSE: Calendar spine for dim_date_etl
+-- SOURCE: Generated by lambda/reference_tables.py
+-- STORAGE: Parquet format in S3
+--
+
+CREATE EXTERNAL TABLE IF NOT EXISTS ref_calendar_etl (
+    date_key INT,
+    full_date DATE,
+    year INT,
+    quarter INT,
+    month INT,
+    month_name STRING,
+    day_of_month INT,
+    day_of_week INT,
+    day_name STRING,
+    is_weekend BOOLEAN,
+    year_month STRING
+)
+STORED AS PARQUET
+LOCATION 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/reference/ref_calendar/'
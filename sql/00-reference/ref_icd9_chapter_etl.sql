@@ -0,0 +1,18 @@
+-- sql/00-reference/ref_icd9_chapter_etl.sql
+--
+-- TABLE: ref_icd9_chapter_etl
+-- GRAIN: One row per ICD-9 diagnosis chapter range
+-- PURPOSE: Data-driven chapter/risk/cost classification for dim_diagnosis_etl
+-- SOURCE: Generated by lambda/reference_tables.py
+-- STORAGE: Parquet format in S3
+--
+
+CREATE EXTERNAL TABLE IF NOT EXISTS ref_icd9_chapter_etl (
+    range_start STRING,
+    range_end STRING,
+    icd9_chapter STRING,
+    risk_level STRING,
+    cost_category STRING
+)
+STORED AS PARQUET
+LOCATION 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/reference/ref_icd9_chapter/'
@@ -0,0 +1,19 @@
+-- sql/00-reference/ref_procedure_chapter_etl.sql
+--
+-- TABLE: ref_procedure_chapter_etl
+-- GRAIN: One row per ICD-9 procedure chapter range (2-digit prefix)
+-- PURPOSE: Data-driven category/risk/cost classification for dim_procedure_etl
+-- SOURCE: Generated by lambda/reference_tables.py
+-- STORAGE: Parquet format in S3
+--
+
+CREATE EXTERNAL TABLE IF NOT EXISTS ref_procedure_chapter_etl (
+    range_start INT,
+    range_end INT,
+    procedure_category STRING,
+    is_major_procedure BOOLEAN,
+    risk_level STRING,
+    cost_category STRING
+)
+STORED AS PARQUET
+LOCATION 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/reference/ref_procedure_chapter/'
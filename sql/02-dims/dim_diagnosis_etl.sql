@@ -41,56 +41,7 @@ CREATE TABLE dim_diagnosis_etl
         ROW_NUMBER() OVER (ORDER BY diagnosis_code_clean) AS diagnosis_sk,
         diagnosis_code_clean AS diagnosis_code,
         SUBSTRING(diagnosis_code_clean, 1, 3) AS code_category,
-        CASE 
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) = 'V' THEN 'Supplementary Classification (V Codes)'
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) = 'E' THEN 'External Causes of Injury (E Codes)'
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) = '0' THEN 'Infectious and Parasitic Diseases'
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) = '1' THEN 
-                CASE
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '139' THEN 'Infectious and Parasitic Diseases'
-                    ELSE 'Neoplasms'
-                END
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) = '2' THEN 
-                CASE
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '239' THEN 'Neoplasms'
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '279' THEN 'Endocrine, Nutritional and Metabolic'
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '289' THEN 'Blood and Blood-Forming Organs'
-                    ELSE 'Mental Disorders'
-                END
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) = '3' THEN 
-                CASE
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '319' THEN 'Mental Disorders'
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '389' THEN 'Nervous System and Sense Organs'
-                    ELSE 'Circulatory System'
-                END
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) = '4' THEN 
-                CASE
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '459' THEN 'Circulatory System'
-                    ELSE 'Respiratory System'
-                END
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) = '5' THEN 
-                CASE
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '579' THEN 'Digestive System'
-                    ELSE 'Genitourinary System'
-                END
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) = '6' THEN 
-                CASE
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '629' THEN 'Genitourinary System'
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '679' THEN 'Pregnancy, Childbirth and Puerperium'
-                    ELSE 'Skin and Subcutaneous Tissue'
-                END
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) = '7' THEN 
-                CASE
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '709' THEN 'Skin and Subcutaneous Tissue'
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '739' THEN 'Musculoskeletal and Connective Tissue'
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '759' THEN 'Congenital Anomalies'
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '779' THEN 'Perinatal Period Conditions'
-                    WHEN SUBSTRING(diagnosis_code_clean, 1, 3) <= '799' THEN 'Symptoms, Signs and Ill-Defined Conditions'
-                    ELSE 'Injury and Poisoning'
-                END
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) IN ('8', '9') THEN 'Injury and Poisoning'
-            ELSE 'Other/Unknown'
-        END AS icd9_chapter,
+        COALESCE(ch.icd9_chapter, 'Other/Unknown') AS icd9_chapter,
         CASE 
             WHEN SUBSTRING(diagnosis_code_clean, 1, 3) = '250' THEN 'Diabetes Mellitus'
             WHEN SUBSTRING(diagnosis_code_clean, 1, 3) IN ('401', '402', '403', '404', '405') THEN 'Hypertensive Disease'
@@ -104,29 +55,15 @@ CREATE TABLE dim_diagnosis_etl
             WHEN SUBSTRING(diagnosis_code_clean, 1, 3) IN ('250', '401', '402', '403', '404', '405', '428', '496') THEN TRUE
             ELSE FALSE
         END AS is_chronic,
-        CASE 
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) IN ('1', '2') AND 
-                 SUBSTRING(diagnosis_code_clean, 1, 3) >= '140' AND 
-                 SUBSTRING(diagnosis_code_clean, 1, 3) <= '239' THEN 'High'
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 3) >= '390' AND 
-                 SUBSTRING(diagnosis_code_clean, 1, 3) <= '459' THEN 'High'
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 3) >= '580' AND 
-                 SUBSTRING(diagnosis_code_clean, 1, 3) <= '629' THEN 'High'
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) = 'V' THEN 'Low'
-            ELSE 'Standard'
-        END AS risk_level,
+        COALESCE(ch.risk_level, 'Standard') AS risk_level,
         CASE 
             WHEN diagnosis_code_clean IN ('4019', '2724', '25000', '4280', '2859', '496') THEN TRUE
             ELSE FALSE
         END AS is_common_code,
-        CASE 
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) IN ('1', '2') AND 
-                 SUBSTRING(diagnosis_code_clean, 1, 3) >= '140' AND 
-                 SUBSTRING(diagnosis_code_clean, 1, 3) <= '239' THEN 'Very High'
-            WHEN SUBSTRING(diagnosis_code_clean, 1, 1) IN ('8', '9') THEN 'High'
-            ELSE 'Standard'
-        END AS cost_category
+        COALESCE(ch.cost_category, 'Standard') AS cost_category
     FROM cleaned_codes
+    LEFT JOIN ref_icd9_chapter_etl ch
+        ON SUBSTRING(diagnosis_code_clean, 1, 3) BETWEEN ch.range_start AND ch.range_end
     WHERE diagnosis_code_clean IS NOT NULL 
       AND diagnosis_code_clean != ''
       AND diagnosis_code_clean != 'NA'
\ No newline at end of file
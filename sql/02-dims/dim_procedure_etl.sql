@@ -49,43 +49,11 @@ CREATE TABLE dim_procedure_etl
         procedure_code_clean AS procedure_code,
         SUBSTRING(procedure_code_clean, 1, 2) AS code_category,
         'ICD-9 Procedure' AS code_type,
-        CASE 
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 5 THEN 'Operations on Nervous System'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 7 THEN 'Operations on Endocrine System'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 16 THEN 'Operations on Eye'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 20 THEN 'Operations on Ear'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 29 THEN 'Operations on Nose, Mouth, and Pharynx'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 34 THEN 'Operations on Respiratory System'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 39 THEN 'Operations on Cardiovascular System'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 41 THEN 'Operations on Hemic and Lymphatic System'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 54 THEN 'Operations on Digestive System'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 59 THEN 'Operations on Urinary System'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 64 THEN 'Operations on Male Genital Organs'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 71 THEN 'Operations on Female Genital Organs'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 75 THEN 'Obstetrical Procedures'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 84 THEN 'Operations on Musculoskeletal System'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) <= 86 THEN 'Operations on Integumentary System'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) >= 87 THEN 'Miscellaneous Diagnostic and Therapeutic Procedures'
-            ELSE 'Other/Unknown'
-        END AS procedure_category,
-        CASE 
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) BETWEEN 35 AND 39 THEN TRUE
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) BETWEEN 1 AND 5 THEN TRUE
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) BETWEEN 60 AND 71 THEN TRUE
-            ELSE FALSE
-        END AS is_major_procedure,
-        CASE 
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) BETWEEN 1 AND 5 THEN 'High'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) BETWEEN 35 AND 39 THEN 'High'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) >= 87 THEN 'Low'
-            ELSE 'Medium'
-        END AS risk_level,
-        CASE 
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) BETWEEN 35 AND 39 THEN 'Very High'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) BETWEEN 1 AND 5 THEN 'Very High'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) BETWEEN 76 AND 84 THEN 'High'
-            WHEN CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) >= 87 THEN 'Low'
-            ELSE 'Medium'
-        END AS cost_category
+        COALESCE(ch.procedure_category, 'Other/Unknown') AS procedure_category,
+        COALESCE(ch.is_major_procedure, FALSE) AS is_major_procedure,
+        COALESCE(ch.risk_level, 'Medium') AS risk_level,
+        COALESCE(ch.cost_category, 'Medium') AS cost_category
     FROM validated_codes
+    LEFT JOIN ref_procedure_chapter_etl ch
+        ON CAST(SUBSTRING(procedure_code_clean, 1, 2) AS INT) BETWEEN ch.range_start AND ch.range_end
     ORDER BY procedure_code_clean
\ No newline at end of file
@@ -0,0 +1,34 @@
+-- sql/03-facts/bridge_claim_diagnosis_etl.sql
+--
+-- TABLE: bridge_claim_diagnosis_etl
+-- GRAIN: One row per diagnosis code on a claim (claim_sk, position)
+-- PURPOSE: Long-format claim-diagnosis bridge, so "which claims carry code X"
+--          is a lookup on diagnosis_sk instead of a scan of the raw claims
+-- SOURCE: claim_codes_etl + dim_diagnosis_etl
+-- STORAGE: Parquet format in S3, bucketed by diagnosis_sk
+--
+-- LOGIC:
+-- - claim_codes_etl already holds each claim's cleaned diagnosis codes as an
+--   array (one unpivot of the raw views per build); UNNEST turns it back
+--   into rows without touching the CSV-backed views again
+-- - position: 1-based slot among the claim's non-empty codes (1 = principal
+--   diagnosis when diagnosis_code_1 is present)
+-- - Codes not in dim_diagnosis_etl are dropped
+-- - Bucketing on diagnosis_sk puts each code in a single bucket file, so an
+--   equality filter on diagnosis_sk reads 1/16 of the table
+--
+
+CREATE TABLE bridge_claim_diagnosis_etl
+WITH (
+    format = 'PARQUET',
+    external_location = 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/fact_tables/bridge_claim_diagnosis/',
+    bucketed_by = ARRAY['diagnosis_sk'],
+    bucket_count = 16
+) AS
+SELECT
+    c.claim_sk,
+    d.diagnosis_sk,
+    CAST(u.position AS INT) AS position
+FROM claim_codes_etl c
+CROSS JOIN UNNEST(c.diagnosis_codes) WITH ORDINALITY AS u(diagnosis_code, position)
+JOIN dim_diagnosis_etl d ON u.diagnosis_code = d.diagnosis_code
@@ -0,0 +1,34 @@
+-- sql/03-facts/bridge_claim_procedure_etl.sql
+--
+-- TABLE: bridge_claim_procedure_etl
+-- GRAIN: One row per procedure code on a claim (claim_sk, position)
+-- PURPOSE: Long-format claim-procedure bridge, so "which claims carry code X"
+--          is a lookup on procedure_sk instead of a scan of the raw claims
+-- SOURCE: claim_codes_etl + dim_procedure_etl
+-- STORAGE: Parquet format in S3, bucketed by procedure_sk
+--
+-- LOGIC:
+-- - claim_codes_etl already holds each claim's cleaned procedure codes as an
+--   array (one unpivot of the raw views per build); UNNEST turns it back
+--   into rows without touching the CSV-backed views again
+-- - position: 1-based slot among the claim's non-empty codes (1 = principal
+--   procedure when procedure_code_1 is present)
+-- - Codes not in dim_procedure_etl are dropped
+-- - Bucketing on procedure_sk puts each code in a single bucket file, so an
+--   equality filter on procedure_sk reads 1/16 of the table
+--
+
+CREATE TABLE bridge_claim_procedure_etl
+WITH (
+    format = 'PARQUET',
+    external_location = 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/fact_tables/bridge_claim_procedure/',
+    bucketed_by = ARRAY['procedure_sk'],
+    bucket_count = 16
+) AS
+SELECT
+    c.claim_sk,
+    d.procedure_sk,
+    CAST(u.position AS INT) AS position
+FROM claim_codes_etl c
+CROSS JOIN UNNEST(c.procedure_codes) WITH ORDINALITY AS u(procedure_code, position)
+JOIN dim_procedure_etl d ON u.procedure_code = d.procedure_code
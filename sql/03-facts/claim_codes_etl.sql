@@ -0,0 +1,63 @@
+-- sql/03-facts/claim_codes_etl.sql
+--
+-- TABLE: claim_codes_etl
+-- GRAIN: One row per claim (claim_id)
+-- PURPOSE: Each claim's full diagnosis and procedure code sets as arrays,
+--          for the code-set analytics in lambda/ (near_duplicates.py,
+--          code_cooccurrence.py)
+-- SOURCE: v_inpatient_claims_etl + v_outpatient_claims_etl + fact_claims_etl
+-- STORAGE: Parquet format in S3 (arrays are Parquet LIST columns)
+--
+-- LOGIC:
+-- - diagnosis_code_1..10 and procedure_code_1..6 (outpatient has 1..3)
+--   packed into arrays in slot order
+-- - Codes cleaned the same way as dim_diagnosis_etl / dim_procedure_etl
+--   (quotes and spaces removed); NULL, '' and 'NA' dropped
+--
+
+CREATE TABLE claim_codes_etl
+WITH (
+    format = 'PARQUET',
+    external_location = 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/fact_tables/claim_codes/'
+) AS
+WITH raw_codes AS (
+    SELECT
+        claim_id,
+        ARRAY[
+            diagnosis_code_1, diagnosis_code_2, diagnosis_code_3, diagnosis_code_4, diagnosis_code_5,
+            diagnosis_code_6, diagnosis_code_7, diagnosis_code_8, diagnosis_code_9, diagnosis_code_10
+        ] AS diagnosis_codes,
+        ARRAY[
+            procedure_code_1, procedure_code_2, procedure_code_3,
+            procedure_code_4, procedure_code_5, procedure_code_6
+        ] AS procedure_codes
+    FROM v_inpatient_claims_etl
+
+    UNION ALL
+
+    SELECT
+        claim_id,
+        ARRAY[
+            diagnosis_code_1, diagnosis_code_2, diagnosis_code_3, diagnosis_code_4, diagnosis_code_5,
+            diagnosis_code_6, diagnosis_code_7, diagnosis_code_8, diagnosis_code_9, diagnosis_code_10
+        ] AS diagnosis_codes,
+        ARRAY[procedure_code_1, procedure_code_2, procedure_code_3] AS procedure_codes
+    FROM v_outpatient_claims_etl
+)
+SELECT
+    f.claim_sk,
+    f.claim_id,
+    f.patient_sk,
+    f.provider_sk,
+    f.claim_start_date_key,
+    f.claim_type,
+    FILTER(
+        TRANSFORM(r.diagnosis_codes, c -> REPLACE(REPLACE(c, '"', ''), '''', '')),
+        c -> c IS NOT NULL AND c NOT IN ('', 'NA')
+    ) AS diagnosis_codes,
+    FILTER(
+        TRANSFORM(r.procedure_codes, c -> REPLACE(REPLACE(REPLACE(c, '"', ''), '''', ''), ' ', '')),
+        c -> c IS NOT NULL AND c NOT IN ('', 'NA')
+    ) AS procedure_codes
+FROM raw_codes r
+JOIN fact_claims_etl f ON r.claim_id = f.claim_id
@@ -0,0 +1,48 @@
+-- sql/03-facts/fact_claims_monthly_etl.sql
+--
+-- TABLE: fact_claims_monthly_etl
+-- GRAIN: One row per claim, partitioned by claim month (YYYYMM of claim_start_date)
+-- PURPOSE: Month-partitioned claims fact for historical backfills
+-- SOURCE: Filled month by month by lambda/backfill.py (INSERT INTO per partition)
+-- STORAGE: Parquet format in S3, partitioned by claim_month
+--
+-- Creates the table only (WITH NO DATA). backfill.py stages the SELECT once
+-- for the requested month range, then INSERTs each claim_month from the
+-- stage. Columns match
+-- fact_claims_etl except claim_sk: a ROW_NUMBER() over one month would not
+-- match the full build, so join to fact_claims_etl on claim_id for it.
+-- Claims without a claim_start_date have no month and are not included.
+--
+
+CREATE TABLE fact_claims_monthly_etl
+WITH (
+    format = 'PARQUET',
+    external_location = 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/fact_tables/fact_claims_monthly/',
+    partitioned_by = ARRAY['claim_month']
+) AS
+SELECT
+    pat.patient_sk,
+    prov.provider_sk,
+    COALESCE(CAST(DATE_FORMAT(c.claim_start_date, '%Y%m%d') AS INT), 0) AS claim_start_date_key,
+    COALESCE(CAST(DATE_FORMAT(c.claim_end_date, '%Y%m%d') AS INT), 0) AS claim_end_date_key,
+    COALESCE(CAST(DATE_FORMAT(c.admission_date, '%Y%m%d') AS INT), 0) AS admission_date_key,
+    COALESCE(CAST(DATE_FORMAT(c.discharge_date, '%Y%m%d') AS INT), 0) AS discharge_date_key,
+    c.claim_id,
+    c.claim_type,
+    COALESCE(c.claim_amount, 0) AS claim_amount,
+    COALESCE(c.deductible_amount, 0) AS deductible_amount,
+    COALESCE(c.length_of_stay, 0) AS length_of_stay,
+    COALESCE(c.claim_amount, 0) + COALESCE(c.deductible_amount, 0) AS total_amount,
+    prov.is_fraudulent,
+    c.admit_diagnosis_code,
+    c.diagnosis_group_code,
+    c.diagnosis_code_1,
+    c.procedure_code_1,
+    c.attending_physician_id,
+    c.operating_physician_id,
+    c.other_physician_id,
+    CAST(DATE_FORMAT(c.claim_start_date, '%Y%m') AS INT) AS claim_month
+FROM v_all_claims_etl c
+JOIN dim_patient_etl pat ON c.patient_id = pat.patient_id
+JOIN dim_provider_etl prov ON c.provider_id = prov.provider_id
+WITH NO DATA;
@@ -0,0 +1,50 @@
+-- sql/03-facts/fact_claims_summary_grouped_etl.sql
+--
+-- TABLE: fact_claims_summary_grouped_etl
+-- GRAIN: One row per provider x month AND one row per patient x month
+--        (summary_grain = 'provider' | 'patient')
+-- PURPOSE: Single aggregation pass feeding fact_provider_summary_etl and
+--          fact_patient_claims_summary_etl
+-- SOURCE: fact_claims_etl (Parquet) - no view scans or dimension joins
+-- STORAGE: Parquet format in S3
+--
+
+CREATE TABLE fact_claims_summary_grouped_etl
+WITH (
+    format = 'PARQUET',
+    external_location = 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/fact_tables/fact_claims_summary_grouped/'
+) AS
+WITH claims AS (
+    SELECT
+        provider_sk,
+        patient_sk,
+        is_fraudulent,
+        claim_type,
+        claim_amount,
+        deductible_amount,
+        CASE
+            WHEN claim_start_date_key = 0 THEN NULL
+            ELSE CAST(claim_start_date_key / 100 AS VARCHAR)
+        END AS month_key
+    FROM fact_claims_etl
+)
+SELECT
+    CASE WHEN GROUPING(provider_sk) = 0 THEN 'provider' ELSE 'patient' END AS summary_grain,
+    provider_sk,
+    patient_sk,
+    month_key,
+    is_fraudulent AS provider_is_fraudulent,
+    COUNT(*) AS total_claims,
+    SUM(CASE WHEN claim_type = 'Inpatient' THEN 1 ELSE 0 END) AS inpatient_claims,
+    SUM(CASE WHEN claim_type = 'Outpatient' THEN 1 ELSE 0 END) AS outpatient_claims,
+    COUNT(DISTINCT patient_sk) AS unique_patients,
+    SUM(claim_amount) AS total_claimed,
+    AVG(claim_amount) AS avg_claim_amount,
+    SUM(deductible_amount) AS total_deductible,
+    SUM(CASE WHEN is_fraudulent = TRUE THEN 1 ELSE 0 END) AS fraudulent_provider_visits,
+    SUM(CASE WHEN is_fraudulent = TRUE THEN claim_amount ELSE 0 END) AS fraud_exposure_amount
+FROM claims
+GROUP BY GROUPING SETS (
+    (provider_sk, is_fraudulent, month_key),
+    (patient_sk, month_key)
+);
@@ -0,0 +1,26 @@
+-- sql/03-facts/fact_patient_claims_summary_etl.sql
+--
+-- TABLE: fact_patient_claims_summary_etl
+-- GRAIN: One row per patient per month
+-- PURPOSE: Monthly patient utilization and fraud exposure
+-- SOURCE: fact_claims_summary_grouped_etl (summary_grain = 'patient')
+-- STORAGE: Parquet format in S3
+--
+
+CREATE TABLE fact_patient_claims_summary_etl
+WITH (
+    format = 'PARQUET',
+    external_location = 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/fact_tables/fact_patient_summary_v2/'
+) AS
+SELECT 
+    patient_sk,
+    month_key,
+    total_claims,
+    inpatient_claims AS inpatient_visits,
+    outpatient_claims AS outpatient_visits,
+    total_claimed,
+    total_deductible,
+    fraudulent_provider_visits,
+    fraud_exposure_amount
+FROM fact_claims_summary_grouped_etl
+WHERE summary_grain = 'patient';
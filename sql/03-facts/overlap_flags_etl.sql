@@ -0,0 +1,107 @@
+-- sql/03-facts/overlap_flags_etl.sql
+--
+-- TABLE: overlap_flags_etl
+-- GRAIN: One row per claim (claim_id)
+-- PURPOSE: Overlapping inpatient stays and outpatient claims billed during a stay
+-- SOURCE: fact_claims_etl
+-- STORAGE: Parquet format in S3
+--
+-- LOGIC (linear sweep, no self-join):
+-- - Each claim becomes an interval: admission..discharge for inpatient stays
+--   (claim start..end when those are missing), claim start..end for outpatient.
+-- - Claims are ordered per patient by (start, inpatient first, claim_id).
+--   A running MAX of earlier stays' end dates tells whether the current
+--   claim starts inside an earlier stay; MAX_BY names that stay.
+-- - Looking forward, the smallest start of later stays/outpatient claims
+--   tells whether a stay is overlapped by anything that starts after it.
+-- All four windows share one PARTITION BY / ORDER BY, so Athena sorts each
+-- patient's claims once.
+-- Date keys are YYYYMMDD integers, so they compare in date order.
+--
+
+CREATE TABLE overlap_flags_etl
+WITH (
+    format = 'PARQUET',
+    external_location = 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/fact_tables/overlap_flags/'
+) AS
+WITH intervals AS (
+    SELECT
+        claim_sk,
+        claim_id,
+        patient_sk,
+        claim_type,
+        claim_type = 'Inpatient' AS is_inpatient,
+        CASE
+            WHEN claim_type = 'Inpatient' AND admission_date_key > 0 THEN admission_date_key
+            ELSE claim_start_date_key
+        END AS start_key,
+        CASE
+            WHEN claim_type = 'Inpatient' AND discharge_date_key > 0 THEN discharge_date_key
+            ELSE claim_end_date_key
+        END AS raw_end_key
+    FROM fact_claims_etl
+    WHERE claim_start_date_key > 0
+),
+normalized AS (
+    SELECT
+        claim_sk,
+        claim_id,
+        patient_sk,
+        claim_type,
+        is_inpatient,
+        start_key,
+        GREATEST(start_key, raw_end_key) AS end_key
+    FROM intervals
+),
+swept AS (
+    SELECT
+        n.*,
+        -- Latest end among stays that started earlier
+        MAX(CASE WHEN is_inpatient THEN end_key END) OVER (
+            PARTITION BY patient_sk
+            ORDER BY start_key, is_inpatient DESC, claim_id
+            ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+        ) AS prior_stay_end_key,
+        MAX_BY(CASE WHEN is_inpatient THEN claim_id END, CASE WHEN is_inpatient THEN end_key END) OVER (
+            PARTITION BY patient_sk
+            ORDER BY start_key, is_inpatient DESC, claim_id
+            ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+        ) AS prior_stay_claim_id,
+        -- Earliest start among stays / outpatient claims that start later
+        MIN(CASE WHEN is_inpatient THEN start_key END) OVER (
+            PARTITION BY patient_sk
+            ORDER BY start_key, is_inpatient DESC, claim_id
+            ROWS BETWEEN 1 FOLLOWING AND UNBOUNDED FOLLOWING
+        ) AS next_stay_start_key,
+        MIN(CASE WHEN NOT is_inpatient THEN start_key END) OVER (
+            PARTITION BY patient_sk
+            ORDER BY start_key, is_inpatient DESC, claim_id
+            ROWS BETWEEN 1 FOLLOWING AND UNBOUNDED FOLLOWING
+        ) AS next_outpatient_start_key
+    FROM normalized n
+)
+SELECT
+    claim_id,
+    claim_sk,
+    patient_sk,
+    claim_type,
+    start_key AS interval_start_key,
+    end_key AS interval_end_key,
+    is_inpatient
+        AND (COALESCE(prior_stay_end_key >= start_key, FALSE)
+             OR COALESCE(next_stay_start_key <= end_key, FALSE)) AS is_overlapping_stay,
+    NOT is_inpatient
+        AND COALESCE(prior_stay_end_key >= start_key, FALSE) AS is_outpatient_during_stay,
+    is_inpatient
+        AND COALESCE(next_outpatient_start_key <= end_key, FALSE) AS stay_has_outpatient_claims,
+    CASE WHEN prior_stay_end_key >= start_key THEN prior_stay_claim_id END AS overlapping_stay_claim_id,
+    CASE
+        WHEN prior_stay_end_key >= start_key THEN
+            DATE_DIFF(
+                'day',
+                DATE_PARSE(CAST(start_key AS VARCHAR), '%Y%m%d'),
+                DATE_PARSE(CAST(LEAST(end_key, prior_stay_end_key) AS VARCHAR), '%Y%m%d')
+            ) + 1
+        ELSE 0
+    END AS overlap_days
+FROM swept
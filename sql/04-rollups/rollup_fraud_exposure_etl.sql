@@ -0,0 +1,55 @@
+-- sql/04-rollups/rollup_fraud_exposure_etl.sql
+--
+-- TABLE: rollup_fraud_exposure_etl
+-- GRAIN: One row per combination of the CUBE dimensions, per grouping set
+-- PURPOSE: Pre-aggregated fraud exposure for the Tableau dashboards
+-- SOURCE: fact_claims_etl + dim_provider_etl + dim_patient_etl
+-- STORAGE: Parquet format in S3, partitioned by grouping_id
+--
+-- DIMENSIONS (GROUPING bit order, most significant first):
+--   month_key, state_code, claim_type, provider_type, risk_category
+--
+-- grouping_id = GROUPING(...) bitmask; a set bit means the dimension is
+-- rolled up (NULL). grouping_id 0 is the finest grain, 31 the grand total.
+-- Each grouping set lands in its own partition, so a dashboard query that
+-- filters on grouping_id reads only that slice. Use lambda/rollup_router.py
+-- to pick the grouping set for a given filter combination.
+--
+-- NOTE: state_code is the patient's state (providers carry no location).
+--
+
+CREATE TABLE rollup_fraud_exposure_etl
+WITH (
+    format = 'PARQUET',
+    external_location = 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/rollup_tables/rollup_fraud_exposure/',
+    partitioned_by = ARRAY['grouping_id']
+) AS
+WITH claims AS (
+    SELECT
+        CASE
+            WHEN f.claim_start_date_key = 0 THEN NULL
+            ELSE CAST(f.claim_start_date_key / 100 AS VARCHAR)
+        END AS month_key,
+        pat.state_code,
+        f.claim_type,
+        prov.provider_type,
+        pat.risk_category,
+        f.is_fraudulent,
+        f.claim_amount
+    FROM fact_claims_etl f
+    JOIN dim_provider_etl prov ON f.provider_sk = prov.provider_sk
+    JOIN dim_patient_etl pat ON f.patient_sk = pat.patient_sk
+)
+SELECT
+    month_key,
+    state_code,
+    claim_type,
+    provider_type,
+    risk_category,
+    COUNT(*) AS total_claims,
+    SUM(CASE WHEN is_fraudulent = TRUE THEN 1 ELSE 0 END) AS fraud_claims,
+    SUM(claim_amount) AS total_claimed,
+    SUM(CASE WHEN is_fraudulent = TRUE THEN claim_amount ELSE 0 END) AS fraud_exposure_amount,
+    GROUPING(month_key, state_code, claim_type, provider_type, risk_category) AS grouping_id
+FROM claims
+GROUP BY CUBE (month_key, state_code, claim_type, provider_type, risk_category);
@@ -0,0 +1,35 @@
+-- sql/05-scoring/claim_code_rarity_etl.sql
+--
+-- TABLE: claim_code_rarity_etl
+-- GRAIN: One row per claim with at least one mapped diagnosis and procedure
+-- PURPOSE: Rare diagnosis-procedure combinations (docs/fraud-patterns.md Pattern 3)
+-- SOURCE: Generated by lambda/code_cooccurrence.py from claim_codes_etl + dims
+-- STORAGE: Parquet format in S3
+--
+-- The rarest_* columns describe the claim's highest-scoring pair.
+-- pair_rarity = -log(pair_claims / N) / log(N): 1 for a pair billed once,
+-- 0 for a pair on every claim. rarity_score = max(0, -npmi, pair_rarity), so
+-- a pair scores high when its codes are rarely billed together (negative
+-- NPMI) or when the pair itself is rare. Pairs billed often in this data
+-- can score low however implausible they are clinically.
+-- The full co-occurrence matrix is kept next to the table as
+-- scoring_tables/code_cooccurrence_matrix/dx_px_counts.npz.
+--
+
+CREATE EXTERNAL TABLE IF NOT EXISTS claim_code_rarity_etl (
+    claim_sk BIGINT,
+    claim_id STRING,
+    code_pairs INT,
+    rarest_diagnosis_sk BIGINT,
+    rarest_procedure_sk BIGINT,
+    rarest_diagnosis_code STRING,
+    rarest_procedure_code STRING,
+    pair_claims BIGINT,
+    lift DOUBLE,
+    pmi DOUBLE,
+    npmi DOUBLE,
+    pair_rarity DOUBLE,
+    rarity_score DOUBLE
+)
+STORED AS PARQUET
+LOCATION 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/scoring_tables/claim_code_rarity/'
@@ -0,0 +1,21 @@
+-- sql/05-scoring/claim_rule_flags_etl.sql
+--
+-- TABLE: claim_rule_flags_etl
+-- GRAIN: One row per claim (claim_sk)
+-- PURPOSE: Claim-level red flags from docs/fraud-patterns.md section 9.2
+-- SOURCE: Generated by lambda/claim_rules.py from fact_claims_etl + claim_codes_etl + dims
+-- STORAGE: Parquet format in S3
+--
+-- rule_flags bits (see RULES in lambda/claim_rules.py):
+--   0 HIGH_AMOUNT, 1 AMOUNT_OUTLIER, 2 MINOR_DX_MAJOR_PX,
+--   3 MANY_PROCEDURES, 4 AFTER_DEATH
+-- Test a rule with BITWISE_AND(rule_flags, 16) > 0 (AFTER_DEATH).
+--
+
+CREATE EXTERNAL TABLE IF NOT EXISTS claim_rule_flags_etl (
+    claim_sk BIGINT,
+    rule_flags INT,
+    rule_score DOUBLE
+)
+STORED AS PARQUET
+LOCATION 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/scoring_tables/claim_rule_flags/'
@@ -0,0 +1,27 @@
+-- sql/05-scoring/near_duplicate_claims_etl.sql
+--
+-- TABLE: near_duplicate_claims_etl
+-- GRAIN: One row per candidate pair of claims (claim_sk_1 < claim_sk_2)
+-- PURPOSE: Re-billed encounters with slightly changed diagnosis/procedure codes
+-- SOURCE: Generated by lambda/near_duplicates.py from claim_codes_etl
+-- STORAGE: Parquet format in S3
+--
+-- Both claims share patient and provider and start within the date window.
+-- similarity estimates the Jaccard similarity of the two code sets
+-- (share of matching MinHash signature rows); 1.0 means identical sets.
+--
+
+CREATE EXTERNAL TABLE IF NOT EXISTS near_duplicate_claims_etl (
+    claim_id_1 STRING,
+    claim_id_2 STRING,
+    claim_sk_1 BIGINT,
+    claim_sk_2 BIGINT,
+    patient_sk BIGINT,
+    provider_sk BIGINT,
+    days_apart INT,
+    similarity DOUBLE,
+    codes_1 INT,
+    codes_2 INT
+)
+STORED AS PARQUET
+LOCATION 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/scoring_tables/near_duplicate_claims/'
@@ -0,0 +1,31 @@
+-- sql/05-scoring/provider_network_etl.sql
+--
+-- TABLE: provider_network_etl
+-- GRAIN: One row per provider (provider_sk)
+-- PURPOSE: Fraud-ring features from the provider-physician-patient graph
+-- SOURCE: Generated by lambda/provider_network.py from fact_claims_etl
+-- STORAGE: Parquet format in S3
+--
+-- component_id: smallest provider_sk in the connected component of the
+-- provider-physician graph (attending, operating and other physicians;
+-- physicians above --max-hub-degree providers are not in the graph).
+-- is_ring_member: the component holds more than one provider.
+-- providers_via_*: distinct other providers sharing at least one
+-- physician/patient (hubs above --max-hub-degree providers are skipped).
+--
+
+CREATE EXTERNAL TABLE IF NOT EXISTS provider_network_etl (
+    provider_sk BIGINT,
+    component_id BIGINT,
+    component_providers INT,
+    component_physicians INT,
+    n_physicians INT,
+    shared_physicians INT,
+    providers_via_physicians INT,
+    n_patients INT,
+    shared_patients INT,
+    providers_via_patients INT,
+    is_ring_member BOOLEAN
+)
+STORED AS PARQUET
+LOCATION 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/scoring_tables/provider_network/'
@@ -0,0 +1,47 @@
+-- sql/05-scoring/provider_peer_scores_etl.sql
+--
+-- TABLE: provider_peer_scores_etl
+-- GRAIN: One row per provider (provider_sk)
+-- PURPOSE: Robust peer-group z-scores and percent ranks per provider metric
+-- SOURCE: Generated by lambda/peer_groups.py from dim_provider_etl + fact_claims_etl + dim_patient_etl
+-- STORAGE: Parquet format in S3
+--
+-- Peer group = provider_type + state_code (patients' modal state) + claim_mix,
+-- coarsened to provider_type + claim_mix, then provider_type, when smaller
+-- than the minimum group size (peer_level says which was used).
+-- <metric>_z = (value - peer median) / (1.4826 * peer MAD).
+--
+
+CREATE EXTERNAL TABLE IF NOT EXISTS provider_peer_scores_etl (
+    provider_sk BIGINT,
+    provider_type STRING,
+    state_code INT,
+    claim_mix STRING,
+    peer_level STRING,
+    peer_group_id INT,
+    peer_group_size INT,
+    avg_claim_amount DOUBLE,
+    avg_claim_amount_peer_median DOUBLE,
+    avg_claim_amount_peer_p90 DOUBLE,
+    avg_claim_amount_z DOUBLE,
+    avg_claim_amount_pct_rank DOUBLE,
+    claims_per_patient DOUBLE,
+    claims_per_patient_peer_median DOUBLE,
+    claims_per_patient_peer_p90 DOUBLE,
+    claims_per_patient_z DOUBLE,
+    claims_per_patient_pct_rank DOUBLE,
+    max_claim_amount DOUBLE,
+    max_claim_amount_peer_median DOUBLE,
+    max_claim_amount_peer_p90 DOUBLE,
+    max_claim_amount_z DOUBLE,
+    max_claim_amount_pct_rank DOUBLE,
+    avg_length_of_stay DOUBLE,
+    avg_length_of_stay_peer_median DOUBLE,
+    avg_length_of_stay_peer_p90 DOUBLE,
+    avg_length_of_stay_z DOUBLE,
+    avg_length_of_stay_pct_rank DOUBLE,
+    max_peer_z DOUBLE,
+    peer_risk_level STRING
+)
+STORED AS PARQUET
+LOCATION 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/scoring_tables/provider_peer_scores/'
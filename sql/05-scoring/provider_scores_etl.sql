@@ -0,0 +1,29 @@
+-- sql/05-scoring/provider_scores_etl.sql
+--
+-- TABLE: provider_scores_etl
+-- GRAIN: One row per provider (provider_sk)
+-- PURPOSE: Batch provider risk scores (dim_provider_etl risk_level + peer z-scores)
+-- SOURCE: Generated by lambda/batch_scoring.py from fact_claims_etl + dim_provider_etl
+-- STORAGE: Parquet format in S3, one file per scoring shard
+--
+-- Peers are providers with the same provider_type. amount_peer_z compares
+-- avg_claim_amount, volume_peer_z compares claims_per_patient.
+--
+
+CREATE EXTERNAL TABLE IF NOT EXISTS provider_scores_etl (
+    provider_sk BIGINT,
+    provider_id STRING,
+    total_claims BIGINT,
+    total_patients BIGINT,
+    total_amount DOUBLE,
+    avg_claim_amount DOUBLE,
+    claims_per_patient DOUBLE,
+    provider_type STRING,
+    risk_level STRING,
+    amount_peer_z DOUBLE,
+    volume_peer_z DOUBLE,
+    risk_score DOUBLE,
+    run_shard INT
+)
+STORED AS PARQUET
+LOCATION 's3://insurance-claim-qian-2025/data/warehouse/lambda_etl/scoring_tables/provider_scores/'
@@ -0,0 +1,117 @@
+# tests/test_raw_uploader.py
+"""
+raw_uploader against a moto S3 server, through the S3_ENDPOINT_URL hook
+(MinIO works the same way). Skipped when moto[server] is not installed.
+"""
+
+import json
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+moto_server = pytest.importorskip('moto.server')
+
+import aws_clients
+import raw_uploader
+from config import Config
+
+BUCKET = 'raw-uploader-test'
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    server = moto_server.ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    monkeypatch.setattr(Config, 'S3_ENDPOINT_URL', f"http://{host}:{port}")
+    aws_clients.reset_clients()
+    client = aws_clients.get_client('s3')
+    if Config.REGION == 'us-east-1':
+        client.create_bucket(Bucket=BUCKET)
+    else:
+        client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': Config.REGION})
+    yield client
+    aws_clients.reset_clients()
+    # The moto backend is process-wide; start the next test from an empty account
+    urllib.request.urlopen(urllib.request.Request(f"{Config.S3_ENDPOINT_URL}/moto-api/reset", method='POST'))
+    server.stop()
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    (tmp_path / 'Train_Provider.csv').write_text("Provider,PotentialFraud\nPRV1,Yes\nPRV2,No\n")
+    (tmp_path / 'Train_Inpatient.csv').write_text("BeneID,ClaimID,Provider\nB1,C1,PRV1\n")
+    return tmp_path
+
+
+def put_marker(s3, completed_at: str, key: str = Config.BUILD_MARKER_KEY) -> None:
+    s3.put_object(Bucket=BUCKET, Key=key, Body=json.dumps({'completed_at': completed_at}))
+
+
+def test_upload_writes_utc_manifest_and_skips_unchanged(s3, source_dir):
+    manifest = raw_uploader.upload(str(source_dir), BUCKET, workers=2)
+    assert manifest['changed'] == ['inpatient', 'provider']
+    for entry in manifest['tables'].values():
+        assert datetime.fromisoformat(entry['changed_at']).utcoffset() == timedelta(0)
+
+    again = raw_uploader.upload(str(source_dir), BUCKET, workers=2)
+    assert again['changed'] == []
+    assert again['tables']['provider']['changed_at'] == manifest['tables']['provider']['changed_at']
+
+
+def test_changed_tables_since_run_marker(s3, source_dir):
+    raw_uploader.upload(str(source_dir), BUCKET)
+    before = datetime.now(timezone.utc) - timedelta(minutes=5)
+    after = datetime.now(timezone.utc) + timedelta(minutes=5)
+
+    put_marker(s3, before.isoformat())
+    assert raw_uploader.changed_tables(bucket=BUCKET) == ['inpatient', 'provider']
+    put_marker(s3, after.isoformat())
+    assert raw_uploader.changed_tables(bucket=BUCKET) == []
+
+
+def test_changed_tables_compares_across_time_zones(s3, source_dir):
+    raw_uploader.upload(str(source_dir), BUCKET)
+    # Same instant as "5 minutes ago", written by a machine twelve hours ahead of UTC
+    ahead = (datetime.now(timezone.utc) - timedelta(minutes=5)).astimezone(timezone(timedelta(hours=12)))
+    assert raw_uploader.changed_tables(ahead.isoformat(), BUCKET) == ['inpatient', 'provider']
+    behind = (datetime.now(timezone.utc) + timedelta(minutes=5)).astimezone(timezone(timedelta(hours=-12)))
+    assert raw_uploader.changed_tables(behind.isoformat(), BUCKET) == []
+
+
+def test_changed_tables_without_marker(s3, source_dir):
+    raw_uploader.upload(str(source_dir), BUCKET)
+    assert raw_uploader.changed_tables(bucket=BUCKET) == ['inpatient', 'provider']
+
+
+def test_changed_tables_without_manifest(s3):
+    assert raw_uploader.changed_tables(bucket=BUCKET) == sorted(raw_uploader.RAW_FILES)
+
+
+def test_changed_tables_ignores_steps_that_do_not_rebuild(s3, source_dir, monkeypatch):
+    from etl_pipeline import publish_run_marker
+
+    monkeypatch.setattr(Config, 'BUCKET', BUCKET)
+    raw_uploader.upload(str(source_dir), BUCKET)
+    publish_run_marker('labels-run', 'labels')
+    assert raw_uploader.changed_tables(bucket=BUCKET) == ['inpatient', 'provider']
+
+    publish_run_marker('build-run', 'facts')
+    assert raw_uploader.changed_tables(bucket=BUCKET) == []
+    publish_run_marker('labels-run-2', 'labels')
+    assert raw_uploader.changed_tables(bucket=BUCKET) == []
+
+
+def test_pipeline_skips_build_when_nothing_changed(s3, source_dir, monkeypatch):
+    from etl_pipeline import ClaimsETLPipeline, publish_run_marker
+
+    monkeypatch.setattr(Config, 'BUCKET', BUCKET)
+    raw_uploader.upload(str(source_dir), BUCKET)
+    publish_run_marker('build-run', 'all')
+
+    # Never called: the run stops before submitting anything
+    result = ClaimsETLPipeline(executor=object()).run('all', if_changed=True)
+    assert result['statusCode'] == 200 and result['skipped'] and result['raw_changed'] == []